@@ -0,0 +1,248 @@
+"""
+Admission control for agent runs served under /copilotkit.
+
+Every agent run holds a slot for as long as its response streams. Runs are
+limited per agent (ADMISSION_AGENT_LIMITS, else ADMISSION_MAX_CONCURRENT) and per
+client (ADMISSION_MAX_PER_CLIENT, counting queued runs too). A run that finds its
+agent busy waits in a bounded queue, served round-robin across clients (or across
+threads when clients are not identified), for at most
+ADMISSION_QUEUE_TIMEOUT_SECONDS. Rather than piling more Gemini and GitHub
+work onto an overloaded process, requests are turned away early:
+- 429 when the client already has its share of runs;
+- 503 when the agent's queue is full or the wait deadline passes.
+Both carry a Retry-After estimated from recent run durations and the queue depth.
+
+Clients are identified only by ADMISSION_CLIENT_HEADER, set by a trusted gateway.
+Every browser session reaches the agents through the same CopilotKit runtime, so
+the peer address says nothing about who sent a run; without the header the
+per-client limit is off and queueing is fair per CopilotKit thread (threadId in
+the request body).
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import metrics
+from github_client import FairLimiter
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+# Per-agent overrides, e.g. "stack_analysis_agent=8,post_generation_agent=16"
+ADMISSION_AGENT_LIMITS = os.getenv("ADMISSION_AGENT_LIMITS", "")
+ADMISSION_MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "4"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "15"))
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "").lower()
+
+# Agent-run routes of the CopilotKit endpoint (the name is in the body for agents/execute;
+# both carry the threadId there)
+_AGENT_PATH = re.compile(r"^/agent/([a-zA-Z0-9_-]+)/?$")
+_EXECUTE_PATH = "/agents/execute"
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for item in value.split(","):
+        agent, _, limit = item.partition("=")
+        if limit.strip().isdigit():
+            limits[agent.strip()] = int(limit)
+    return limits
+
+
+class Rejection(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        agent_limits: Dict[str, int],
+        default_limit: int,
+        per_client: int,
+        max_queue: int,
+        queue_timeout: float,
+    ):
+        self.agent_limits = agent_limits
+        self.default_limit = default_limit
+        self.per_client = per_client
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._limiters: Dict[str, FairLimiter] = {}
+        # Runs admitted or waiting, per client
+        self._clients: Dict[str, int] = {}
+        # Moving average of run duration per agent, for Retry-After
+        self._durations: Dict[str, float] = {}
+
+    def _limiter(self, agent: str) -> FairLimiter:
+        limiter = self._limiters.get(agent)
+        if limiter is None:
+            limiter = self._limiters[agent] = FairLimiter(self.agent_limits.get(agent, self.default_limit))
+        return limiter
+
+    # Seconds until a slot is likely free: the queue ahead drains `limit` runs per average run time
+    def retry_after(self, agent: str) -> int:
+        limiter = self._limiter(agent)
+        average = self._durations.get(agent, 5.0)
+        return max(1, math.ceil(average * (limiter.queued + 1) / limiter.limit))
+
+    # Wait for a slot for `agent`, queued fairly under `queue_key`; raises Rejection instead when
+    # the client (if identified) or the queue is full
+    async def admit(self, agent: str, queue_key: str, client: Optional[str] = None) -> None:
+        limiter = self._limiter(agent)
+        if client is not None and self._clients.get(client, 0) >= self.per_client:
+            metrics.record_admission(agent, "rejected_client", 0.0)
+            raise Rejection(429, "too many concurrent agent runs for this client", self.retry_after(agent))
+        if limiter.active >= limiter.limit and limiter.queued >= self.max_queue:
+            metrics.record_admission(agent, "rejected_queue_full", 0.0)
+            raise Rejection(503, "agent is at capacity", self.retry_after(agent))
+
+        if client is not None:
+            self._clients[client] = self._clients.get(client, 0) + 1
+        immediate = limiter.active < limiter.limit and not limiter.queued
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(limiter.acquire(queue_key), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._release_client(client)
+            metrics.record_admission(agent, "timed_out", time.perf_counter() - started)
+            raise Rejection(503, "timed out waiting for an agent slot", self.retry_after(agent))
+        except BaseException:
+            self._release_client(client)
+            raise
+        waited = time.perf_counter() - started
+        metrics.record_admission(agent, "admitted" if immediate else "queued", waited)
+
+    def release(self, agent: str, client: Optional[str], seconds: float) -> None:
+        self._limiter(agent).release()
+        self._release_client(client)
+        previous = self._durations.get(agent)
+        self._durations[agent] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+    def _release_client(self, client: Optional[str]) -> None:
+        if client is None:
+            return
+        remaining = self._clients.get(client, 0) - 1
+        if remaining > 0:
+            self._clients[client] = remaining
+        else:
+            self._clients.pop(client, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "agents": {
+                agent: {"limit": limiter.limit, "active": limiter.active, "queued": limiter.queued}
+                for agent, limiter in self._limiters.items()
+            },
+            "clients": len(self._clients),
+        }
+
+
+admission_controller = AdmissionController(
+    _parse_limits(ADMISSION_AGENT_LIMITS),
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_PER_CLIENT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+
+
+# ASGI middleware gating agent runs under `prefix`; everything else passes straight through.
+# Runs of agents not in `agents` share one "other" limit, so made-up names cannot add limiters.
+class AdmissionMiddleware:
+    def __init__(
+        self,
+        app: Callable,
+        agents: Iterable[str],
+        prefix: str = "/copilotkit",
+        controller: AdmissionController = admission_controller,
+    ):
+        self.app = app
+        self.agents = set(agents)
+        self.prefix = prefix.rstrip("/")
+        self.controller = controller
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or scope.get("method") != "POST" or not path.startswith(self.prefix + "/"):
+            await self.app(scope, receive, send)
+            return
+        route = path[len(self.prefix):]
+        match = _AGENT_PATH.match(route)
+        if not match and route != _EXECUTE_PATH:
+            await self.app(scope, receive, send)
+            return
+        payload, receive = await self._read_body(receive)
+        agent = match.group(1) if match else str(payload.get("name") or "unknown")
+        if agent not in self.agents:
+            agent = "other"
+
+        client = self._client(scope)
+        queue_key = client or f"thread:{payload.get('threadId') or 'unknown'}"
+        try:
+            await self.controller.admit(agent, queue_key, client)
+        except Rejection as rejection:
+            await self._reject(send, rejection)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(agent, client, time.perf_counter() - started)
+
+    # The gateway-supplied client id, or None when clients are not identified
+    def _client(self, scope: Dict[str, Any]) -> Optional[str]:
+        if ADMISSION_CLIENT_HEADER:
+            for name, value in scope.get("headers", []):
+                if name.decode("latin-1") == ADMISSION_CLIENT_HEADER:
+                    return value.decode("latin-1")
+        return None
+
+    # Read the (small JSON) body for the agent name and thread id, and hand the app a receive that replays it
+    async def _read_body(self, receive: Callable) -> Tuple[Dict[str, Any], Callable]:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        replayed = False
+
+        async def replay() -> Dict[str, Any]:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return payload if isinstance(payload, dict) else {}, replay
+
+    async def _reject(self, send: Callable, rejection: Rejection) -> None:
+        body = json.dumps({"error": rejection.reason, "retry_after": rejection.retry_after}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": rejection.status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"retry-after", str(rejection.retry_after).encode("ascii")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
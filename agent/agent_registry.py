@@ -0,0 +1,96 @@
+"""
+Deferred construction of the CopilotKit SDK and both agent graphs.
+
+Importing the agents pulls in copilotkit, langgraph, langchain_google_genai and
+google-genai and compiles both graphs, which takes seconds. main.py serves
+/healthz without them: they are built on a worker thread on the first agent
+request, or right after startup when AGENT_WARMUP=true, so a scale-to-zero
+instance answers liveness checks immediately and reports readiness on /readyz
+once the agents are loaded.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "true").lower() == "true"
+
+# Known up front so admission control can be configured before the agents load
+AGENT_NAMES = ("post_generation_agent", "stack_analysis_agent")
+
+logger = logging.getLogger(__name__)
+
+_sdk: Optional[Any] = None
+_loading: Optional["asyncio.Future[Any]"] = None
+_load_seconds: Optional[float] = None
+_load_error: Optional[str] = None
+
+
+# Import both agents and build the SDK; runs on a worker thread
+def _build_sdk() -> Any:
+    global _sdk, _load_seconds, _load_error
+    started = time.perf_counter()
+    try:
+        from copilotkit import CopilotKitSDK, LangGraphAgent
+        from posts_generator_agent import post_generation_graph
+        from stack_agent import stack_analysis_graph
+
+        sdk = CopilotKitSDK(
+            agents=[
+                LangGraphAgent(
+                    name="post_generation_agent",
+                    description="An agent that can help with the generation of LinkedIn posts and X posts.",
+                    graph=post_generation_graph,
+                ),
+                LangGraphAgent(
+                    name="stack_analysis_agent",
+                    description="Analyze a GitHub repository URL to infer purpose and tech stack (frontend, backend, DB, infra).",
+                    graph=stack_analysis_graph,
+                ),
+            ]
+        )
+    except Exception as e:
+        _load_error = f"{type(e).__name__}: {e}"
+        raise
+    _load_seconds = time.perf_counter() - started
+    _load_error = None
+    _sdk = sdk
+    logger.info("agents loaded in %.2f s", _load_seconds)
+    return sdk
+
+
+# Start loading the agents if nobody has yet; safe to call repeatedly
+def start_loading() -> "asyncio.Future[Any]":
+    global _loading
+    if _loading is None:
+        _loading = asyncio.ensure_future(asyncio.to_thread(_build_sdk))
+    return _loading
+
+
+# The SDK, loading the agents first if needed. A failed load is retried by the next caller.
+async def get_sdk() -> Any:
+    global _loading
+    if _sdk is not None:
+        return _sdk
+    loading = start_loading()
+    try:
+        return await asyncio.shield(loading)
+    except Exception:
+        if _loading is loading:
+            _loading = None
+        raise
+
+
+def is_ready() -> bool:
+    return _sdk is not None
+
+
+def status() -> Dict[str, Any]:
+    return {
+        "ready": _sdk is not None,
+        "loading": _sdk is None and _loading is not None and not _loading.done(),
+        "load_seconds": round(_load_seconds, 3) if _load_seconds is not None else None,
+        "error": _load_error,
+    }
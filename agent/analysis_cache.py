@@ -0,0 +1,122 @@
+"""
+Result cache for whole stack analyses with single-flight deduplication.
+
+Keys are (owner, repo, HEAD commit SHA, prompt version), so an entry stays valid
+until the repository moves or the analysis prompt changes. Concurrent requests
+for the same key share one in-flight computation. It runs detached from every
+request (in a fresh context, so no request's callbacks or metrics span see it)
+and hands its progress to each waiter's listener, so every requester shows the
+same progress and one going away affects no one else.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+ANALYSIS_CACHE_TTL_SECONDS = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256"))
+
+AnalysisKey = Tuple[str, str, str, str]
+# Receives each progress update of a shared computation
+Listener = Callable[[Dict[str, Any]], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[AnalysisKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[AnalysisKey, "asyncio.Task[Optional[Dict[str, Any]]]"] = {}
+        self._listeners: Dict[AnalysisKey, List[Listener]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: AnalysisKey) -> Optional[Dict[str, Any]]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if time.time() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: AnalysisKey, value: Dict[str, Any]) -> None:
+        self._entries[key] = (time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # Return (result, computed_here). Results of None are not cached.
+    # `compute` is given a publish callable for its progress updates, which reach
+    # `listener` for as long as this caller waits.
+    async def get_or_compute(
+        self,
+        key: AnalysisKey,
+        compute: Callable[[Listener], Awaitable[Optional[Dict[str, Any]]]],
+        listener: Optional[Listener] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, False
+
+        task = self._inflight.get(key)
+        computed_here = task is None
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            listeners: List[Listener] = []
+            self._listeners[key] = listeners
+
+            async def publish(update: Dict[str, Any]) -> None:
+                for notify in list(listeners):
+                    try:
+                        await notify(update)
+                    except Exception:
+                        logger.exception("analysis progress listener failed")
+
+            # The computation owns storing its result so it still lands in the cache
+            # when the requester that started it goes away
+            async def _run() -> Optional[Dict[str, Any]]:
+                try:
+                    result = await compute(publish)
+                    if result is not None:
+                        self.set(key, result)
+                    return result
+                finally:
+                    self._inflight.pop(key, None)
+                    self._listeners.pop(key, None)
+
+            task = asyncio.get_running_loop().create_task(_run(), context=contextvars.Context())
+            self._inflight[key] = task
+
+        listeners = self._listeners.get(key)
+        if listener is not None and listeners is not None:
+            listeners.append(listener)
+        try:
+            # Shield so a disconnecting waiter does not cancel the shared work
+            return await asyncio.shield(task), computed_here
+        finally:
+            if listener is not None and listeners is not None and listener in listeners:
+                listeners.remove(listener)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+        }
+
+
+analysis_cache = AnalysisCache(ANALYSIS_CACHE_TTL_SECONDS, ANALYSIS_CACHE_MAX_ENTRIES)
@@ -0,0 +1,330 @@
+"""
+Single-pass repository ingestion from a tarball, zip archive or local clone.
+
+Produces the same README / manifests / languages / root_files pieces that the
+REST fetchers gather, without extracting anything to disk. Remote tarballs are
+streamed from GitHub through the shared client into tarfile's stream reader.
+"""
+
+import asyncio
+import io
+import os
+import re
+import tarfile
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Pattern, Set
+
+ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", str(256 * 1024 * 1024)))
+ARCHIVE_MAX_FILE_BYTES = int(os.getenv("ARCHIVE_MAX_FILE_BYTES", str(256 * 1024)))
+# When set, <dir>/<owner>/<repo> clones and <dir>/<owner>-<repo>.tar.gz|.tgz|.tar|.zip archives are used instead of the network
+STACK_ARCHIVE_DIR = os.getenv("STACK_ARCHIVE_DIR")
+
+README_NAMES = {"readme.md", "readme", "readme.txt", "readme.rst"}
+# Listed with the root entries so CI detection sees it without the workflow files themselves
+WORKFLOWS_DIR = ".github/workflows"
+IGNORED_DIRS = {"node_modules", "vendor", "dist", "build", ".venv", "venv", "__pycache__", ".git"}
+
+# File extension -> language name as reported by the GitHub languages API
+EXTENSION_LANGUAGES = {
+    ".py": "Python",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".mjs": "JavaScript",
+    ".cjs": "JavaScript",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".java": "Java",
+    ".kt": "Kotlin",
+    ".kts": "Kotlin",
+    ".rb": "Ruby",
+    ".php": "PHP",
+    ".cs": "C#",
+    ".c": "C",
+    ".h": "C",
+    ".cpp": "C++",
+    ".cc": "C++",
+    ".hpp": "C++",
+    ".swift": "Swift",
+    ".scala": "Scala",
+    ".dart": "Dart",
+    ".vue": "Vue",
+    ".svelte": "Svelte",
+    ".css": "CSS",
+    ".scss": "SCSS",
+    ".html": "HTML",
+    ".sh": "Shell",
+    ".bat": "Batchfile",
+    ".ps1": "PowerShell",
+    ".sql": "SQL",
+    ".ex": "Elixir",
+    ".exs": "Elixir",
+    ".lua": "Lua",
+    ".r": "R",
+    ".ipynb": "Jupyter Notebook",
+    ".hcl": "HCL",
+    ".tf": "HCL",
+}
+
+
+_SHA_RE = re.compile(r"^[0-9a-f]{7,40}$")
+
+
+class ArchiveTooLarge(Exception):
+    pass
+
+
+@dataclass
+class ArchiveLimits:
+    manifest_pattern: Pattern[str]
+    max_depth: int
+    max_manifests: int
+    max_manifest_bytes: int
+    max_total_bytes: int = ARCHIVE_MAX_BYTES
+    max_file_bytes: int = ARCHIVE_MAX_FILE_BYTES
+
+
+@dataclass
+class ArchiveContents:
+    languages: Dict[str, int] = field(default_factory=dict)
+    readme: str = ""
+    root_files: List[str] = field(default_factory=list)
+    manifests: Dict[str, str] = field(default_factory=dict)
+    commit_hint: Optional[str] = None
+
+    def to_context(self) -> Dict[str, Any]:
+        return {
+            "languages": self.languages,
+            "readme": self.readme,
+            "root_files": self.root_files,
+            "manifests": self.manifests,
+        }
+
+
+# Accumulates per-entry results while enforcing the byte limits
+class _Collector:
+    def __init__(self, limits: ArchiveLimits):
+        self.limits = limits
+        self.contents = ArchiveContents()
+        self._seen_root: Set[str] = set()
+        self._streamed = 0
+        self._manifest_bytes = 0
+
+    # Decide whether an entry's body is needed: "readme", "manifest" or None
+    def classify(self, path: str, size: int) -> Optional[str]:
+        self._streamed += size
+        if self._streamed > self.limits.max_total_bytes:
+            raise ArchiveTooLarge(f"archive exceeds {self.limits.max_total_bytes} bytes")
+
+        parts = path.split("/")
+        self._note_root(parts, is_dir=False)
+        if path.startswith(WORKFLOWS_DIR + "/") and WORKFLOWS_DIR not in self._seen_root:
+            self._seen_root.add(WORKFLOWS_DIR)
+            self.contents.root_files.append(f"{WORKFLOWS_DIR} (dir)")
+        if IGNORED_DIRS.intersection(parts[:-1]):
+            return None
+
+        language = EXTENSION_LANGUAGES.get(os.path.splitext(parts[-1])[1].lower())
+        if language:
+            self.contents.languages[language] = self.contents.languages.get(language, 0) + size
+
+        if size > self.limits.max_file_bytes:
+            return None
+        if len(parts) == 1 and parts[0].lower() in README_NAMES and not self.contents.readme:
+            return "readme"
+        if (
+            self.limits.manifest_pattern.search(path)
+            and len(parts) - 1 <= self.limits.max_depth
+            and len(self.contents.manifests) < self.limits.max_manifests
+            and self._manifest_bytes + size <= self.limits.max_manifest_bytes
+        ):
+            self._manifest_bytes += size
+            return "manifest"
+        return None
+
+    def add(self, kind: str, path: str, data: bytes) -> None:
+        text = data.decode("utf-8", errors="ignore")
+        if kind == "readme":
+            self.contents.readme = text
+        else:
+            self.contents.manifests[path] = text
+
+    def note_dir(self, path: str) -> None:
+        self._note_root(path.rstrip("/").split("/"), is_dir=True)
+
+    def _note_root(self, parts: List[str], is_dir: bool) -> None:
+        name = parts[0]
+        if not name or name in self._seen_root:
+            return
+        self._seen_root.add(name)
+        kind = "dir" if is_dir or len(parts) > 1 else "file"
+        self.contents.root_files.append(f"{name} ({kind})")
+
+
+# Strips the single top-level directory that GitHub (and most tar invocations) wrap archives in
+class _PrefixStripper:
+    def __init__(self):
+        self.prefix: Optional[str] = None
+
+    def __call__(self, name: str, is_dir: bool) -> str:
+        while name.startswith("./"):
+            name = name[2:]
+        if self.prefix is None:
+            top = name.rstrip("/")
+            self.prefix = top + "/" if is_dir and top and "/" not in top else ""
+            if self.prefix:
+                return ""
+        if self.prefix and name.startswith(self.prefix):
+            return name[len(self.prefix):]
+        return name
+
+    # GitHub archives are named "owner-repo-<short sha>/"
+    @property
+    def commit_hint(self) -> Optional[str]:
+        if not self.prefix:
+            return None
+        hint = self.prefix.rstrip("/").rsplit("-", 1)[-1]
+        return hint if _SHA_RE.match(hint) else None
+
+
+def ingest_tar_stream(fileobj: io.IOBase, limits: ArchiveLimits) -> ArchiveContents:
+    collector = _Collector(limits)
+    strip = _PrefixStripper()
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            path = strip(member.name, member.isdir())
+            if not path:
+                continue
+            if member.isdir():
+                collector.note_dir(path)
+                continue
+            if not member.isfile():
+                continue
+            kind = collector.classify(path, member.size)
+            if kind:
+                extracted = archive.extractfile(member)
+                if extracted is not None:
+                    collector.add(kind, path, extracted.read())
+    collector.contents.commit_hint = strip.commit_hint
+    return collector.contents
+
+
+def ingest_zip(path: str, limits: ArchiveLimits) -> ArchiveContents:
+    collector = _Collector(limits)
+    strip = _PrefixStripper()
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            rel = strip(info.filename, info.is_dir())
+            if not rel:
+                continue
+            if info.is_dir():
+                collector.note_dir(rel)
+                continue
+            kind = collector.classify(rel, info.file_size)
+            if kind:
+                collector.add(kind, rel, archive.read(info))
+    collector.contents.commit_hint = strip.commit_hint
+    return collector.contents
+
+
+def ingest_directory(root: str, limits: ArchiveLimits) -> ArchiveContents:
+    collector = _Collector(limits)
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        for dirname in dirnames:
+            if dirname != ".git":
+                collector.note_dir(rel_dir + dirname)
+        dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            try:
+                size = os.path.getsize(full_path)
+            except OSError:
+                continue
+            rel = rel_dir + filename
+            kind = collector.classify(rel, size)
+            if kind:
+                with open(full_path, "rb") as f:
+                    collector.add(kind, rel, f.read())
+    return collector.contents
+
+
+# Ingest a local clone directory or a .tar/.tar.gz/.tgz/.zip archive
+def ingest_path(path: str, limits: ArchiveLimits) -> ArchiveContents:
+    if os.path.isdir(path):
+        return ingest_directory(path, limits)
+    if zipfile.is_zipfile(path):
+        return ingest_zip(path, limits)
+    with open(path, "rb") as f:
+        return ingest_tar_stream(f, limits)
+
+
+# Locate a local clone or archive for owner/repo under STACK_ARCHIVE_DIR
+def find_local_source(owner: str, repo: str, archive_dir: Optional[str] = STACK_ARCHIVE_DIR) -> Optional[str]:
+    if not archive_dir:
+        return None
+    candidates = [os.path.join(archive_dir, owner, repo)] + [
+        os.path.join(archive_dir, f"{owner}-{repo}{ext}") for ext in (".tar.gz", ".tgz", ".tar", ".zip")
+    ]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+# Minimal read-only file object over an iterator of byte chunks
+class _ChunkReader(io.RawIOBase):
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class ArchiveAborted(Exception):
+    pass
+
+
+# Ingest a tarball arriving as an async byte stream without buffering the whole archive.
+# tarfile only reads synchronously, so it runs on a worker thread that pulls each chunk
+# from the event loop; when the caller is cancelled the thread stops at the next chunk.
+async def ingest_tar_chunks(chunks: AsyncIterator[bytes], limits: ArchiveLimits) -> ArchiveContents:
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+
+    async def pull() -> bytes:
+        async for chunk in chunks:
+            if chunk:
+                return chunk
+        return b""
+
+    def next_chunk() -> bytes:
+        if stop.is_set():
+            raise ArchiveAborted("archive ingestion cancelled")
+        return asyncio.run_coroutine_threadsafe(pull(), loop).result()
+
+    reader = io.BufferedReader(_ChunkReader(iter(next_chunk, b"")), buffer_size=64 * 1024)
+    ingestion = asyncio.ensure_future(asyncio.to_thread(ingest_tar_stream, reader, limits))
+    try:
+        return await asyncio.shield(ingestion)
+    except asyncio.CancelledError:
+        stop.set()
+        # The thread ends with ArchiveAborted, which nobody is waiting for any more
+        ingestion.add_done_callback(lambda done: done.cancelled() or done.exception())
+        raise
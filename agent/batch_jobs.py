@@ -0,0 +1,349 @@
+"""
+Batch stack analysis: many repositories per job, outside the chat graph.
+
+Each repository goes through the same gather and analyze stages as the stack
+agent, but as a bounded job queue: at most BATCH_GATHER_CONCURRENCY repositories
+are read from GitHub at once and at most BATCH_ANALYZE_CONCURRENCY are with the
+model, across all jobs in the process. GitHub requests of a job share one fair
+queueing session, so a large batch does not starve chat users.
+
+Results are appended to BATCH_RESULTS_DIR/<job_id>.ndjson as they complete, next
+to <job_id>.json holding the requested URLs. Jobs left unfinished by a restart are
+resumed on startup and only the missing repositories are analyzed again; a
+repository that hit the GitHub rate limit counts as missing once the limit has
+reset, and the job is retried then. A job is owned by the
+process holding the lock on its results file, so several workers never run the
+same job; the others follow it by polling the file.
+"""
+
+import asyncio
+import fcntl
+import importlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, IO, List, Optional
+
+import github_client
+
+BATCH_RESULTS_DIR = os.getenv("BATCH_RESULTS_DIR", "batch_results")
+BATCH_GATHER_CONCURRENCY = int(os.getenv("BATCH_GATHER_CONCURRENCY", "4"))
+BATCH_ANALYZE_CONCURRENCY = int(os.getenv("BATCH_ANALYZE_CONCURRENCY", "2"))
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "500"))
+# How often a job running in another worker is re-read from disk
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "1"))
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+logger = logging.getLogger(__name__)
+
+
+# On-disk job metadata and append-only NDJSON results
+class BatchStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def results_path(self, job_id: str) -> str:
+        return os.path.join(self.root, f"{job_id}.ndjson")
+
+    def create(self, urls: List[str]) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        with open(self._meta_path(job_id), "w") as f:
+            json.dump({"job_id": job_id, "urls": urls, "created_at": time.time()}, f)
+        return job_id
+
+    def exists(self, job_id: str) -> bool:
+        return bool(JOB_ID_PATTERN.match(job_id)) and os.path.exists(self._meta_path(job_id))
+
+    def urls(self, job_id: str) -> List[str]:
+        with open(self._meta_path(job_id)) as f:
+            return json.load(f)["urls"]
+
+    # Latest record per URL; a torn last line from a crash is ignored
+    def results(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        records: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.results_path(job_id)) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    records[record["url"]] = record
+        except FileNotFoundError:
+            pass
+        return records
+
+    def job_ids(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return [name[:-5] for name in os.listdir(self.root) if name.endswith(".json") and JOB_ID_PATTERN.match(name[:-5])]
+
+    # Open the results file for appending and lock it; None when another process holds the job
+    def claim(self, job_id: str) -> Optional[IO[str]]:
+        f = open(self.results_path(job_id), "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        # Terminate a line torn by a crash so the next record starts on its own line
+        with open(self.results_path(job_id), "rb") as existing:
+            if existing.seek(0, os.SEEK_END) > 0:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b"\n":
+                    f.write("\n")
+                    f.flush()
+        return f
+
+
+# A job running in this process: its results so far, and a condition for followers
+class BatchJob:
+    def __init__(self, job_id: str, urls: List[str], results: Dict[str, Dict[str, Any]]):
+        self.job_id = job_id
+        self.urls = urls
+        self.results: List[Dict[str, Any]] = list(results.values())
+        self.done = False
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed = asyncio.Condition()
+
+    async def add(self, record: Dict[str, Any]) -> None:
+        async with self._changed:
+            self.results.append(record)
+            self._changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    # Yield every result, including the ones recorded before the caller started following
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.results) > sent or self.done)
+                new, done = self.results[sent:], self.done
+            for record in new:
+                yield record
+            sent += len(new)
+            if done and sent == len(self.results):
+                return
+
+
+def _needs_run(record: Optional[Dict[str, Any]]) -> bool:
+    return record is None or record["status"] == "rate_limited"
+
+
+# Whether the repository can be analyzed now: rate limited ones wait for the limit to reset
+def _due(record: Optional[Dict[str, Any]], now: float) -> bool:
+    return _needs_run(record) and (record is None or record.get("retry_at", 0) <= now)
+
+
+# Runs batch jobs with process-wide gather and analyze concurrency limits
+class BatchRunner:
+    def __init__(self, store: BatchStore, gather_concurrency: int, analyze_concurrency: int):
+        self.store = store
+        self.gather_concurrency = gather_concurrency
+        self.analyze_concurrency = analyze_concurrency
+        self.jobs: Dict[str, BatchJob] = {}
+        self._retries: Dict[str, asyncio.TimerHandle] = {}
+        self._gather_slots: Optional[asyncio.Semaphore] = None
+        self._analyze_slots: Optional[asyncio.Semaphore] = None
+
+    def submit(self, urls: List[str]) -> BatchJob:
+        job_id = self.store.create(urls)
+        job = self._start(job_id)
+        if job is None:
+            raise RuntimeError(f"batch job {job_id} could not be started")
+        return job
+
+    # Start (or resume) a stored job here unless nothing in it is due or another process runs it.
+    # Rate limited repositories are retried once their limit has reset.
+    def _start(self, job_id: str) -> Optional[BatchJob]:
+        urls = self.store.urls(job_id)
+        results = self.store.results(job_id)
+        pending = [url for url in urls if _due(results.get(url), time.time())]
+        if not pending:
+            self._schedule_retry(job_id, results)
+            return None
+        out = self.store.claim(job_id)
+        if out is None:
+            return None
+        # Re-read under the lock: the previous owner may have written more before exiting
+        results = self.store.results(job_id)
+        now = time.time()
+        pending = [url for url in urls if _due(results.get(url), now)]
+        job = BatchJob(job_id, urls, {url: r for url, r in results.items() if not _due(r, now)})
+        job.task = asyncio.ensure_future(self._run(job, pending, out))
+        self.jobs[job_id] = job
+        return job
+
+    # Resume every unfinished job found on disk; called on startup
+    def resume_pending(self) -> List[str]:
+        resumed = [job_id for job_id in self.store.job_ids() if self._start(job_id) is not None]
+        if resumed:
+            logger.info("resumed %d batch job(s): %s", len(resumed), ", ".join(resumed))
+        return resumed
+
+    async def _run(self, job: BatchJob, pending: List[str], out: IO[str]) -> None:
+        if self._gather_slots is None:
+            self._gather_slots = asyncio.Semaphore(self.gather_concurrency)
+            self._analyze_slots = asyncio.Semaphore(self.analyze_concurrency)
+
+        async def run_one(url: str) -> None:
+            record = await self._analyze_one(job.job_id, url)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            await job.add(record)
+
+        try:
+            await asyncio.gather(*(run_one(url) for url in pending))
+        finally:
+            out.close()
+            await job.finish()
+            self.jobs.pop(job.job_id, None)
+        self._schedule_retry(job.job_id, self.store.results(job.job_id))
+
+    # Start the job again when the earliest rate limit among its results resets
+    def _schedule_retry(self, job_id: str, results: Dict[str, Dict[str, Any]]) -> None:
+        retry_at = [r.get("retry_at", 0) for r in results.values() if r["status"] == "rate_limited"]
+        if not retry_at or job_id in self._retries:
+            return
+
+        def retry() -> None:
+            self._retries.pop(job_id, None)
+            if job_id not in self.jobs:
+                self._start(job_id)
+
+        delay = max(0.0, min(retry_at) - time.time())
+        self._retries[job_id] = asyncio.get_running_loop().call_later(delay, retry)
+
+    async def _analyze_one(self, job_id: str, url: str) -> Dict[str, Any]:
+        # Imported on first use, off the event loop: the stack agent pulls in langgraph and the
+        # model clients, which main.py defers until an agent is needed
+        await asyncio.to_thread(importlib.import_module, "stack_agent")
+        from langchain_core.runnables import RunnableConfig
+        from state_emitter import NullEmitter
+        from stack_agent import _parse_github_url, analyze_context, gather_repository
+
+        started = time.perf_counter()
+        record: Dict[str, Any] = {"url": url}
+        parsed = _parse_github_url(url)
+        if not parsed:
+            return {**record, "status": "error", "error": "not a GitHub repository URL"}
+        owner, repo = parsed
+        record["repo"] = f"{owner}/{repo}"
+
+        # When the exhausted rate limit resets; None unless it was hit
+        retry_at: Optional[float] = None
+
+        async def on_throttled(seconds: float, waiting: bool) -> None:
+            nonlocal retry_at
+            if not waiting:
+                retry_at = max(retry_at or 0, time.time() + seconds)
+
+        try:
+            async with self._gather_slots:
+                github_client.set_session(f"batch:{job_id}")
+                github_client.set_throttle_listener(on_throttled)
+                context = await gather_repository(owner, repo)
+            if retry_at is not None:
+                return {
+                    **record,
+                    "status": "rate_limited",
+                    "error": "GitHub rate limit exhausted",
+                    "retry_at": round(retry_at, 3),
+                }
+            if not context.get("repo_info") and not context.get("manifests"):
+                return {**record, "status": "error", "error": "repository not found or not readable"}
+            async with self._analyze_slots:
+                state = {
+                    "tool_logs": [{"id": "batch", "message": "Analyzing stack", "status": "processing"}],
+                    "analysis": "",
+                    "last_user_content": url,
+                }
+                result, cached = await analyze_context(state, RunnableConfig(), NullEmitter({}), context)
+        except Exception as e:
+            logger.exception("batch analysis of %s failed", url)
+            return {**record, "status": "error", "error": str(e) or type(e).__name__}
+        if result is None:
+            return {**record, "status": "error", "error": "no analysis was produced"}
+        return {
+            **record,
+            "status": "ok",
+            "head_sha": context.get("head_sha"),
+            "analysis": result["structured"],
+            "summary": result["summary"],
+            "cached": cached,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    # Every result of a job, followed live until it finishes; None for an unknown job
+    def follow(self, job_id: str) -> Optional[AsyncIterator[Dict[str, Any]]]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.follow()
+        if not self.store.exists(job_id):
+            return None
+        return self._follow_stored(job_id)
+
+    # Replay a job from disk, polling while another worker is still running it. A job whose
+    # remaining repositories all wait for a rate limit reset ends the replay early.
+    async def _follow_stored(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        urls = self.store.urls(job_id)
+        sent: Dict[str, str] = {}
+        while True:
+            results = self.store.results(job_id)
+            for url, record in results.items():
+                if sent.get(url) != record["status"]:
+                    sent[url] = record["status"]
+                    yield record
+            if not any(_needs_run(results.get(url)) for url in urls):
+                return
+            # Nobody holds the lock: the job is unfinished and orphaned, pick it up here
+            job = self.jobs.get(job_id) or self._start(job_id)
+            if job is not None:
+                async for record in job.follow():
+                    if sent.get(record["url"]) != record["status"]:
+                        sent[record["url"]] = record["status"]
+                        yield record
+                return
+            now = time.time()
+            if not any(_due(results.get(url), now) for url in urls):
+                return
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        urls = self.store.urls(job_id)
+        results = self.store.results(job_id)
+        counts: Dict[str, int] = {}
+        for record in results.values():
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return {
+            "job_id": job_id,
+            "total": len(urls),
+            "running": job_id in self.jobs,
+            "done": not any(_needs_run(results.get(url)) for url in urls),
+            "counts": counts,
+        }
+
+    # Stop running jobs; their results are on disk and they resume on the next start
+    async def aclose(self) -> None:
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        tasks = [job.task for job in self.jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+batch_runner = BatchRunner(BatchStore(BATCH_RESULTS_DIR), BATCH_GATHER_CONCURRENCY, BATCH_ANALYZE_CONCURRENCY)
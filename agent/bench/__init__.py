@@ -0,0 +1,5 @@
+"""
+Offline benchmark harness: fake GitHub and Gemini backends and an end-to-end runner.
+
+See bench/run.py for usage.
+"""
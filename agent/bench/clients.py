@@ -0,0 +1,56 @@
+"""
+Micro-benchmark for the shared Gemini client registry in model_clients.
+
+Times constructing ChatGoogleGenerativeAI and genai.Client per request against
+fetching the shared instances. No network calls are made.
+
+Run from agent/:
+    python -m bench.clients --iterations 20
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+    from google import genai
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    from model_clients import get_chat_model, get_genai_client
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        ChatGoogleGenerativeAI(
+            model="gemini-2.5-pro",
+            temperature=0.4,
+            max_retries=2,
+            google_api_key=os.environ["GOOGLE_API_KEY"],
+        )
+        genai.Client(api_key=os.environ["GOOGLE_API_KEY"])
+    fresh = (time.perf_counter() - started) / args.iterations
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        get_chat_model()
+        get_genai_client()
+    shared = (time.perf_counter() - started) / args.iterations
+
+    print(f"fresh clients per request:  {fresh * 1000:.2f} ms")
+    print(f"shared clients per request: {shared * 1000:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
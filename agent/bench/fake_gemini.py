@@ -0,0 +1,167 @@
+"""
+Stand-ins for the Gemini clients with configurable latency, streaming and tool-call output.
+
+FakeGeminiChatModel replaces ChatGoogleGenerativeAI: when a known tool is bound it
+answers with that tool's canned arguments, otherwise with plain text. Output is
+streamed in `chunks` pieces after `first_token_latency` (plus `prefill_per_1k_tokens`
+for every thousand input tokens), `chunk_latency` apart.
+FakeGenaiClient covers the grounded google-genai search call in chat_node.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+DEFAULT_TOOL_OUTPUTS: Dict[str, Dict[str, Any]] = {
+    "return_stack_analysis": {
+        "purpose": "An AI assistant that drafts social posts and explains repositories.",
+        "frontend": {"framework": "Next.js", "language": "TypeScript", "styling": "Tailwind CSS"},
+        "backend": {"framework": "FastAPI", "language": "Python", "architecture": "LangGraph agents behind a FastAPI server"},
+        "key_root_files": [{"file": "package.json", "description": "Frontend dependencies and scripts"}],
+        "how_to_run": {"summary": "Install and start both apps", "steps": ["pnpm install", "pnpm dev"]},
+        "risks_notes": [{"area": "Testing", "note": "No automated tests"}],
+        "summary": "A Next.js frontend talking to FastAPI LangGraph agents.",
+    },
+    "generate_post": {
+        "tweet": {"title": "Benchmarks", "content": "Measuring agents offline, no API keys needed. #perf"},
+        "linkedIn": {"title": "Benchmarks", "content": "We now benchmark our agents against local stand-ins."},
+    },
+}
+
+
+@dataclass
+class FakeLatency:
+    first_token_latency: float = 0.4
+    chunk_latency: float = 0.02
+    chunks: int = 8
+    # Extra time to first token per 1000 input tokens, so long prompts are slower
+    prefill_per_1k_tokens: float = 0.0
+
+
+def _tool_names(tools: List[Any]) -> List[str]:
+    names = []
+    for tool in tools or []:
+        if isinstance(tool, dict):
+            names.append(tool.get("name") or tool.get("function", {}).get("name"))
+        else:
+            names.append(getattr(tool, "name", None))
+    return [name for name in names if name]
+
+
+def _split(text: str, pieces: int) -> List[str]:
+    size = max(1, -(-len(text) // max(pieces, 1)))
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _input_tokens(messages: List[BaseMessage]) -> int:
+    return sum(len(str(message.content)) for message in messages) // 4
+
+
+class FakeGeminiChatModel(BaseChatModel):
+    model: str = "fake-gemini"
+    latency: FakeLatency = Field(default_factory=FakeLatency)
+    tool_outputs: Dict[str, Dict[str, Any]] = DEFAULT_TOOL_OUTPUTS
+    text_output: str = "Here is a concise summary of the result."
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        return self.bind(tool_names=_tool_names(tools), **kwargs)
+
+    def _plan(self, tool_names: Optional[List[str]]) -> Optional[str]:
+        return next((name for name in tool_names or [] if name in self.tool_outputs), None)
+
+    def _first_token_latency(self, messages: List[BaseMessage]) -> float:
+        return self.latency.first_token_latency + self.latency.prefill_per_1k_tokens * _input_tokens(messages) / 1000
+
+    def _total_latency(self, messages: List[BaseMessage]) -> float:
+        return self._first_token_latency(messages) + self.latency.chunk_latency * (self.latency.chunks - 1)
+
+    def _chunks(self, messages: List[BaseMessage], tool_names: Optional[List[str]]) -> List[AIMessageChunk]:
+        tool = self._plan(tool_names)
+        text = json.dumps(self.tool_outputs[tool]) if tool else self.text_output
+        pieces = _split(text, self.latency.chunks)
+        chunks = []
+        for i, piece in enumerate(pieces):
+            if tool:
+                tool_call_chunks = [{"name": tool if i == 0 else None, "args": piece, "id": "call-1" if i == 0 else None, "index": 0}]
+                chunk = AIMessageChunk(content="", tool_call_chunks=tool_call_chunks)
+            else:
+                chunk = AIMessageChunk(content=piece)
+            chunks.append(chunk)
+        chunks[-1].usage_metadata = {
+            "input_tokens": _input_tokens(messages),
+            "output_tokens": len(text) // 4,
+            "total_tokens": _input_tokens(messages) + len(text) // 4,
+        }
+        chunks[-1].response_metadata = {"model_name": self.model}
+        return chunks
+
+    def _result(self, chunks: List[AIMessageChunk]) -> ChatResult:
+        merged = chunks[0]
+        for chunk in chunks[1:]:
+            merged = merged + chunk
+        message = AIMessage(
+            content=merged.content,
+            tool_calls=merged.tool_calls,
+            usage_metadata=merged.usage_metadata,
+            response_metadata=merged.response_metadata,
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tool_names=None, **kwargs) -> ChatResult:
+        time.sleep(self._total_latency(messages))
+        return self._result(self._chunks(messages, tool_names))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tool_names=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._total_latency(messages))
+        return self._result(self._chunks(messages, tool_names))
+
+    def _stream(self, messages, stop=None, run_manager=None, tool_names=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        for i, chunk in enumerate(self._chunks(messages, tool_names)):
+            time.sleep(self._first_token_latency(messages) if i == 0 else self.latency.chunk_latency)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, tool_names=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        for i, chunk in enumerate(self._chunks(messages, tool_names)):
+            await asyncio.sleep(self._first_token_latency(messages) if i == 0 else self.latency.chunk_latency)
+            yield ChatGenerationChunk(message=chunk)
+
+
+# Minimal google-genai client: client.aio.models.generate_content(_stream)
+class FakeGenaiClient:
+    def __init__(self, latency: FakeLatency, text: str = "Recent coverage says offline benchmarks catch regressions early. " * 4):
+        self.latency = latency
+        self.text = text
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self._generate_content, generate_content_stream=self._generate_content_stream)
+        )
+
+    def _chunk(self, text: str, last: bool):
+        metadata = SimpleNamespace(web_search_queries=["offline agent benchmarks"] if last else None)
+        usage = SimpleNamespace(prompt_token_count=600, candidates_token_count=len(self.text) // 4) if last else None
+        return SimpleNamespace(text=text, candidates=[SimpleNamespace(grounding_metadata=metadata)], usage_metadata=usage)
+
+    async def _generate_content(self, model: str, contents: Any, config: Any = None):
+        await asyncio.sleep(self.latency.first_token_latency + self.latency.chunk_latency * (self.latency.chunks - 1))
+        return self._chunk(self.text, last=True)
+
+    async def _generate_content_stream(self, model: str, contents: Any, config: Any = None):
+        pieces = _split(self.text, self.latency.chunks)
+
+        async def stream():
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(self.latency.first_token_latency if i == 0 else self.latency.chunk_latency)
+                yield self._chunk(piece, last=i == len(pieces) - 1)
+
+        return stream()
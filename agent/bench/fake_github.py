@@ -0,0 +1,154 @@
+"""
+Fake GitHub REST and raw-content server backed by the fixture repositories.
+
+Implements the endpoints the stack agent calls (repo metadata, languages, readme,
+commits/HEAD, root contents, recursive git tree, tarball, raw files), including
+ETag revalidation, with a configurable per-request latency.
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import tarfile
+from typing import Dict
+
+from fastapi import FastAPI, Request, Response
+
+from archive_ingest import EXTENSION_LANGUAGES
+from bench.fixtures import head_sha, template_for
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _languages(files: Dict[str, str]) -> Dict[str, int]:
+    languages: Dict[str, int] = {}
+    for path, text in files.items():
+        language = EXTENSION_LANGUAGES.get(os.path.splitext(path)[1].lower())
+        if language:
+            languages[language] = languages.get(language, 0) + len(text)
+    return dict(sorted(languages.items(), key=lambda item: -item[1]))
+
+
+def _tree(files: Dict[str, str]):
+    dirs = set()
+    for path in files:
+        parts = path.split("/")
+        for depth in range(1, len(parts)):
+            dirs.add("/".join(parts[:depth]))
+    entries = [{"path": d, "type": "tree"} for d in dirs]
+    entries += [{"path": path, "type": "blob", "size": len(text)} for path, text in files.items()]
+    return sorted(entries, key=lambda entry: entry["path"])
+
+
+def _tarball(owner: str, repo: str, files: Dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    prefix = f"{owner}-{repo}-{head_sha(owner, repo)[:7]}/"
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        directory = tarfile.TarInfo(prefix)
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for path, text in files.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(prefix + path)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def create_app(latency: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.middleware("http")
+    async def simulate_latency(request: Request, call_next):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    def respond(request: Request, payload, media_type: str = "application/json") -> Response:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        etag = _etag(body)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type=media_type, headers={"ETag": etag})
+
+    def base_url(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    @app.get("/repos/{owner}/{repo}")
+    async def repo_info(owner: str, repo: str, request: Request):
+        files = template_for(repo)
+        if files is None:
+            return Response(status_code=404)
+        return respond(request, {
+            "full_name": f"{owner}/{repo}",
+            "description": files["README.md"].splitlines()[2],
+            "language": next(iter(_languages(files)), None),
+            "default_branch": "main",
+            "topics": ["benchmark"],
+            "stargazers_count": 42,
+            "license": {"spdx_id": "MIT"},
+        })
+
+    @app.get("/repos/{owner}/{repo}/languages")
+    async def languages(owner: str, repo: str, request: Request):
+        files = template_for(repo)
+        return respond(request, _languages(files)) if files is not None else Response(status_code=404)
+
+    @app.get("/repos/{owner}/{repo}/readme")
+    async def readme(owner: str, repo: str, request: Request):
+        files = template_for(repo)
+        if files is None:
+            return Response(status_code=404)
+        content = base64.b64encode(files["README.md"].encode("utf-8")).decode("ascii")
+        return respond(request, {"name": "README.md", "encoding": "base64", "content": content})
+
+    @app.get("/repos/{owner}/{repo}/commits/HEAD")
+    async def head(owner: str, repo: str, request: Request):
+        if template_for(repo) is None:
+            return Response(status_code=404)
+        return respond(request, {"sha": head_sha(owner, repo)})
+
+    @app.get("/repos/{owner}/{repo}/contents/")
+    async def contents(owner: str, repo: str, request: Request):
+        files = template_for(repo)
+        if files is None:
+            return Response(status_code=404)
+        root = base_url(request)
+        items = {}
+        for path in files:
+            name = path.split("/", 1)[0]
+            if "/" in path:
+                items.setdefault(name, {"name": name, "type": "dir", "download_url": None})
+            else:
+                items[name] = {"name": name, "type": "file", "download_url": f"{root}/raw/{owner}/{repo}/main/{name}"}
+        return respond(request, sorted(items.values(), key=lambda item: item["name"]))
+
+    @app.get("/repos/{owner}/{repo}/git/trees/HEAD")
+    async def tree(owner: str, repo: str, request: Request):
+        files = template_for(repo)
+        if files is None:
+            return Response(status_code=404)
+        return respond(request, {"sha": head_sha(owner, repo), "tree": _tree(files), "truncated": False})
+
+    @app.get("/repos/{owner}/{repo}/tarball/{ref}")
+    async def tarball(owner: str, repo: str, ref: str, request: Request):
+        files = template_for(repo)
+        if files is None:
+            return Response(status_code=404)
+        return Response(_tarball(owner, repo, files), media_type="application/gzip")
+
+    @app.get("/raw/{owner}/{repo}/{ref}/{path:path}")
+    async def raw(owner: str, repo: str, ref: str, path: str, request: Request):
+        files = template_for(repo)
+        if files is None or path not in files:
+            return Response(status_code=404)
+        return respond(request, files[path].encode("utf-8"), media_type="text/plain")
+
+    return app
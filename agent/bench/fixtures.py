@@ -0,0 +1,80 @@
+"""
+Fixture repositories served by the fake GitHub backend.
+
+Any "<owner>/<template>-<n>" repository maps onto the template of that name, so a
+benchmark can ask for as many distinct (cold) repositories as it needs.
+"""
+
+import hashlib
+import json
+from typing import Dict, Optional
+
+TEMPLATES: Dict[str, Dict[str, str]] = {
+    "next-fastapi": {
+        "README.md": (
+            "# Acme Copilot\n\nAn AI assistant that drafts social posts and explains repositories.\n\n"
+            "## Tech stack\n\nNext.js frontend with Tailwind CSS, FastAPI agent backend built on LangGraph.\n\n"
+            "## Getting started\n\n```\npnpm install\npnpm dev\ncd agent && poetry install && poetry run python main.py\n```\n\n"
+            "## License\n\nMIT\n"
+        ),
+        "package.json": json.dumps(
+            {
+                "name": "acme-copilot",
+                "packageManager": "pnpm@9.0.0",
+                "scripts": {"dev": "next dev", "build": "next build"},
+                "dependencies": {
+                    "next": "15.0.0",
+                    "react": "19.0.0",
+                    "react-dom": "19.0.0",
+                    "@copilotkit/react-core": "1.9.0",
+                    "@copilotkit/react-ui": "1.9.0",
+                    "zod": "3.23.0",
+                },
+                "devDependencies": {"tailwindcss": "4.0.0", "typescript": "5.6.0"},
+            },
+            indent=2,
+        ),
+        "pnpm-lock.yaml": "lockfileVersion: '9.0'\n",
+        "vercel.json": '{"framework": "nextjs"}\n',
+        "agent/pyproject.toml": (
+            "[tool.poetry]\nname = \"agent\"\n\n[tool.poetry.dependencies]\npython = \"^3.11\"\n"
+            "fastapi = \"^0.115\"\nlanggraph = \"^0.6\"\ncopilotkit = \"^0.1\"\nuvicorn = \"^0.35\"\n\n"
+            "[build-system]\nbuild-backend = \"poetry.core.masonry.api\"\n"
+        ),
+        "agent/requirements.txt": "fastapi>=0.115\nlanggraph==0.6.3\ncopilotkit==0.1.58\nuvicorn[standard]\n",
+        "agent/Dockerfile": "FROM python:3.11-slim\nCOPY . .\nCMD [\"python\", \"main.py\"]\n",
+        "agent/main.py": "from fastapi import FastAPI\n\napp = FastAPI()\n" * 40,
+        "src/app/page.tsx": "export default function Page() {\n  return <main>Acme</main>;\n}\n" * 60,
+        "src/app/layout.tsx": "export default function Layout({ children }) {\n  return children;\n}\n" * 20,
+        ".github/workflows/ci.yml": "name: CI\non: [push]\njobs:\n  build:\n    runs-on: ubuntu-latest\n",
+    },
+    "go-service": {
+        "README.md": (
+            "# Ledger API\n\nA REST service for double-entry bookkeeping.\n\n"
+            "## Architecture\n\nGin HTTP handlers on top of GORM and PostgreSQL.\n\n"
+            "## Usage\n\n```\ndocker compose up\n```\n"
+        ),
+        "go.mod": (
+            "module github.com/acme/ledger\n\ngo 1.22\n\nrequire (\n"
+            "\tgithub.com/gin-gonic/gin v1.10.0\n\tgorm.io/gorm v1.25.10\n\tgithub.com/jackc/pgx/v5 v5.6.0\n)\n"
+        ),
+        "Dockerfile": "FROM golang:1.22\nCOPY . .\nRUN go build -o /ledger\n",
+        "docker-compose.yml": "services:\n  db:\n    image: postgres:16\n  api:\n    build: .\n",
+        "main.go": "package main\n\nfunc main() {}\n" * 120,
+        "internal/ledger/ledger.go": "package ledger\n\ntype Entry struct{}\n" * 80,
+        ".github/workflows/ci.yml": "name: CI\non: [push]\njobs:\n  test:\n    runs-on: ubuntu-latest\n",
+    },
+}
+
+
+# Resolve "<template>-<n>" (or the bare template name) to its file map
+def template_for(repo: str) -> Optional[Dict[str, str]]:
+    if repo in TEMPLATES:
+        return TEMPLATES[repo]
+    base, _, suffix = repo.rpartition("-")
+    return TEMPLATES.get(base) if suffix.isdigit() else None
+
+
+# Deterministic per-repository commit SHA, so distinct repositories never share cache entries
+def head_sha(owner: str, repo: str) -> str:
+    return hashlib.sha1(f"{owner}/{repo}".encode("utf-8")).hexdigest()
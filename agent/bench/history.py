@@ -0,0 +1,146 @@
+"""
+Long-conversation benchmark for the posts agent's history compaction.
+
+Drives one thread through post_generation_graph the way the frontend does: per
+turn, a user request (grounded search, then the generate_post tool call) and the
+tool result (post summary). The fake models take longer to first token as their
+input grows, so per-turn latency tracks the prompt size. The conversation is run
+with compaction off and on, and per-turn latency and model input tokens are
+reported for both.
+
+Run from agent/:
+    python -m bench.history --turns 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from bench.fake_gemini import FakeLatency
+
+GENERATE_POST_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "generate_post",
+        "description": "Render a post",
+        "parameters": {
+            "type": "object",
+            "properties": {"tweet": {"type": "object"}, "linkedIn": {"type": "object"}},
+        },
+    },
+}
+
+TOPICS = [
+    "AI agents in customer support",
+    "observability for LLM applications",
+    "why we moved our CI to ephemeral runners",
+    "lessons from a year of on-call",
+    "vector databases versus plain Postgres",
+    "shipping features behind flags",
+    "the cost of flaky tests",
+    "writing design docs people read",
+]
+
+
+def _input_tokens() -> int:
+    from model_router import tier_stats
+
+    return int(sum(stats["input_tokens"] for stats in tier_stats.snapshot().values()))
+
+
+async def run_conversation(turns: int) -> List[Dict[str, float]]:
+    from posts_generator_agent import post_generation_graph
+
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": 25}
+    samples = []
+    for turn in range(turns):
+        topic = TOPICS[turn % len(TOPICS)]
+        request = (
+            f"Write a LinkedIn and X post about {topic} (turn {turn}). Keep a practical tone, "
+            "mention one concrete example and end with a question for the audience."
+        )
+        tokens_before = _input_tokens()
+        started = time.perf_counter()
+        result = await post_generation_graph.ainvoke(
+            {
+                "messages": [HumanMessage(content=request)],
+                "tool_logs": [],
+                "response": "",
+                "post_drafts": {},
+                "copilotkit": {"actions": [GENERATE_POST_TOOL]},
+            },
+            config,
+        )
+        tool_call = result["messages"][-1].tool_calls[0]
+        await post_generation_graph.ainvoke(
+            {"messages": [ToolMessage(content="Posts rendered in the UI.", tool_call_id=tool_call["id"])]},
+            config,
+        )
+        samples.append({"seconds": time.perf_counter() - started, "input_tokens": _input_tokens() - tokens_before})
+    return samples
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--model-ttft-ms", type=float, default=50)
+    parser.add_argument("--model-chunk-ms", type=float, default=5)
+    parser.add_argument("--prefill-ms-per-1k-tokens", type=float, default=100)
+    parser.add_argument("--every", type=int, default=5, help="print every Nth turn")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    # Distinct topics per turn anyway; keep the search cache from hiding model latency
+    os.environ["SEARCH_CACHE_ENABLED"] = "false"
+
+    import history
+    from bench.run import install_fakes
+
+    install_fakes(
+        FakeLatency(
+            args.model_ttft_ms / 1000,
+            args.model_chunk_ms / 1000,
+            4,
+            prefill_per_1k_tokens=args.prefill_ms_per_1k_tokens / 1000,
+        )
+    )
+
+    results: Dict[str, Any] = {}
+    for compaction in (False, True):
+        history.HISTORY_COMPACTION = compaction
+        results[compaction] = asyncio.run(run_conversation(args.turns))
+
+    off, on = results[False], results[True]
+    print(f"{'turn':>5}{'latency off':>14}{'latency on':>13}{'tokens off':>13}{'tokens on':>12}")
+    for turn in range(args.turns):
+        if turn % args.every == 0 or turn == args.turns - 1:
+            print(
+                f"{turn + 1:>5}{off[turn]['seconds']:>13.3f}s{on[turn]['seconds']:>12.3f}s"
+                f"{off[turn]['input_tokens']:>13}{on[turn]['input_tokens']:>12}"
+            )
+    window = max(1, min(10, args.turns // 2))
+    for label, samples in (("off", off), ("on", on)):
+        first = _mean([s["seconds"] for s in samples[:window]])
+        last = _mean([s["seconds"] for s in samples[-window:]])
+        print(
+            f"compaction {label:>3}: first {window} turns {first:.3f}s, last {window} turns {last:.3f}s "
+            f"({(last - first) / first:+.0%}), {sum(s['input_tokens'] for s in samples)} input tokens in total"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Offline end-to-end benchmark for both agents, driven through the /copilotkit endpoint.
+
+Starts the fake GitHub server and the agent server on local ports, swaps the Gemini
+clients for the fakes, then runs N concurrent sessions against each agent and
+reports p50/p95/p99 latency, time to first byte, throughput, streamed response
+size and peak RSS.
+
+Run from agent/:
+    python -m bench.run --agent both --sessions 8 --requests 64
+    python -m bench.run --save-baseline bench/baseline.json
+    python -m bench.run --baseline bench/baseline.json --tolerance 0.15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from bench.fake_gemini import FakeGeminiChatModel, FakeGenaiClient, FakeLatency
+from bench.fixtures import TEMPLATES
+
+POSTS_ACTIONS = [
+    {
+        "name": "generate_post",
+        "description": "Render a post",
+        "parameters": [
+            {"name": "tweet", "type": "object", "description": "The tweet to be rendered"},
+            {"name": "linkedIn", "type": "object", "description": "The linkedIn post to be rendered"},
+        ],
+    }
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Runs a uvicorn server for an ASGI app on a background thread
+class ServerThread:
+    def __init__(self, app: Any, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self) -> None:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"server on {self.url} failed to start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+# Swap the Gemini clients used by both agents for the fakes
+def install_fakes(latency: FakeLatency) -> None:
+    import model_router
+    import posts_generator_agent
+
+    models: Dict[Any, FakeGeminiChatModel] = {}
+
+    def fake_chat_model(model: str, temperature: float = 0.4, max_retries: int = 2, callbacks=()):
+        key = (model, temperature, tuple(callbacks))
+        if key not in models:
+            models[key] = FakeGeminiChatModel(model=model, latency=latency, callbacks=list(callbacks) or None)
+        return models[key]
+
+    genai_client = FakeGenaiClient(latency)
+    model_router.get_chat_model = fake_chat_model
+    posts_generator_agent.get_genai_client = lambda: genai_client
+
+
+def _text_message(content: str) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "type": "TextMessage",
+        "role": "user",
+        "content": content,
+    }
+
+
+def request_body(agent: str, index: int, warm: bool) -> Dict[str, Any]:
+    if agent == "stack":
+        templates = sorted(TEMPLATES)
+        template = templates[index % len(templates)]
+        repo = template if warm else f"{template}-{index}"
+        return {
+            "threadId": str(uuid.uuid4()),
+            "state": {"tool_logs": [], "analysis": "", "show_cards": False, "context_handle": "", "last_user_content": ""},
+            "messages": [_text_message(f"Analyze https://github.com/acme/{repo}")],
+            "actions": [],
+        }
+    return {
+        "threadId": str(uuid.uuid4()),
+        "state": {"tool_logs": [], "response": "", "post_drafts": {}},
+        "messages": [_text_message(f"Write a LinkedIn and X post about offline agent benchmarks #{0 if warm else index}")],
+        "actions": POSTS_ACTIONS,
+    }
+
+
+class Rejected(Exception):
+    pass
+
+
+# Issue one agent run and return (latency, time to first byte, streamed bytes), or None on failure.
+# Raises Rejected when admission control turns the run away (429/503).
+async def run_once(
+    client: httpx.AsyncClient, url: str, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None
+) -> Optional[Dict[str, float]]:
+    started = time.perf_counter()
+    first_byte = None
+    nbytes = 0
+    async with client.stream("POST", url, json=body, headers=headers) as resp:
+        async for chunk in resp.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            nbytes += len(chunk)
+        if resp.status_code in (429, 503):
+            raise Rejected(resp.headers.get("Retry-After"))
+        if resp.status_code != 200:
+            return None
+    finished = time.perf_counter()
+    return {"latency": finished - started, "ttfb": (first_byte or finished) - started, "bytes": nbytes}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[rank]
+
+
+async def run_agent(base_url: str, agent: str, sessions: int, requests: int, warm: bool) -> Dict[str, Any]:
+    name = "stack_analysis_agent" if agent == "stack" else "post_generation_agent"
+    url = f"{base_url}/copilotkit/agent/{name}"
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(index)
+    samples: List[Dict[str, float]] = []
+    errors = 0
+    rejected = 0
+
+    # Each session is its own client for admission control (when ADMISSION_CLIENT_HEADER=x-client-id)
+    async def session(client: httpx.AsyncClient, number: int) -> None:
+        nonlocal errors, rejected
+        while not queue.empty():
+            index = queue.get_nowait()
+            try:
+                sample = await run_once(client, url, request_body(agent, index, warm), {"X-Client-Id": f"session-{number}"})
+            except Rejected as rejection:
+                # Back off as a well-behaved client would
+                rejected += 1
+                await asyncio.sleep(min(float(rejection.args[0] or 1), 5.0))
+                continue
+            except httpx.HTTPError:
+                sample = None
+            if sample is None:
+                errors += 1
+            else:
+                samples.append(sample)
+
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(session(client, number) for number in range(sessions)))
+        wall = time.perf_counter() - started
+
+    latencies = [s["latency"] for s in samples]
+    ttfbs = [s["ttfb"] for s in samples]
+    streamed = [s["bytes"] for s in samples]
+    return {
+        "sessions": sessions,
+        "requests": requests,
+        "errors": errors,
+        "rejected": rejected,
+        "p50_seconds": round(percentile(latencies, 50), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4),
+        "p99_seconds": round(percentile(latencies, 99), 4),
+        "ttfb_p50_seconds": round(percentile(ttfbs, 50), 4),
+        "ttfb_p95_seconds": round(percentile(ttfbs, 95), 4),
+        "throughput_rps": round(len(samples) / wall, 3) if wall else 0.0,
+        "response_kb_p50": round(percentile(streamed, 50) / 1024, 1),
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Lower is better for latencies, higher for throughput; flag changes beyond the tolerance
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    print(f"\n{'metric':<36}{'baseline':>12}{'current':>12}{'change':>10}")
+    for agent, current in results["agents"].items():
+        previous = baseline.get("agents", {}).get(agent)
+        if not previous:
+            continue
+        for metric in ("p50_seconds", "p95_seconds", "p99_seconds", "ttfb_p50_seconds", "throughput_rps", "response_kb_p50"):
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change < -tolerance if metric == "throughput_rps" else change > tolerance
+            marker = "  <-- regression" if worse else ""
+            print(f"{agent + '.' + metric:<36}{before:>12.4f}{after:>12.4f}{change:>+9.1%}{marker}")
+            if worse:
+                regressions.append(f"{agent}.{metric}")
+    before, after = baseline.get("peak_rss_mb"), results["peak_rss_mb"]
+    if before:
+        change = (after - before) / before
+        marker = "  <-- regression" if change > tolerance else ""
+        print(f"{'peak_rss_mb':<36}{before:>12.1f}{after:>12.1f}{change:>+9.1%}{marker}")
+        if change > tolerance:
+            regressions.append("peak_rss_mb")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agent", choices=["stack", "posts", "both"], default="both")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--requests", type=int, default=32, help="agent runs per agent")
+    parser.add_argument("--warm", action="store_true", help="reuse fixture repositories and post topics so caches are hit")
+    parser.add_argument("--github-latency-ms", type=float, default=30)
+    parser.add_argument("--model-ttft-ms", type=float, default=400)
+    parser.add_argument("--model-chunk-ms", type=float, default=20)
+    parser.add_argument("--model-chunks", type=int, default=8)
+    parser.add_argument("--baseline", help="compare against a stored results file")
+    parser.add_argument("--save-baseline", help="write the results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative change before flagging")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    from bench.fake_github import create_app
+
+    github = ServerThread(create_app(args.github_latency_ms / 1000), _free_port())
+    github.start()
+    # The agent modules read these at import time
+    os.environ["GITHUB_API_URL"] = github.url
+    os.environ["GITHUB_RAW_URL"] = f"{github.url}/raw"
+    os.environ["GOOGLE_API_KEY"] = "offline-benchmark"
+
+    import main as agent_server
+
+    install_fakes(FakeLatency(args.model_ttft_ms / 1000, args.model_chunk_ms / 1000, args.model_chunks))
+    server = ServerThread(agent_server.app, _free_port())
+    server.start()
+
+    agents = ["stack", "posts"] if args.agent == "both" else [args.agent]
+    results: Dict[str, Any] = {"config": {k: v for k, v in vars(args).items() if "baseline" not in k}, "agents": {}}
+    try:
+        for agent in agents:
+            results["agents"][agent] = asyncio.run(run_agent(server.url, agent, args.sessions, args.requests, args.warm))
+    finally:
+        server.stop()
+        github.stop()
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    print(json.dumps(results, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nregressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
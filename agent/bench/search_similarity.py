@@ -0,0 +1,75 @@
+"""
+Calibration check for the search cache's near-duplicate threshold.
+
+Scores sample request pairs with the same shingled MinHash the posts agent uses:
+paraphrases that should share grounded research, and different topics that must
+not. Prints every pair's exact and estimated Jaccard similarity and the range of
+thresholds that separates the two groups, and fails when --threshold (default
+SEARCH_CACHE_SIMILARITY) lets a distinct pair match or rejects a paraphrase.
+
+Run from agent/:
+    python -m bench.search_similarity
+"""
+
+import argparse
+import sys
+from typing import List, Optional, Tuple
+
+from search_cache import SEARCH_CACHE_SIMILARITY, estimated_similarity, minhash, topic_shingles, topic_words
+
+PARAPHRASES: List[Tuple[str, str]] = [
+    ("Write a LinkedIn post about AI agents", "LinkedIn post on AI agents"),
+    ("post about AI agents in production", "write a post on AI agent in production"),
+    ("Create a tweet about Rust for backend services", "tweet on Rust for backend service"),
+    ("Write a post about remote work productivity", "Write a post about remote work productivity tips"),
+    ("LinkedIn post about vector databases for RAG", "post on vector databases for RAG pipelines"),
+    ("Generate a post on Kubernetes cost optimization", "make a post about Kubernetes cost optimization"),
+    ("post about open source LLMs for enterprises", "post about open source LLMs for enterprise teams"),
+    ("Write an X thread about TypeScript monorepos", "X post about TypeScript monorepos"),
+]
+
+DISTINCT: List[Tuple[str, str]] = [
+    ("post on why Rust beats Go for backend services", "post on why Go beats Rust for backend services"),
+    ("post about AI regulation in Europe", "post about AI regulation in Asia"),
+    ("post about remote work productivity", "post about remote work burnout"),
+    ("LinkedIn post about Python for data science", "LinkedIn post about R for data science"),
+    ("post on migrating from AWS to GCP", "post on migrating from GCP to AWS"),
+    ("post about AI agents in customer support", "post about AI agents in healthcare"),
+    ("post about Kubernetes cost optimization", "post about Kubernetes security hardening"),
+]
+
+
+def score(left: str, right: str) -> Tuple[float, float]:
+    a, b = topic_shingles(topic_words(left)), topic_shingles(topic_words(right))
+    exact = len(a & b) / len(a | b) if a | b else 0.0
+    return exact, estimated_similarity(minhash(a), minhash(b))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=SEARCH_CACHE_SIMILARITY, help="similarity to check")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    failures = 0
+    estimates = {}
+    for group, pairs, should_match in (("paraphrase", PARAPHRASES, True), ("distinct", DISTINCT, False)):
+        estimates[group] = []
+        for left, right in pairs:
+            exact, estimate = score(left, right)
+            estimates[group].append(estimate)
+            ok = (estimate >= args.threshold) == should_match
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {group:<10} exact={exact:.2f} minhash={estimate:.2f}  {left!r} / {right!r}")
+    low, high = max(estimates["distinct"]), min(estimates["paraphrase"])
+    if low < high:
+        print(f"thresholds in ({low:.2f}, {high:.2f}] separate the samples; checked {args.threshold:.2f}")
+    else:
+        print(f"no threshold separates the samples (distinct up to {low:.2f}, paraphrases from {high:.2f})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
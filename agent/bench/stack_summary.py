@@ -0,0 +1,90 @@
+"""
+Stack analysis cost per summary mode: one tool call with the summary in its
+arguments ("single") against the tool call plus a separate summary call
+("two_call").
+
+Reads the repository from GitHub once, then runs the model analysis `--runs`
+times in each mode against the live Gemini API, reporting latency, model calls
+and tokens per analysis.
+
+Run from agent/:
+    python -m bench.stack_summary https://github.com/<owner>/<repo> --runs 3
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackHandler, get_usage_metadata_callback
+from langchain_core.runnables import RunnableConfig
+
+
+class CallCounter(AsyncCallbackHandler):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def on_chat_model_start(self, *args: Any, **kwargs: Any) -> None:
+        self.calls += 1
+
+
+async def measure(url: str, runs: int) -> Dict[str, Dict[str, float]]:
+    import stack_agent
+    from stack_detector import STACK_DETECTOR_MODE, detect_stack
+    from state_emitter import NullEmitter
+
+    parsed = stack_agent._parse_github_url(url)
+    if not parsed:
+        raise SystemExit(f"not a GitHub URL: {url}")
+    context = await stack_agent.gather_repository(*parsed)
+    local_analysis = detect_stack(context) if STACK_DETECTOR_MODE != "off" else {}
+
+    results = {}
+    for mode in ("two_call", "single"):
+        stack_agent.STACK_SUMMARY_MODE = mode
+        seconds, input_tokens, output_tokens = 0.0, 0, 0
+        counter = CallCounter()
+        for _ in range(runs):
+            state = {
+                "tool_logs": [{"id": "bench", "message": "Analyzing stack", "status": "processing"}],
+                "analysis": "",
+                "last_user_content": url,
+            }
+            with get_usage_metadata_callback() as usage:
+                started = time.perf_counter()
+                await stack_agent._run_llm_analysis(
+                    state, RunnableConfig(callbacks=[usage, counter]), NullEmitter({}), context, local_analysis
+                )
+                seconds += time.perf_counter() - started
+            for metadata in usage.usage_metadata.values():
+                input_tokens += metadata.get("input_tokens", 0)
+                output_tokens += metadata.get("output_tokens", 0)
+        results[mode] = {
+            "seconds": seconds / runs,
+            "calls": counter.calls / runs,
+            "input_tokens": input_tokens / runs,
+            "output_tokens": output_tokens / runs,
+        }
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--runs", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    for mode, stats in asyncio.run(measure(args.url, args.runs)).items():
+        print(
+            f"{mode:>8}: {stats['seconds']:6.2f} s/analysis, {stats['calls']:.1f} model calls, "
+            f"{stats['input_tokens']:7.0f} input + {stats['output_tokens']:6.0f} output tokens"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Cold start benchmark for the agent server.
+
+Reports:
+- import time per module, from `python -X importtime`, for `import main` and for
+  the agent modules main.py now loads on first use;
+- time from process start until /healthz answers, until /readyz reports the
+  agents loaded (AGENT_WARMUP=true), and until the first CopilotKit request is
+  served (AGENT_WARMUP=false, so that request pays for loading the agents).
+
+Every measurement starts a fresh interpreter. Run from agent/:
+    python -m bench.startup --runs 5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.run import _free_port
+
+# Modules main.py defers until an agent is needed (see agent_registry)
+DEFERRED = "import copilotkit, posts_generator_agent, stack_agent"
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env(**overrides: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    env.update(overrides)
+    return env
+
+
+# (module, cumulative seconds, nesting depth) for every import made by `statement`
+def import_times(statement: str, preload: str = "") -> List[Tuple[str, float, int]]:
+    code = f"{preload}\nimport sys; sys.stderr.write('--- measured\\n')\n{statement}" if preload else statement
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=_env(), capture_output=True, text=True, check=True
+    )
+    lines = completed.stderr.splitlines()
+    if preload:
+        lines = lines[lines.index("--- measured") + 1 :]
+    times = []
+    for line in lines:
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            times.append((match.group(4), int(match.group(2)) / 1e6, len(match.group(3)) // 2))
+    return times
+
+
+def report_imports(title: str, times: List[Tuple[str, float, int]], top: int) -> None:
+    # Top-level entries are the ones the statement itself triggered; nested ones are counted in them
+    roots = [(module, seconds) for module, seconds, depth in times if depth == 0]
+    total = sum(seconds for _, seconds in roots)
+    print(f"{title}: {total:.3f}s in {len(times)} modules")
+    # The heaviest modules at any depth, with packages and their submodules both listed
+    for module, seconds, _ in sorted(times, key=lambda item: -item[1])[:top]:
+        print(f"  {seconds:>8.3f}s  {module}")
+
+
+# Start the server and time the first successful responses
+def time_server(warmup: bool, timeout: float = 60.0) -> Dict[str, float]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=_env(AGENT_WARMUP="true" if warmup else "false"),
+        stderr=subprocess.DEVNULL,
+    )
+    timings: Dict[str, float] = {}
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            checks = [("healthz", lambda: client.get(f"{url}/healthz"))]
+            if warmup:
+                checks.append(("readyz", lambda: client.get(f"{url}/readyz")))
+            else:
+                # The info request is the first thing the CopilotKit runtime sends
+                checks.append(("first_agent_request", lambda: client.post(f"{url}/copilotkit/", json={})))
+            for name, check in checks:
+                while True:
+                    if time.perf_counter() - started > timeout:
+                        raise TimeoutError(f"{name} not answered within {timeout:.0f}s")
+                    try:
+                        if check().status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    time.sleep(0.01)
+                timings[name] = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+    return timings
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="server starts per configuration (median reported)")
+    parser.add_argument("--top", type=int, default=15, help="modules listed per import report")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report_imports("import main", import_times("import main"), args.top)
+    report_imports("deferred agent imports", import_times(DEFERRED, preload="import main"), args.top)
+
+    for warmup in (True, False):
+        runs = [time_server(warmup) for _ in range(args.runs)]
+        summary = ", ".join(
+            f"{name} {statistics.median(run[name] for run in runs):.3f}s" for name in runs[0]
+        )
+        print(f"AGENT_WARMUP={str(warmup).lower()}: {summary} (median of {args.runs})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
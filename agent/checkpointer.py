@@ -0,0 +1,208 @@
+"""
+Bounded LangGraph checkpointers shared by both agents.
+
+CHECKPOINTER_BACKEND selects "memory" (default) or "sqlite". Both backends keep
+only the latest CHECKPOINT_HISTORY checkpoints per thread, and evict threads
+idle for longer than CHECKPOINT_THREAD_TTL_SECONDS or beyond the
+CHECKPOINT_MAX_THREADS most recently active ones.
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory").lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+CHECKPOINT_THREAD_TTL_SECONDS = float(os.getenv("CHECKPOINT_THREAD_TTL_SECONDS", "86400"))
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+CHECKPOINT_HISTORY = max(1, int(os.getenv("CHECKPOINT_HISTORY", "2")))
+
+
+# In-memory saver that compacts per-thread history and evicts idle threads.
+# Blob keys are indexed per (thread, namespace), so compaction and eviction only
+# touch the thread concerned rather than every stored blob.
+class BoundedMemorySaver(MemorySaver):
+    def __init__(self, ttl: float, max_threads: int, history: int):
+        super().__init__()
+        self.ttl = ttl
+        self.max_threads = max_threads
+        self.history = history
+        self._last_active: "OrderedDict[str, float]" = OrderedDict()
+        # (thread_id, checkpoint_ns) -> {(channel, version)} present in self.blobs
+        self._blob_versions: Dict[Tuple[str, str], Set[Tuple[str, Any]]] = {}
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        self._blob_versions.setdefault((thread_id, checkpoint_ns), set()).update(new_versions.items())
+        self._compact(thread_id, checkpoint_ns)
+        self._last_active[thread_id] = time.time()
+        self._last_active.move_to_end(thread_id)
+        self._evict()
+        return saved
+
+    # Drop older checkpoints of the namespace along with their writes and unreferenced blobs
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.history:
+            return
+        ordered = sorted(checkpoints)
+        for checkpoint_id in ordered[: -self.history]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        referenced = set()
+        for serialized, _, _ in checkpoints.values():
+            kept = self.serde.loads_typed(serialized)
+            referenced.update(kept["channel_versions"].items())
+        versions = self._blob_versions.get((thread_id, checkpoint_ns), set())
+        for channel, version in versions - referenced:
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        versions &= referenced
+
+    # Same as MemorySaver.delete_thread, but through the index instead of a scan of all writes and blobs
+    def delete_thread(self, thread_id: str) -> None:
+        for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id in checkpoints:
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            for channel, version in self._blob_versions.pop((thread_id, checkpoint_ns), ()):
+                self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.ttl
+        while self._last_active:
+            thread_id, last_active = next(iter(self._last_active.items()))
+            if last_active >= cutoff and len(self._last_active) <= self.max_threads:
+                break
+            del self._last_active[thread_id]
+            self.delete_thread(thread_id)
+
+
+# SQLite-backed saver with the same bounds; blocking calls run in worker threads
+class BoundedSqliteSaver(SqliteSaver):
+    def __init__(self, path: str, ttl: float, max_threads: int, history: int):
+        # The busy timeout lets several worker processes share one database file
+        super().__init__(sqlite3.connect(path, check_same_thread=False, timeout=30))
+        self.ttl = ttl
+        self.max_threads = max_threads
+        self.history = history
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self.cursor() as cur:
+            for table in ("checkpoints", "writes"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN "
+                    "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT ?)",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.history),
+                )
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            cur.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ? "
+                "UNION SELECT thread_id FROM "
+                "(SELECT thread_id FROM thread_activity ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (time.time() - self.ttl, self.max_threads),
+            )
+            expired = [row[0] for row in cur.fetchall()]
+        for expired_thread in expired:
+            self.delete_thread(expired_thread)
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+# Build the checkpointer selected by CHECKPOINTER_BACKEND
+def make_checkpointer() -> BaseCheckpointSaver:
+    if CHECKPOINTER_BACKEND == "sqlite":
+        return BoundedSqliteSaver(
+            CHECKPOINT_SQLITE_PATH,
+            CHECKPOINT_THREAD_TTL_SECONDS,
+            CHECKPOINT_MAX_THREADS,
+            CHECKPOINT_HISTORY,
+        )
+    return BoundedMemorySaver(
+        CHECKPOINT_THREAD_TTL_SECONDS, CHECKPOINT_MAX_THREADS, CHECKPOINT_HISTORY
+    )
@@ -0,0 +1,56 @@
+"""
+Server-side store for the repository context gathered by the stack agent.
+
+The gathered context (README, manifest texts, repo metadata, root listing) is only
+needed between the gather and analyze nodes, so it is kept here and the graph state
+carries a short handle instead. That keeps it out of every state emit and checkpoint.
+Entries expire after CONTEXT_STORE_TTL_SECONDS and the store holds at most
+CONTEXT_STORE_MAX_ENTRIES contexts; a missing handle reads as an empty context.
+
+The store is per process; a run's nodes execute in the process that started it.
+"""
+
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CONTEXT_STORE_TTL_SECONDS = float(os.getenv("CONTEXT_STORE_TTL_SECONDS", "900"))
+CONTEXT_STORE_MAX_ENTRIES = int(os.getenv("CONTEXT_STORE_MAX_ENTRIES", "128"))
+
+
+class ContextStore:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.expired = 0
+
+    # Store a context and return the handle to put in graph state
+    def put(self, context: Dict[str, Any]) -> str:
+        handle = uuid.uuid4().hex
+        self._entries[handle] = (time.time(), context)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return handle
+
+    def get(self, handle: Optional[str]) -> Dict[str, Any]:
+        item = self._entries.get(handle or "")
+        if item is None:
+            return {}
+        stored_at, context = item
+        if time.time() - stored_at >= self.ttl:
+            del self._entries[handle]
+            self.expired += 1
+            return {}
+        return context
+
+    def discard(self, handle: Optional[str]) -> None:
+        self._entries.pop(handle or "", None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "expired": self.expired, "ttl_seconds": self.ttl}
+
+
+context_store = ContextStore(CONTEXT_STORE_TTL_SECONDS, CONTEXT_STORE_MAX_ENTRIES)
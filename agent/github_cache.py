@@ -0,0 +1,235 @@
+"""
+Conditional-request response cache for GitHub API calls.
+
+Entries are keyed by URL and a hash of the caller's auth identity. Fresh entries
+are served without touching the network; stale entries that carry an ETag or
+Last-Modified validator are revalidated and a 304 is served from the cache.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+GITHUB_CACHE_TTL_SECONDS = float(os.getenv("GITHUB_CACHE_TTL_SECONDS", "300"))
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "2048"))
+# When set, entries are persisted as JSON files under this directory
+GITHUB_CACHE_DIR = os.getenv("GITHUB_CACHE_DIR")
+
+# Response headers kept alongside the cached body
+_KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+
+@dataclass
+class CacheEntry:
+    content: bytes
+    headers: Dict[str, str]
+    stored_at: float = field(default_factory=time.time)
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    def has_validator(self) -> bool:
+        return "etag" in self.headers or "last-modified" in self.headers
+
+    # Build If-None-Match / If-Modified-Since headers from the stored validators
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if "etag" in self.headers:
+            headers["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+    def to_response(self) -> httpx.Response:
+        return httpx.Response(200, headers=self.headers, content=self.content)
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "content": base64.b64encode(self.content).decode("ascii"),
+            "headers": self.headers,
+            "stored_at": self.stored_at,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, object]) -> "CacheEntry":
+        return cls(
+            content=base64.b64decode(data["content"]),
+            headers=dict(data["headers"]),
+            stored_at=float(data["stored_at"]),
+        )
+
+
+# In-process LRU storage
+class MemoryBackend:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# On-disk storage, one JSON file per entry; least recently used files are pruned in
+# batches once the count passes max_entries by a margin, so writes rarely list the directory
+class DiskBackend:
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.prune_margin = max(1, max_entries // 10)
+        os.makedirs(directory, exist_ok=True)
+        self._count = len(self)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = CacheEntry.from_json(json.load(f))
+            os.utime(path)
+            return entry
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        is_new = not os.path.exists(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry.to_json(), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._count += is_new
+        if self._count > self.max_entries + self.prune_margin:
+            self._prune()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+            self._count -= 1
+        except OSError:
+            pass
+
+    def _prune(self) -> None:
+        try:
+            files = [
+                os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith(".json")
+            ]
+        except OSError:
+            return
+        # Resync with the directory, which other processes may share
+        self._count = len(files)
+        excess = len(files) - self.max_entries
+        if excess <= 0:
+            return
+        files.sort(key=lambda path: os.path.getmtime(path))
+        for path in files[:excess]:
+            try:
+                os.remove(path)
+                self._count -= 1
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        try:
+            return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+        except OSError:
+            return 0
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    # Cache key combines the URL with a hash of the Authorization header
+    @staticmethod
+    def key_for(url: str, headers: Dict[str, str]) -> str:
+        auth = headers.get("Authorization", "")
+        identity = hashlib.sha256(auth.encode("utf-8")).hexdigest()[:16] if auth else "anonymous"
+        return f"{identity}:{url}"
+
+    async def get(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        fetch: Callable[[str, Dict[str, str]], Awaitable[httpx.Response]],
+    ) -> httpx.Response:
+        key = self.key_for(url, headers)
+        entry = self.backend.get(key)
+
+        if entry is not None and entry.is_fresh(self.ttl):
+            self.hits += 1
+            return entry.to_response()
+
+        if entry is not None and not entry.has_validator():
+            self.backend.delete(key)
+            entry = None
+
+        request_headers = dict(headers)
+        if entry is not None:
+            request_headers.update(entry.conditional_headers())
+
+        resp = await fetch(url, request_headers)
+
+        if resp.status_code == 304 and entry is not None:
+            self.hits += 1
+            self.revalidations += 1
+            entry.stored_at = time.time()
+            self.backend.set(key, entry)
+            return entry.to_response()
+
+        self.misses += 1
+        if resp.status_code == 200:
+            kept = {name: resp.headers[name] for name in _KEPT_HEADERS if name in resp.headers}
+            self.backend.set(key, CacheEntry(content=resp.content, headers=kept))
+        return resp
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "entries": len(self.backend),
+            "backend": type(self.backend).__name__,
+        }
+
+
+def _default_backend():
+    if GITHUB_CACHE_DIR:
+        return DiskBackend(GITHUB_CACHE_DIR, GITHUB_CACHE_MAX_ENTRIES)
+    return MemoryBackend(GITHUB_CACHE_MAX_ENTRIES)
+
+
+response_cache = ResponseCache(_default_backend(), GITHUB_CACHE_TTL_SECONDS)
@@ -0,0 +1,288 @@
+"""
+Shared async HTTP client for talking to the GitHub REST API.
+
+Requests are scheduled rather than sent directly:
+- a pool of tokens (GITHUB_TOKENS, plus GITHUB_TOKEN) is rotated using the
+  X-RateLimit-Remaining / X-RateLimit-Reset headers of each response;
+- at most GITHUB_MAX_CONCURRENCY requests are in flight, and queued requests
+  are served round-robin across sessions so one large repository cannot starve
+  other users;
+- rate-limited, 5xx and transport failures are retried with jittered backoff.
+When every token is exhausted for longer than GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS,
+fetch raises GitHubRateLimited instead of returning an empty response.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+# Base URL for the GitHub REST API (overridable for GitHub Enterprise or local stubs)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_RAW_URL = os.getenv("GITHUB_RAW_URL", "https://raw.githubusercontent.com").rstrip("/")
+
+# Upper bound on in-flight GitHub requests per process
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "8"))
+
+GITHUB_TIMEOUT_SECONDS = float(os.getenv("GITHUB_TIMEOUT_SECONDS", "30"))
+
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+GITHUB_BACKOFF_BASE_SECONDS = float(os.getenv("GITHUB_BACKOFF_BASE_SECONDS", "0.5"))
+# Longest a request may wait for a rate-limit window to reset before giving up
+GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS", "20"))
+
+
+def _configured_tokens() -> List[str]:
+    tokens = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",")] + [os.getenv("GITHUB_TOKEN", "").strip()]
+    return list(dict.fromkeys(t for t in tokens if t))
+
+
+class GitHubRateLimited(Exception):
+    def __init__(self, reset_at: float):
+        super().__init__(f"GitHub rate limit exhausted until {time.strftime('%H:%M:%S', time.localtime(reset_at))}")
+        self.reset_at = reset_at
+
+
+@dataclass
+class _TokenState:
+    token: Optional[str]
+    remaining: Optional[int] = None
+    reset_at: float = 0.0
+
+
+# Picks the token with the most remaining quota and tracks each token's rate-limit window
+class TokenPool:
+    def __init__(self, tokens: List[str]):
+        # An empty pool still schedules unauthenticated requests (60/hour per IP)
+        self.states = [_TokenState(token) for token in tokens] or [_TokenState(None)]
+
+    # Return a usable token and 0, or the token that frees up first and how long until it does
+    def acquire(self) -> Tuple[_TokenState, float]:
+        now = time.time()
+        for state in self.states:
+            if state.reset_at <= now and state.remaining == 0:
+                state.remaining = None
+        available = [s for s in self.states if s.remaining is None or s.remaining > 0]
+        if not available:
+            soonest = min(self.states, key=lambda s: s.reset_at)
+            return soonest, max(soonest.reset_at - now, 0.0)
+        best = max(available, key=lambda s: float("inf") if s.remaining is None else s.remaining)
+        if best.remaining is not None:
+            best.remaining -= 1
+        return best, 0.0
+
+    def update(self, state: _TokenState, resp: httpx.Response) -> None:
+        remaining = resp.headers.get("X-RateLimit-Remaining")
+        reset = resp.headers.get("X-RateLimit-Reset")
+        if remaining is not None and remaining.isdigit():
+            state.remaining = int(remaining)
+        if reset is not None and reset.isdigit():
+            state.reset_at = float(reset)
+        if is_rate_limited(resp):
+            state.remaining = 0
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after is not None and retry_after.isdigit():
+                state.reset_at = max(state.reset_at, time.time() + int(retry_after))
+            elif state.reset_at <= time.time():
+                state.reset_at = time.time() + 60
+
+    def stats(self) -> List[Dict[str, object]]:
+        return [
+            {"token": f"...{s.token[-4:]}" if s.token else "anonymous", "remaining": s.remaining, "reset_at": s.reset_at}
+            for s in self.states
+        ]
+
+
+# Concurrency limit whose waiters are served round-robin by session
+class FairLimiter:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    async def acquire(self, session: str) -> None:
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(session, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on
+                self.release()
+            else:
+                queue = self._waiting.get(session)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiting[session]
+            raise
+
+    # Hand the slot to the next waiting session, or free it
+    def release(self) -> None:
+        while self._waiting:
+            session, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(session)
+            else:
+                del self._waiting[session]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+
+# Session the current request belongs to (the LangGraph thread id), for fair queueing
+_session: contextvars.ContextVar[str] = contextvars.ContextVar("github_session", default="default")
+# Called with (seconds until reset, whether the request is waiting) when a request is throttled
+_throttle_listener: contextvars.ContextVar[Optional[Callable[[float, bool], Awaitable[None]]]] = contextvars.ContextVar(
+    "github_throttle_listener", default=None
+)
+
+_client: Optional[httpx.AsyncClient] = None
+_limiter: Optional[FairLimiter] = None
+token_pool = TokenPool(_configured_tokens())
+
+
+def set_session(session_id: str) -> None:
+    _session.set(session_id)
+
+
+def set_throttle_listener(listener: Optional[Callable[[float, bool], Awaitable[None]]]) -> None:
+    _throttle_listener.set(listener)
+
+
+async def notify_throttled(seconds: float, waiting: bool) -> None:
+    listener = _throttle_listener.get()
+    if listener is not None:
+        await listener(seconds, waiting)
+
+
+# Return the process-wide pooled client, creating it on first use
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=GITHUB_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=GITHUB_MAX_CONCURRENCY,
+                max_keepalive_connections=GITHUB_MAX_CONCURRENCY,
+            ),
+        )
+    return _client
+
+
+def _get_limiter() -> FairLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = FairLimiter(GITHUB_MAX_CONCURRENCY)
+    return _limiter
+
+
+# Primary (X-RateLimit-Remaining: 0) and secondary (Retry-After) rate limits
+def is_rate_limited(resp: httpx.Response) -> bool:
+    if resp.status_code not in (403, 429):
+        return False
+    return resp.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in resp.headers or resp.status_code == 429
+
+
+def _backoff(attempt: int) -> float:
+    return GITHUB_BACKOFF_BASE_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+# Issue a GET through the pooled client: pick a token, wait for a fair slot, retry on throttling and 5xx
+async def fetch(url: str, headers: Dict[str, str]) -> httpx.Response:
+    return await _send(url, headers, stream=False)
+
+
+# Like fetch, but the body is not read: the response's concurrency slot stays taken until
+# the caller has streamed it and the context exits. The caller checks the status code.
+@asynccontextmanager
+async def stream(url: str, headers: Dict[str, str]) -> AsyncIterator[httpx.Response]:
+    resp = await _send(url, headers, stream=True)
+    try:
+        yield resp
+    finally:
+        await resp.aclose()
+        _get_limiter().release()
+
+
+async def _send(url: str, headers: Dict[str, str], stream: bool) -> httpx.Response:
+    session = _session.get()
+    limiter = _get_limiter()
+    for attempt in range(GITHUB_MAX_RETRIES + 1):
+        state, wait = token_pool.acquire()
+        if wait > 0:
+            if wait > GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS or attempt == GITHUB_MAX_RETRIES:
+                await notify_throttled(wait, waiting=False)
+                raise GitHubRateLimited(state.reset_at)
+            await notify_throttled(wait, waiting=True)
+            await asyncio.sleep(wait + random.uniform(0, GITHUB_BACKOFF_BASE_SECONDS))
+            continue
+
+        request_headers = dict(headers)
+        if state.token:
+            request_headers["Authorization"] = f"Bearer {state.token}"
+        client = get_client()
+        await limiter.acquire(session)
+        try:
+            resp = await client.send(client.build_request("GET", url, headers=request_headers), stream=stream)
+        except httpx.TransportError:
+            limiter.release()
+            if attempt == GITHUB_MAX_RETRIES:
+                raise
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        except BaseException:
+            limiter.release()
+            raise
+
+        token_pool.update(state, resp)
+        rate_limited = is_rate_limited(resp)
+        retry_5xx = resp.status_code >= 500 and attempt < GITHUB_MAX_RETRIES
+        # A streamed response that is handed back keeps its slot; every other one gives it up now
+        if not stream or rate_limited or retry_5xx:
+            if stream:
+                await resp.aclose()
+            limiter.release()
+        if rate_limited:
+            # The token is now marked exhausted; the next attempt rotates or waits for the reset
+            if attempt == GITHUB_MAX_RETRIES:
+                await notify_throttled(max(state.reset_at - time.time(), 0.0), waiting=False)
+                raise GitHubRateLimited(state.reset_at)
+            await asyncio.sleep(random.uniform(0, GITHUB_BACKOFF_BASE_SECONDS))
+            continue
+        if retry_5xx:
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        return resp
+    raise GitHubRateLimited(time.time())
+
+
+# Scheduler and token state for /cache-stats style reporting
+def stats() -> Dict[str, object]:
+    limiter = _get_limiter()
+    return {"in_flight": limiter.active, "queued": limiter.queued, "tokens": token_pool.stats()}
+
+
+# Close the pooled client; called from the FastAPI lifespan on shutdown
+async def aclose() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
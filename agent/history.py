@@ -0,0 +1,165 @@
+"""
+Token-budgeted conversation history for the posts agent's model calls.
+
+Long CopilotKit threads resend every earlier turn, so input tokens and latency
+grow with each message. compact_history() instead sends:
+- the last HISTORY_KEEP_TURNS turns verbatim (fewer when they exceed
+  HISTORY_TOKEN_BUDGET), where a turn starts at a user message;
+- a rolling summary of everything older, folded forward incrementally: only
+  turns that left the verbatim window since the last update are summarized, in
+  batches of HISTORY_SUMMARY_BATCH_TURNS on the flash tier;
+- tool payloads from turns before the latest cut to HISTORY_TOOL_PAYLOAD_MAX_CHARS.
+
+The summary and the id of the last summarized message live in graph state, so
+the work is not repeated across requests. The checkpointed history itself is
+never modified.
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+import metrics
+from model_router import estimate_message_tokens, get_tier_model, route
+from state_emitter import quiet_config
+
+HISTORY_COMPACTION = os.getenv("HISTORY_COMPACTION", "true").lower() == "true"
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+HISTORY_SUMMARY_BATCH_TURNS = int(os.getenv("HISTORY_SUMMARY_BATCH_TURNS", "2"))
+HISTORY_TOOL_PAYLOAD_MAX_CHARS = int(os.getenv("HISTORY_TOOL_PAYLOAD_MAX_CHARS", "400"))
+# Longest the rolling summary may grow, in characters
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "2000"))
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an assistant that writes "
+    "LinkedIn and X posts. Update the summary with the new messages. Keep the topics covered, the "
+    "user's stated preferences (tone, length, audience, hashtags) and any decisions or corrections. "
+    "Drop the full text of generated posts. Reply with the updated summary only, at most 150 words."
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Split messages into turns, each starting at a user message (leading non-user messages form a turn)
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if message.type == "human" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + f"... [{len(text) - limit} characters omitted]"
+
+
+# Copy a message with oversized tool results and tool call arguments cut down
+def _strip_tool_payload(message: BaseMessage) -> BaseMessage:
+    limit = HISTORY_TOOL_PAYLOAD_MAX_CHARS
+    if isinstance(message, ToolMessage) and len(str(message.content)) > limit:
+        return message.model_copy(update={"content": _truncate(str(message.content), limit)})
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls and any(len(str(call.get("args"))) > limit for call in tool_calls):
+        trimmed = [
+            {**call, "args": {k: _truncate(str(v), limit // max(len(call["args"]), 1)) for k, v in call["args"].items()}}
+            for call in tool_calls
+        ]
+        return message.model_copy(update={"tool_calls": trimmed})
+    return message
+
+
+def _transcript(messages: Sequence[BaseMessage]) -> str:
+    lines = []
+    for message in map(_strip_tool_payload, messages):
+        content = str(message.content).strip()
+        calls = getattr(message, "tool_calls", None)
+        if calls:
+            content = (content + " " if content else "") + f"[called {', '.join(call['name'] for call in calls)}]"
+        if content:
+            lines.append(f"{message.type}: {content}")
+    return "\n".join(lines)
+
+
+async def _summarize(previous: str, messages: Sequence[BaseMessage], config: Optional[RunnableConfig]) -> str:
+    prompt = [
+        SystemMessage(content=SUMMARY_INSTRUCTIONS),
+        HumanMessage(content=f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{_transcript(messages)}"),
+    ]
+    # Keep the summary call out of the chat: CopilotKit must not stream it to the user
+    quiet = quiet_config(config or RunnableConfig())
+    try:
+        model = get_tier_model(route("posts.history_summary", estimate_message_tokens(prompt)), temperature=0.2)
+        response = await model.ainvoke(prompt, quiet)
+        summary = str(response.content).strip()
+    except Exception:
+        logger.exception("history summary call failed; keeping user requests only")
+        requests = [str(m.content).strip() for m in messages if m.type == "human"]
+        summary = "\n".join(filter(None, [previous, *("User asked: " + _truncate(r, 200) for r in requests)]))
+    # Over the cap, keep the start: the model writes the summary oldest first
+    return summary[:HISTORY_SUMMARY_MAX_CHARS]
+
+
+# Return the messages to send in place of `messages`, plus the state updates that carry
+# the rolling summary forward ({} when nothing changed)
+async def compact_history(
+    messages: Sequence[BaseMessage], state: Dict[str, Any], config: Optional[RunnableConfig]
+) -> Tuple[List[BaseMessage], Dict[str, Any]]:
+    raw_tokens = estimate_message_tokens(messages)
+    if not HISTORY_COMPACTION:
+        metrics.record_history_tokens(raw_tokens, raw_tokens)
+        return list(messages), {}
+
+    turns = split_turns(messages)
+    keep = min(HISTORY_KEEP_TURNS, len(turns))
+    # Shrink the verbatim window to the budget, but never below the current turn
+    while keep > 1 and estimate_message_tokens([m for turn in turns[-keep:] for m in turn]) > HISTORY_TOKEN_BUDGET:
+        keep -= 1
+    older = [m for turn in turns[: len(turns) - keep] for m in turn]
+    recent_turns = turns[len(turns) - keep :]
+
+    summary = state.get("history_summary") or ""
+    summarized_upto = state.get("history_summarized_upto") or ""
+    updates: Dict[str, Any] = {}
+    positions = {m.id: i for i, m in enumerate(messages)}
+    if summarized_upto and summarized_upto not in positions:
+        # The thread was reset or rewritten: start the summary over
+        summary, summarized_upto = "", ""
+        updates = {"history_summary": "", "history_summarized_upto": ""}
+    unsummarized = older
+    if summarized_upto:
+        # Locate the boundary in `older` by id; when the verbatim window has grown over it,
+        # the boundary sits among the recent turns and everything older is covered
+        boundary = next((i for i, m in enumerate(older) if m.id == summarized_upto), len(older) - 1)
+        unsummarized = older[min(boundary + 1, len(older)) :]
+
+    if unsummarized and (len(split_turns(unsummarized)) >= HISTORY_SUMMARY_BATCH_TURNS or not summary):
+        summary = await _summarize(summary, unsummarized, config)
+        summarized_upto = next((m.id for m in reversed(unsummarized) if m.id), summarized_upto)
+        updates = {"history_summary": summary, "history_summarized_upto": summarized_upto}
+        unsummarized = []
+
+    compacted: List[BaseMessage] = []
+    if summary:
+        compacted.append(HumanMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    # Turns waiting for the next summary batch stay in, stripped like other stale turns
+    compacted += [_strip_tool_payload(m) for m in unsummarized]
+    for turn in recent_turns[:-1]:
+        compacted += [_strip_tool_payload(m) for m in turn]
+    compacted += recent_turns[-1] if recent_turns else []
+
+    compacted_tokens = estimate_message_tokens(compacted)
+    metrics.record_history_tokens(raw_tokens, compacted_tokens)
+    logger.info(
+        "history: %d messages (~%d tokens) sent as %d (~%d tokens), %d verbatim turns",
+        len(messages),
+        raw_tokens,
+        len(compacted),
+        compacted_tokens,
+        keep,
+    )
+    return compacted, updates
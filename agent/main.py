@@ -7,40 +7,196 @@ from dotenv import load_dotenv
 
 load_dotenv()  
 
-from fastapi import FastAPI
+import json
+import logging
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
-from copilotkit.integrations.fastapi import add_fastapi_endpoint
-from copilotkit import CopilotKitSDK, LangGraphAgent
-from posts_generator_agent import post_generation_graph
-from stack_agent import stack_analysis_graph
-
-app = FastAPI()
-
-
-sdk = CopilotKitSDK(
-    agents=[
-        LangGraphAgent(
-            name="post_generation_agent",
-            description="An agent that can help with the generation of LinkedIn posts and X posts.",
-            graph=post_generation_graph,
-        ),
-        LangGraphAgent(
-            name="stack_analysis_agent",
-            description="Analyze a GitHub repository URL to infer purpose and tech stack (frontend, backend, DB, infra).",
-            graph=stack_analysis_graph,
-        ),
-    ]
-)
+import github_client
+from github_cache import response_cache
+from analysis_cache import analysis_cache
+from context_store import context_store
+from search_cache import search_cache
+from batch_jobs import BATCH_MAX_URLS, batch_runner
+from admission import ADMISSION_ENABLED, AdmissionMiddleware, admission_controller
+import agent_registry
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Resume unfinished batch jobs and start loading the agents on startup; stop the jobs and
+    release pooled connections on shutdown."""
+    batch_runner.resume_pending()
+    if agent_registry.AGENT_WARMUP:
+        agent_registry.start_loading()
+    yield
+    await batch_runner.aclose()
+    await github_client.aclose()
+    # Only loaded along with the agents
+    model_clients = sys.modules.get("model_clients")
+    if model_clients is not None:
+        await model_clients.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+# The agents are built on first use (or by the startup warm-up); see agent_registry
+@app.api_route("/copilotkit/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+async def copilotkit_endpoint(request: Request):
+    """CopilotKit remote endpoint serving both agents."""
+    try:
+        sdk = await agent_registry.get_sdk()
+    except Exception:
+        logger.exception("loading the agents failed")
+        raise HTTPException(status_code=503, detail="agents failed to load", headers={"Retry-After": "5"})
+    from copilotkit.integrations.fastapi import handler
+
+    return await handler(request, sdk)
 
-add_fastapi_endpoint(app, sdk, "/copilotkit")
+
+if ADMISSION_ENABLED:
+    # Bound concurrent agent runs; overload is answered with 429/503 + Retry-After
+    app.add_middleware(AdmissionMiddleware, agents=agent_registry.AGENT_NAMES, prefix="/copilotkit")
 
 
 @app.get("/healthz")
 def health():
-    """Health check."""
+    """Liveness check; answers as soon as the server is up."""
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+def ready():
+    """Readiness check; 503 until both agents are loaded."""
+    status = agent_registry.status()
+    if not status["ready"]:
+        return JSONResponse({"status": "loading", **status}, status_code=503, headers={"Retry-After": "1"})
+    return {"status": "ready", **status}
+
+
+# Model tier counters; model_router is only loaded with the agents, and before that nothing has called a model
+def _tier_stats() -> Dict[str, Dict[str, Any]]:
+    model_router = sys.modules.get("model_router")
+    return model_router.tier_stats.snapshot() if model_router is not None else {}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Per-node, GitHub, cache, admission and model tier metrics in the Prometheus text format."""
+    github = response_cache.stats()
+    analysis = analysis_cache.stats()
+    samples = [
+        ("github_cache_hits_total", "counter", {}, github["hits"]),
+        ("github_cache_misses_total", "counter", {}, github["misses"]),
+        ("github_cache_revalidations_total", "counter", {}, github["revalidations"]),
+        ("github_cache_entries", "gauge", {}, github["entries"]),
+        ("analysis_cache_hits_total", "counter", {}, analysis["hits"]),
+        ("analysis_cache_misses_total", "counter", {}, analysis["misses"]),
+        ("analysis_cache_coalesced_total", "counter", {}, analysis["coalesced"]),
+        ("analysis_cache_entries", "gauge", {}, analysis["entries"]),
+        ("context_store_entries", "gauge", {}, context_store.stats()["entries"]),
+    ]
+    search = search_cache.stats()
+    samples += [
+        ("search_cache_hits_total", "counter", {"match": "exact"}, search["exact_hits"]),
+        ("search_cache_hits_total", "counter", {"match": "near"}, search["near_hits"]),
+        ("search_cache_misses_total", "counter", {}, search["misses"]),
+        ("search_cache_bypassed_total", "counter", {}, search["bypassed"]),
+        ("search_cache_seconds_saved_total", "counter", {}, search["seconds_saved"]),
+        ("search_cache_entries", "gauge", {}, search["entries"]),
+    ]
+    scheduler = github_client.stats()
+    samples += [
+        ("github_scheduler_in_flight", "gauge", {}, scheduler["in_flight"]),
+        ("github_scheduler_queued", "gauge", {}, scheduler["queued"]),
+    ]
+    for token in scheduler["tokens"]:
+        if token["remaining"] is not None:
+            samples.append(("github_rate_limit_remaining", "gauge", {"token": token["token"]}, token["remaining"]))
+    for agent, stats in admission_controller.stats()["agents"].items():
+        samples += [
+            ("agent_admission_active", "gauge", {"agent": agent}, stats["active"]),
+            ("agent_admission_queue_depth", "gauge", {"agent": agent}, stats["queued"]),
+        ]
+    for tier, stats in _tier_stats().items():
+        labels = {"tier": tier, "model": stats["model"]}
+        samples += [
+            ("model_calls_total", "counter", labels, stats["calls"]),
+            ("model_errors_total", "counter", labels, stats["errors"]),
+            ("model_escalations_total", "counter", labels, stats["escalations"]),
+            ("model_call_seconds_total", "counter", labels, stats["seconds"]),
+            ("model_input_tokens_total", "counter", labels, stats["input_tokens"]),
+            ("model_output_tokens_total", "counter", labels, stats["output_tokens"]),
+            ("model_estimated_cost_usd_total", "counter", labels, stats["estimated_cost_usd"]),
+        ]
+    return PlainTextResponse(metrics.render(samples), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache-stats")
+def cache_stats():
+    """GitHub response cache, request scheduler, stack analysis and grounded search cache counters."""
+    return {
+        "github": response_cache.stats(),
+        "github_scheduler": github_client.stats(),
+        "analysis": analysis_cache.stats(),
+        "context_store": context_store.stats(),
+        "search": search_cache.stats(),
+    }
+
+
+@app.get("/model-stats")
+def model_stats():
+    """Per-tier model call counts, latency, tokens and estimated cost."""
+    return _tier_stats()
+
+
+class BatchRequest(BaseModel):
+    urls: List[str] = Field(min_length=1, max_length=BATCH_MAX_URLS)
+
+
+# One JSON object per line: the job header, each repository result as it completes, then a summary
+async def _ndjson(job_id: str, records: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    yield json.dumps({"event": "job", **batch_runner.status(job_id)}) + "\n"
+    async for record in records:
+        yield json.dumps({"event": "result", **record}) + "\n"
+    yield json.dumps({"event": "done", **batch_runner.status(job_id)}) + "\n"
+
+
+@app.post("/batch/stack-analysis")
+async def batch_stack_analysis(request: BatchRequest):
+    """Analyze many GitHub repositories; results stream back as NDJSON as each completes.
+
+    The job keeps running if the client disconnects; reconnect with GET
+    /batch/stack-analysis/{job_id} to replay its results and follow the rest.
+    """
+    job = batch_runner.submit(list(dict.fromkeys(url.strip() for url in request.urls)))
+    return StreamingResponse(
+        _ndjson(job.job_id, job.follow()),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Job-Id": job.job_id},
+    )
+
+
+@app.get("/batch/stack-analysis/{job_id}")
+async def batch_stack_analysis_results(job_id: str):
+    """Replay a batch job's results as NDJSON, following it until it completes."""
+    records = batch_runner.follow(job_id)
+    if records is None:
+        raise HTTPException(status_code=404, detail="unknown batch job")
+    return StreamingResponse(
+        _ndjson(job_id, records), media_type="application/x-ndjson", headers={"X-Batch-Job-Id": job_id}
+    )
+
+
 @app.get("/")
 def root():
     """Root endpoint."""
@@ -51,17 +207,39 @@ def docs_info():
     """Helpful message for testing docs and endpoints."""
     return {
         "message": "Swagger UI available at /docs",
-        "endpoints": ["/healthz", "/", "/copilotkit"],
+        "endpoints": ["/healthz", "/readyz", "/metrics", "/cache-stats", "/model-stats", "/batch/stack-analysis", "/", "/copilotkit"],
     }
 
 def main():
-    """Run the uvicorn server."""
+    """Run the uvicorn server.
+
+    SERVER_MODE=production disables the reloader and runs WEB_CONCURRENCY worker
+    processes. Workers do not share memory, so unless CHECKPOINTER_BACKEND is set
+    explicitly, multi-worker runs use the SQLite checkpointer so a thread's
+    history is visible to whichever worker serves its next request.
+    """
     port = int(os.getenv("PORT", "8000"))
+    if os.getenv("SERVER_MODE", "development").lower() != "production":
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=port,
+            reload=True,
+        )
+        return
+
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        os.environ.setdefault("CHECKPOINTER_BACKEND", "sqlite")
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=True,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        proxy_headers=True,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "30")),
     )
 
 
@@ -0,0 +1,294 @@
+"""
+Hot-path instrumentation for both agents, exposed in the Prometheus text format.
+
+Every graph node runs inside a span (see instrument_node). Model callbacks,
+GitHub fetches and state emits attribute their tokens, time to first token,
+request counts and bytes to the current span; when the node returns, the span
+is folded into the process-wide metrics. With METRICS_TRACE=true each finished
+span is also logged as a one-line per-request trace.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+METRICS_TRACE = os.getenv("METRICS_TRACE", "false").lower() == "true"
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> (bucket counts, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total, count = self._values.get(label_values, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[label_values] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = _labels(self.labels + ("le",), label_values + (_number(bound),))
+                    lines.append(f"{self.name}_bucket{le} {bucket_count}")
+                inf = _labels(self.labels + ("le",), label_values + ("+Inf",))
+                lines.append(f"{self.name}_bucket{inf} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+node_duration = Histogram("agent_node_duration_seconds", "Wall time per graph node run", ("graph", "node"))
+node_errors = Counter("agent_node_errors_total", "Graph node runs that raised", ("graph", "node"))
+node_ttft = Histogram(
+    "agent_node_time_to_first_token_seconds", "Time from model call start to the first streamed token", ("graph", "node")
+)
+node_tokens = Counter("agent_node_model_tokens_total", "Model tokens used per node", ("graph", "node", "direction"))
+node_github_requests = Counter("agent_node_github_requests_total", "GitHub lookups per node", ("graph", "node", "result"))
+github_requests = Counter("github_requests_total", "GitHub lookups by cache result", ("result",))
+github_bytes = Counter("github_response_bytes_total", "Bytes received from GitHub over the network")
+github_duration = Histogram("github_request_duration_seconds", "GitHub lookup latency including cache checks", ("result",))
+
+state_emits = Counter("agent_state_emits_total", "State updates emitted to the frontend", ("graph", "node"))
+state_emit_bytes = Histogram(
+    "agent_state_emit_bytes",
+    "Serialized size of the sampled state updates emitted to the frontend",
+    ("graph", "node"),
+    (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+state_emit_seconds = Histogram(
+    "agent_state_emit_serialize_seconds",
+    "Time spent serializing each sampled state update",
+    ("graph", "node"),
+    (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+
+history_tokens = Histogram(
+    "agent_history_tokens",
+    "Estimated conversation history tokens per model call, before and after compaction",
+    ("graph", "node", "stage"),
+    (250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+admission_decisions = Counter(
+    "agent_admission_total",
+    "Agent run admission decisions: admitted, queued, rejected_client, rejected_queue_full, timed_out",
+    ("agent", "result"),
+)
+admission_wait = Histogram(
+    "agent_admission_wait_seconds",
+    "Time agent runs spent queued for a slot",
+    ("agent",),
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+_REGISTRY = [
+    node_duration,
+    node_errors,
+    node_ttft,
+    node_tokens,
+    node_github_requests,
+    github_requests,
+    github_bytes,
+    github_duration,
+    state_emits,
+    state_emit_bytes,
+    state_emit_seconds,
+    history_tokens,
+    admission_decisions,
+    admission_wait,
+]
+
+
+# Measurements accumulated while one graph node runs
+@dataclass
+class NodeSpan:
+    graph: str
+    node: str
+    thread_id: str
+    started: float
+    first_token: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    github_requests: int = 0
+    github_cache_hits: int = 0
+    github_bytes: int = 0
+    emits: int = 0
+    emit_bytes: int = 0
+
+
+_current_span: contextvars.ContextVar[Optional[NodeSpan]] = contextvars.ContextVar("metrics_span", default=None)
+
+
+# Wrap an async graph node so each run is timed and its model/GitHub usage is attributed to it
+def instrument_node(graph: str, node: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    async def wrapper(state: Any, config: Any = None):
+        configurable = (config or {}).get("configurable", {}) if isinstance(config, dict) else {}
+        span = NodeSpan(graph, node, str(configurable.get("thread_id", "-")), time.perf_counter())
+        token = _current_span.set(span)
+        try:
+            return await fn(state, config)
+        except Exception:
+            node_errors.inc(graph, node)
+            raise
+        finally:
+            _current_span.reset(token)
+            _finish(span)
+
+    return wrapper
+
+
+def _finish(span: NodeSpan) -> None:
+    elapsed = time.perf_counter() - span.started
+    node_duration.observe(elapsed, span.graph, span.node)
+    if span.input_tokens:
+        node_tokens.inc(span.graph, span.node, "input", amount=span.input_tokens)
+    if span.output_tokens:
+        node_tokens.inc(span.graph, span.node, "output", amount=span.output_tokens)
+    if METRICS_TRACE:
+        ttft = f"{(span.first_token - span.started) * 1000:.0f} ms" if span.first_token else "-"
+        logger.info(
+            "trace thread=%s %s.%s wall=%.0f ms ttft=%s tokens=%d/%d github=%d (cached %d, %d bytes) emits=%d (%d bytes)",
+            span.thread_id,
+            span.graph,
+            span.node,
+            elapsed * 1000,
+            ttft,
+            span.input_tokens,
+            span.output_tokens,
+            span.github_requests,
+            span.github_cache_hits,
+            span.github_bytes,
+            span.emits,
+            span.emit_bytes,
+        )
+
+
+# Called on the first streamed chunk of a model call, with that call's start time
+def record_first_token(call_started: float) -> None:
+    now = time.perf_counter()
+    span = _current_span.get()
+    if span is not None:
+        node_ttft.observe(now - call_started, span.graph, span.node)
+        if span.first_token is None:
+            span.first_token = now
+
+
+def record_model_usage(input_tokens: int, output_tokens: int) -> None:
+    span = _current_span.get()
+    if span is not None:
+        span.input_tokens += input_tokens
+        span.output_tokens += output_tokens
+
+
+# result is "hit" (served from cache), "revalidated" (304), "fetched", "throttled" or "error"; nbytes counts network bytes only
+def record_github_request(seconds: float, result: str, nbytes: int) -> None:
+    github_requests.inc(result)
+    github_duration.observe(seconds, result)
+    if nbytes:
+        github_bytes.inc(amount=nbytes)
+    span = _current_span.get()
+    if span is not None:
+        node_github_requests.inc(span.graph, span.node, result)
+        span.github_requests += 1
+        span.github_cache_hits += result in ("hit", "revalidated")
+        span.github_bytes += nbytes
+
+
+# nbytes and seconds are None for emits whose size was not sampled (see state_emitter)
+def record_state_emit(nbytes: Optional[int] = None, seconds: Optional[float] = None) -> None:
+    span = _current_span.get()
+    graph, node = (span.graph, span.node) if span is not None else ("-", "-")
+    state_emits.inc(graph, node)
+    if nbytes is not None:
+        state_emit_bytes.observe(nbytes, graph, node)
+        state_emit_seconds.observe(seconds, graph, node)
+    if span is not None:
+        span.emits += 1
+        span.emit_bytes += nbytes or 0
+
+
+def record_history_tokens(raw_tokens: int, compacted_tokens: int) -> None:
+    span = _current_span.get()
+    graph, node = (span.graph, span.node) if span is not None else ("-", "-")
+    history_tokens.observe(raw_tokens, graph, node, "raw")
+    history_tokens.observe(compacted_tokens, graph, node, "compacted")
+
+
+def record_admission(agent: str, result: str, waited: float) -> None:
+    admission_decisions.inc(agent, result)
+    if result in ("admitted", "queued", "timed_out"):
+        admission_wait.observe(waited, agent)
+
+
+# Render every metric in the Prometheus text format. `extra` carries values kept by other
+# modules (caches, model tiers) as (name, type, labels, value) samples.
+def render(extra: Optional[List[Tuple[str, str, Dict[str, str], float]]] = None) -> str:
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    typed = set()
+    for name, kind, labels, value in extra or []:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
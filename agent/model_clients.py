@@ -0,0 +1,72 @@
+"""
+Process-wide registry of Gemini model clients.
+
+Constructing ChatGoogleGenerativeAI or genai.Client sets up a fresh transport
+(gRPC channel / httpx pool and TLS handshake). Nodes fetch clients from here
+instead, so connections are reused across requests and closed once on shutdown.
+"""
+
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from google import genai
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+_chat_models: Dict[Tuple[str, float, int, Tuple[Any, ...]], ChatGoogleGenerativeAI] = {}
+_genai_client: Optional[genai.Client] = None
+
+
+# Return the shared chat model for the given parameters, creating it on first use
+def get_chat_model(
+    model: str = "gemini-2.5-pro",
+    temperature: float = 0.4,
+    max_retries: int = 2,
+    callbacks: Sequence[Any] = (),
+) -> ChatGoogleGenerativeAI:
+    key = (model, temperature, max_retries, tuple(callbacks))
+    chat_model = _chat_models.get(key)
+    if chat_model is None:
+        chat_model = ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            max_retries=max_retries,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            callbacks=list(callbacks) or None,
+        )
+        _chat_models[key] = chat_model
+    return chat_model
+
+
+# Return the shared google-genai client used for grounded search calls
+def get_genai_client() -> genai.Client:
+    global _genai_client
+    if _genai_client is None:
+        _genai_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    return _genai_client
+
+
+# Close every pooled transport; called from the FastAPI lifespan on shutdown
+async def aclose() -> None:
+    global _genai_client
+    for chat_model in _chat_models.values():
+        try:
+            chat_model.client.transport.close()
+        except Exception:
+            pass
+        async_client = chat_model.async_client_running
+        if async_client is not None:
+            try:
+                await async_client.transport.close()
+            except Exception:
+                pass
+    _chat_models.clear()
+
+    if _genai_client is not None:
+        api_client = _genai_client._api_client
+        try:
+            api_client._httpx_client.close()
+            await api_client._async_httpx_client.aclose()
+        except Exception:
+            pass
+        _genai_client = None
+
@@ -0,0 +1,190 @@
+"""
+Per-node routing of model calls to a flash or pro tier.
+
+Each node has a default tier in NODE_TIERS (overridable with MODEL_TIER_POLICY,
+e.g. "stack.analysis=flash,posts.fe_actions=pro"). A call on the flash tier is
+sent to pro instead when its input is larger than MODEL_FLASH_MAX_INPUT_TOKENS,
+and callers escalate to the next tier when the output fails validation.
+Latency, tokens and estimated cost are tracked per tier for tuning the policy.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+import metrics
+from model_clients import get_chat_model
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    name: str
+    model: str
+    # USD per million input / output tokens, used for cost estimates only
+    input_price: float
+    output_price: float
+
+
+MODEL_TIERS: Dict[str, ModelTier] = {
+    "flash": ModelTier(
+        "flash",
+        os.getenv("MODEL_FLASH", "gemini-2.5-flash"),
+        float(os.getenv("MODEL_FLASH_INPUT_PRICE", "0.30")),
+        float(os.getenv("MODEL_FLASH_OUTPUT_PRICE", "2.50")),
+    ),
+    "pro": ModelTier(
+        "pro",
+        os.getenv("MODEL_PRO", "gemini-2.5-pro"),
+        float(os.getenv("MODEL_PRO_INPUT_PRICE", "1.25")),
+        float(os.getenv("MODEL_PRO_OUTPUT_PRICE", "10.00")),
+    ),
+}
+TIER_ORDER = ["flash", "pro"]
+
+# Default tier per node: grounded research and the stack analysis need pro, the rest is formatting
+NODE_TIERS: Dict[str, str] = {
+    "posts.search": "pro",
+    "posts.tool_summary": "flash",
+    "posts.fe_actions": "flash",
+    "posts.history_summary": "flash",
+    "stack.analysis": "pro",
+    "stack.summary": "flash",
+}
+
+MODEL_FLASH_MAX_INPUT_TOKENS = int(os.getenv("MODEL_FLASH_MAX_INPUT_TOKENS", "8000"))
+
+
+def _parse_policy(value: str) -> Dict[str, str]:
+    policy = {}
+    for item in value.split(","):
+        node, _, tier = item.partition("=")
+        if tier.strip() in MODEL_TIERS:
+            policy[node.strip()] = tier.strip()
+    return policy
+
+
+NODE_TIERS.update(_parse_policy(os.getenv("MODEL_TIER_POLICY", "")))
+
+
+# Pick the tier for a node, moving off flash when the input is too large for it
+def route(node: str, input_tokens: int = 0) -> str:
+    tier = NODE_TIERS.get(node, "pro")
+    if tier == "flash" and input_tokens > MODEL_FLASH_MAX_INPUT_TOKENS:
+        return "pro"
+    return tier
+
+
+# The next tier up to retry with after a validation failure, or None at the top
+def next_tier(tier: str) -> Optional[str]:
+    index = TIER_ORDER.index(tier)
+    return TIER_ORDER[index + 1] if index + 1 < len(TIER_ORDER) else None
+
+
+# Rough input size of a list of chat messages (~4 characters per token)
+def estimate_message_tokens(messages: List[Any]) -> int:
+    return sum(len(str(getattr(message, "content", message))) for message in messages) // 4
+
+
+# Per-tier call counters; updated from callbacks and direct google-genai calls
+class TierStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {
+            name: {"calls": 0, "errors": 0, "escalations": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0}
+            for name in MODEL_TIERS
+        }
+
+    def record(self, tier: str, seconds: float, input_tokens: int, output_tokens: int, error: bool = False) -> None:
+        with self._lock:
+            stats = self._stats[tier]
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["seconds"] += seconds
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+
+    def record_escalation(self, tier: str) -> None:
+        with self._lock:
+            self._stats[tier]["escalations"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                tier = MODEL_TIERS[name]
+                cost = (stats["input_tokens"] * tier.input_price + stats["output_tokens"] * tier.output_price) / 1_000_000
+                result[name] = {
+                    "model": tier.model,
+                    **stats,
+                    "seconds": round(stats["seconds"], 3),
+                    "avg_latency_seconds": round(stats["seconds"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                    "estimated_cost_usd": round(cost, 6),
+                }
+            return result
+
+
+tier_stats = TierStats()
+
+
+# Times LangChain model runs and reads their usage metadata into tier_stats and the node metrics
+class _TierCallbackHandler(BaseCallbackHandler):
+    # Cheap and thread-safe, so skip the executor hop LangChain uses for sync handlers
+    run_inline = True
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self._started: Dict[UUID, float] = {}
+        self._streaming: set = set()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id not in self._streaming and run_id in self._started:
+            self._streaming.add(run_id)
+            metrics.record_first_token(self._started[run_id])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        tier_stats.record(self.tier, self._elapsed(run_id), input_tokens, output_tokens)
+        metrics.record_model_usage(input_tokens, output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        tier_stats.record(self.tier, self._elapsed(run_id), 0, 0, error=True)
+
+    def _elapsed(self, run_id: UUID) -> float:
+        self._streaming.discard(run_id)
+        started = self._started.pop(run_id, None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+
+_handlers = {name: _TierCallbackHandler(name) for name in MODEL_TIERS}
+
+
+# Shared chat model for a tier; its calls are counted in tier_stats
+def get_tier_model(tier: str, temperature: float = 0.4) -> ChatGoogleGenerativeAI:
+    return get_chat_model(MODEL_TIERS[tier].model, temperature, callbacks=(_handlers[tier],))
+
+
+# Model name for direct google-genai calls, which record their own usage via record_genai_usage
+def tier_model_name(tier: str) -> str:
+    return MODEL_TIERS[tier].model
+
+
+def record_genai_usage(tier: str, seconds: float, usage_metadata: Any) -> None:
+    input_tokens = getattr(usage_metadata, "prompt_token_count", None) or 0
+    output_tokens = getattr(usage_metadata, "candidates_token_count", None) or 0
+    tier_stats.record(tier, seconds, input_tokens, output_tokens)
+    metrics.record_model_usage(input_tokens, output_tokens)
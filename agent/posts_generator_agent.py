@@ -1,8 +1,15 @@
-from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+from model_clients import get_genai_client
+from model_router import (
+    estimate_message_tokens,
+    get_tier_model,
+    next_tier,
+    record_genai_usage,
+    route,
+    tier_model_name,
+    tier_stats,
+)
 from prompts import system_prompt, system_prompt_3, system_prompt_4
 load_dotenv()
 from typing import Dict, List, Any
@@ -11,20 +18,45 @@ from langgraph.graph import StateGraph, END, START
 from copilotkit import CopilotKitState
 from copilotkit.langchain import copilotkit_customize_config
 from langgraph.types import Command
-from langgraph.checkpoint.memory import MemorySaver
-from copilotkit.langgraph import copilotkit_emit_state
+from checkpointer import make_checkpointer
+from langchain_core.messages import AIMessage, message_chunk_to_message
+from state_emitter import StateEmitter, quiet_config
+from search_cache import SEARCH_CACHE_ENABLED, SearchResult, search_cache
+from history import compact_history
+import metrics
+from metrics import instrument_node
+import logging
+import os
+import time
 import uuid
-import asyncio
+
+logger = logging.getLogger(__name__)
+
+# Stream grounded context and post drafts into state as they are generated
+STREAM_POST_GENERATION = os.getenv("STREAM_POST_GENERATION", "true").lower() == "true"
 
 # Define the agent's runtime state schema for CopilotKit/LangGraph
 class AgentState(CopilotKitState):
     tool_logs: List[Dict[str, Any]]
     response: str  # Changed from Dict to str to match usage
+    post_drafts: Dict[str, Any]
+    # Rolling summary of the turns compacted out of model calls, and the last message it covers
+    history_summary: str
+    history_summarized_upto: str
+
+
+# Extract the (possibly partial) generate_post arguments from an accumulated message chunk
+def _partial_post_drafts(message) -> Dict[str, Any]:
+    for call in getattr(message, "tool_calls", None) or []:
+        if call.get("name") == "generate_post" and call.get("args"):
+            return call["args"]
+    return {}
 
 
 async def chat_node(state: AgentState, config: RunnableConfig):
     # 1. Define the model
-    model = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    model = get_genai_client()
+    emitter = StateEmitter(config)
     state["tool_logs"].append(
         {
             "id": str(uuid.uuid4()),
@@ -32,28 +64,25 @@ async def chat_node(state: AgentState, config: RunnableConfig):
             "status": "processing",
         }
     )
-    await copilotkit_emit_state(config, state)
+    await emitter.emit(state)
 
     # 2. Defining a condition to check if the last message is a tool so as to handle the FE tool responses
     if state["messages"][-1].type == "tool":
-        client = ChatGoogleGenerativeAI(
-            model="gemini-2.5-pro",
-            temperature=1.0,
-            max_retries=2,
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-        )
         messages = [*state["messages"]]
         messages[-1].content = (
             "The posts had been generated successfully. Just generate a summary of the posts."
         )
+        history, history_updates = await compact_history(state["messages"], state, config)
+        client = get_tier_model(route("posts.tool_summary", estimate_message_tokens(history)), temperature=1.0)
         resp = await client.ainvoke(
-            [*state["messages"]],
+            history,
             config,
         )
         state["tool_logs"] = []
-        await copilotkit_emit_state(config, state)
+        await emitter.emit(state)
+        await emitter.flush()
         # FIX: Initialize response with empty string when returning early
-        return Command(goto="fe_actions_node", update={"messages": resp, "response": ""})
+        return Command(goto="fe_actions_node", update={"messages": resp, "response": "", **history_updates})
 
     # 3. Initializing the grounding tool to perform google search when needed. Using the google_search provided in the google.genai.types module
     grounding_tool = types.Tool(google_search=types.GoogleSearch())
@@ -65,52 +94,120 @@ async def chat_node(state: AgentState, config: RunnableConfig):
     else:
         config = copilotkit_customize_config(config, emit_messages=True, emit_tool_calls=True)
     # 4. Generating the response using the model. This returns the response along with the web search queries.
-    response = model.models.generate_content(
-        model="gemini-2.5-pro",
-        contents=[
-            types.Content(role="user", parts=[types.Part(text=system_prompt)]),
-            types.Content(
-                role="model",
-                parts=[
-                    types.Part(
-                        text= system_prompt_4
+    # The async API keeps the event loop free for other sessions and is cancelled if the client disconnects.
+    contents = [
+        types.Content(role="user", parts=[types.Part(text=system_prompt)]),
+        types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    text= system_prompt_4
+                )
+            ],
+        ),
+        types.Content(
+            role="user", parts=[types.Part(text=state["messages"][-1].content)]
+        ),
+    ]
+    topic = state["messages"][-1].content
+    tier = route("posts.search", estimate_message_tokens([system_prompt, system_prompt_4, state["messages"][-1]]))
+    started = time.perf_counter()
+    web_search_queries: List[str] = []
+    usage = None
+    # Reuse recent research on the same or a closely paraphrased topic
+    cached = search_cache.lookup(topic) if SEARCH_CACHE_ENABLED else None
+    if cached is not None:
+        response_text = cached.text
+        web_search_queries = list(cached.web_search_queries)
+        state["tool_logs"][-1]["message"] = "Reusing recent research on this topic"
+    elif STREAM_POST_GENERATION:
+        # Stream the grounded context into state so the UI can show it while it is written
+        response_text = ""
+        first_token_at = None
+        stream = await model.aio.models.generate_content_stream(
+            model=tier_model_name(tier), contents=contents, config=model_config
+        )
+        async for chunk in stream:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                metrics.record_first_token(started)
+            usage = chunk.usage_metadata or usage
+            for candidate in chunk.candidates or []:
+                metadata = candidate.grounding_metadata
+                if metadata and metadata.web_search_queries:
+                    web_search_queries.extend(
+                        q for q in metadata.web_search_queries if q not in web_search_queries
                     )
-                ],
-            ),
-            types.Content(
-                role="user", parts=[types.Part(text=state["messages"][-1].content)]
-            ),
-        ],
-        config=model_config,
-    )
+            if chunk.text:
+                response_text += chunk.text
+                state["response"] = response_text
+                await emitter.emit(state)
+        if first_token_at is not None:
+            logger.info("chat_node time to first token: %.0f ms", (first_token_at - started) * 1000)
+    else:
+        response = await model.aio.models.generate_content(
+            model=tier_model_name(tier), contents=contents, config=model_config
+        )
+        usage = response.usage_metadata
+        response_text = response.text
+        web_search_queries = response.candidates[0].grounding_metadata.web_search_queries or []
+    if cached is None:
+        seconds = time.perf_counter() - started
+        record_genai_usage(tier, seconds, usage)
+        if SEARCH_CACHE_ENABLED:
+            search_cache.store(topic, SearchResult(response_text, web_search_queries, seconds))
     # 5. Updating the tool logs and response so as to see the tool logs in the Frontend Chat UI
     state["tool_logs"][-1]["status"] = "completed"
-    await copilotkit_emit_state(config, state)
-    state["response"] = response.text
+    state["response"] = response_text
     
-    # 6. Orchestrating the web search queries and updating the tool logs
-    for query in response.candidates[0].grounding_metadata.web_search_queries:
+    # 6. Recording the web search queries that were already performed, emitted as one batch
+    for query in web_search_queries:
         state["tool_logs"].append(
             {
                 "id": str(uuid.uuid4()),
                 "message": f"Performing Web Search for '{query}'",
-                "status": "processing",
+                "status": "completed",
             }
         )
-        await asyncio.sleep(1)
-        await copilotkit_emit_state(config, state)
-        state["tool_logs"][-1]["status"] = "completed"
-        await copilotkit_emit_state(config, state)
+    await emitter.emit(state)
+    await emitter.flush()
     return Command(goto="fe_actions_node", update=state)
 
 
+# Run the post generation tool call on a tier, streaming partial drafts into state when enabled
+async def _generate_post_call(state: AgentState, config: RunnableConfig, emitter: StateEmitter, messages, tier: str) -> AIMessage:
+    bound = get_tier_model(tier, temperature=1.0).bind_tools([*state["copilotkit"]["actions"]])
+    if not STREAM_POST_GENERATION:
+        return await bound.ainvoke(messages, config)
+    # Stream the tool call and publish partial LinkedIn/X drafts as the arguments arrive
+    started = time.perf_counter()
+    first_token_at = None
+    accumulated = None
+    async for chunk in bound.astream(messages, config):
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            logger.info(
+                "fe_actions_node time to first token: %.0f ms",
+                (first_token_at - started) * 1000,
+            )
+        accumulated = chunk if accumulated is None else accumulated + chunk
+        drafts = _partial_post_drafts(accumulated)
+        if drafts:
+            state["post_drafts"] = drafts
+            await emitter.emit(state)
+    return message_chunk_to_message(accumulated) if accumulated is not None else AIMessage(content="")
+
+
 async def fe_actions_node(state: AgentState, config: RunnableConfig):
     try:
         if state["messages"][-2].type == "tool":
             return Command(goto="end_node", update=state)
-    except Exception as e:
-        print("Moved")
+    except IndexError:
+        logger.debug("fe_actions_node: fewer than two messages, generating the post")
         
+    emitter = StateEmitter(config)
+    # Drafts from the previous turn must not show while this one is written
+    state["post_drafts"] = {}
     state["tool_logs"].append(
         {
             "id": str(uuid.uuid4()),
@@ -118,26 +215,33 @@ async def fe_actions_node(state: AgentState, config: RunnableConfig):
             "status": "processing",
         }
     )
-    await copilotkit_emit_state(config, state)
+    await emitter.emit(state)
     # 6. Initializing the model to generate the post along with the content that was scraped from the google search previously.
-    model = ChatGoogleGenerativeAI(
-        model="gemini-2.5-pro",
-        temperature=1.0,
-        max_retries=2,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-    )
-    await copilotkit_emit_state(config, state)
-    
     # FIX: Use .get() with a default value to prevent KeyError
     response_context = state.get("response", "")
-    response = await model.bind_tools([*state["copilotkit"]["actions"]]).ainvoke(
-        [system_prompt_3.replace("{context}", response_context), *state["messages"]],
-        config,
-    )
+    history, history_updates = await compact_history(state["messages"], state, config)
+    messages = [system_prompt_3.replace("{context}", response_context), *history]
+    tier = route("posts.fe_actions", estimate_message_tokens(messages))
+    while True:
+        # Only a reply without a tool call is escalated, so an attempt that may still be
+        # escalated streams its tool call and drafts as usual but keeps its text out of the chat
+        final = next_tier(tier) is None
+        attempt_config = config if final else quiet_config(config, emit_tool_calls=True)
+        response = await _generate_post_call(state, attempt_config, emitter, messages, tier)
+        # The prompt always requires generate_post; a reply without it goes to the next tier
+        if response.tool_calls or final:
+            break
+        if state["post_drafts"]:
+            state["post_drafts"] = {}
+            await emitter.emit(state)
+        tier_stats.record_escalation(tier)
+        logger.info("fe_actions_node: no tool call from the %s tier, escalating", tier)
+        tier = next_tier(tier)
     state["tool_logs"] = []
-    await copilotkit_emit_state(config, state)
+    await emitter.emit(state)
+    await emitter.flush()
     # 7. Returning the response to the frontend as a message which will invoke the correct calling of the Frontend useCopilotAction necessary.
-    return Command(goto="end_node", update={"messages": response})
+    return Command(goto="end_node", update={"messages": response, "post_drafts": state["post_drafts"], **history_updates})
 
 
 async def end_node(state: AgentState, config: RunnableConfig):
@@ -153,9 +257,9 @@ def router_function(state: AgentState, config: RunnableConfig):
 
 # Define a new graph
 workflow = StateGraph(AgentState)
-workflow.add_node("chat_node", chat_node)
-workflow.add_node("fe_actions_node", fe_actions_node)
-workflow.add_node("end_node", end_node)
+workflow.add_node("chat_node", instrument_node("posts", "chat_node", chat_node))
+workflow.add_node("fe_actions_node", instrument_node("posts", "fe_actions_node", fe_actions_node))
+workflow.add_node("end_node", instrument_node("posts", "end_node", end_node))
 workflow.set_entry_point("chat_node")
 workflow.set_finish_point("end_node")
 workflow.add_edge(START, "chat_node")
@@ -164,4 +268,4 @@ workflow.add_edge("fe_actions_node", END)
 
 
 # Compile the graph
-post_generation_graph = workflow.compile(checkpointer=MemorySaver())
\ No newline at end of file
+post_generation_graph = workflow.compile(checkpointer=make_checkpointer())
\ No newline at end of file
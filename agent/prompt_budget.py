@@ -0,0 +1,351 @@
+"""
+Token-budgeted assembly of the repository context for the stack analysis prompt.
+
+Instead of dumping raw JSON and fixed-size text slices, the context is reduced to
+what matters for stack inference: a pruned metadata record, dependency lists
+extracted from manifests, and the most relevant README sections, all fitted
+into ANALYSIS_PROMPT_TOKEN_BUDGET.
+"""
+
+import json
+import os
+import re
+import tomllib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+ANALYSIS_PROMPT_TOKEN_BUDGET = int(os.getenv("ANALYSIS_PROMPT_TOKEN_BUDGET", "6000"))
+
+# Share of the budget left after metadata that manifests may use; the README gets the rest
+MANIFEST_BUDGET_SHARE = 0.45
+
+# Cap for config files that have no dependency extractor (Dockerfile, vercel.json, ...)
+RAW_MANIFEST_MAX_TOKENS = 300
+
+# Manifests left out for lack of budget are listed by name, up to this many
+MANIFEST_OMITTED_NAMES = 10
+
+# Repository metadata fields that help infer purpose and stack
+REPO_INFO_FIELDS = [
+    "full_name",
+    "description",
+    "homepage",
+    "language",
+    "topics",
+    "default_branch",
+    "stargazers_count",
+    "forks_count",
+    "open_issues_count",
+    "archived",
+    "fork",
+    "size",
+    "created_at",
+    "pushed_at",
+]
+
+LOCKFILES = {"pnpm-lock.yaml", "yarn.lock", "bun.lockb", "Pipfile.lock", "package-lock.json"}
+
+# README headings worth keeping, most relevant first
+README_SECTION_KEYWORDS = [
+    ("stack", 6),
+    ("architecture", 6),
+    ("tech", 5),
+    ("built with", 5),
+    ("overview", 4),
+    ("about", 4),
+    ("feature", 3),
+    ("getting started", 3),
+    ("install", 3),
+    ("setup", 3),
+    ("usage", 2),
+    ("deploy", 2),
+    ("requirement", 2),
+    ("structure", 2),
+    ("config", 1),
+]
+README_SECTION_PENALTIES = ["license", "contributor", "contributing", "acknowledg", "sponsor", "changelog", "star history"]
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$", re.MULTILINE)
+_NOISE_LINE_RE = re.compile(r"^\s*(\[!\[|!\[|<img|<p align|<a href|<br|</?div|</?p>)", re.IGNORECASE)
+_REQUIREMENT_NAME_RE = re.compile(r"^\s*([A-Za-z0-9_.\-\[\]]+)")
+
+
+# Rough token estimate (~4 characters per token) used for budgeting and reporting
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _truncate_to_tokens(text: str, tokens: int) -> str:
+    limit = max(tokens, 0) * 4
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+# Keep only the metadata fields relevant to stack inference
+def prune_repo_info(repo_info: Dict[str, Any]) -> Dict[str, Any]:
+    pruned = {k: repo_info[k] for k in REPO_INFO_FIELDS if repo_info.get(k) not in (None, "", [])}
+    license_info = repo_info.get("license") or {}
+    if license_info.get("spdx_id"):
+        pruned["license"] = license_info["spdx_id"]
+    return pruned
+
+
+def _dependency_names(deps: Any) -> List[str]:
+    if isinstance(deps, dict):
+        return sorted(deps)
+    if isinstance(deps, list):
+        names = []
+        for dep in deps:
+            match = _REQUIREMENT_NAME_RE.match(str(dep))
+            if match:
+                names.append(match.group(1))
+        return names
+    raise TypeError(f"unexpected dependency list: {type(deps).__name__}")
+
+
+# A nested table of a parsed manifest ({} when absent); anything else is not a manifest we understand
+def _table(data: Dict[str, Any], key: str) -> Dict[str, Any]:
+    value = data.get(key, {})
+    if not isinstance(value, dict):
+        raise TypeError(f"{key} is not a table")
+    return value
+
+
+# Summarizers return None (or raise TypeError) for a manifest of an unexpected shape,
+# which is then sent as text
+def _summarize_package_json(text: str) -> Optional[Dict[str, Any]]:
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        return None
+    summary: Dict[str, Any] = {}
+    for key in ("name", "packageManager", "engines", "workspaces"):
+        if data.get(key):
+            summary[key] = data[key]
+    if data.get("scripts"):
+        summary["scripts"] = data["scripts"]
+    for key in ("dependencies", "devDependencies", "peerDependencies"):
+        if data.get(key):
+            summary[key] = _dependency_names(data[key])
+    return summary
+
+
+def _summarize_pyproject(text: str) -> Optional[Dict[str, Any]]:
+    data = tomllib.loads(text)
+    summary: Dict[str, Any] = {}
+    project = _table(data, "project")
+    if project.get("requires-python"):
+        summary["requires-python"] = project["requires-python"]
+    if project.get("dependencies"):
+        summary["dependencies"] = _dependency_names(project["dependencies"])
+    for group, deps in _table(project, "optional-dependencies").items():
+        summary[f"optional:{group}"] = _dependency_names(deps)
+    poetry = _table(_table(data, "tool"), "poetry")
+    if poetry.get("dependencies"):
+        summary["poetry.dependencies"] = _dependency_names(poetry["dependencies"])
+    build_backend = _table(data, "build-system").get("build-backend")
+    if build_backend:
+        summary["build-backend"] = build_backend
+    tools = sorted(_table(data, "tool"))
+    if tools:
+        summary["tools"] = tools
+    return summary
+
+
+def _summarize_toml_dependencies(text: str) -> Optional[Dict[str, Any]]:
+    data = tomllib.loads(text)
+    summary: Dict[str, Any] = {}
+    for key in ("dependencies", "dev-dependencies", "packages", "dev-packages"):
+        if data.get(key):
+            summary[key] = _dependency_names(data[key])
+    if _table(data, "package").get("name"):
+        summary["name"] = data["package"]["name"]
+    return summary
+
+
+def _summarize_requirements(text: str) -> Optional[Dict[str, Any]]:
+    names = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line or line.startswith("-"):
+            continue
+        match = _REQUIREMENT_NAME_RE.match(line)
+        if match:
+            names.append(match.group(1))
+    return {"dependencies": names}
+
+
+def _summarize_go_mod(text: str) -> Optional[Dict[str, Any]]:
+    module = re.search(r"^module\s+(\S+)", text, re.MULTILINE)
+    go_version = re.search(r"^go\s+(\S+)", text, re.MULTILINE)
+    requires = re.findall(r"^\s*(?:require\s+)?([\w.\-]+\.[\w.\-/]+)\s+v[\w.\-+]+", text, re.MULTILINE)
+    summary: Dict[str, Any] = {"dependencies": requires}
+    if module:
+        summary["module"] = module.group(1)
+    if go_version:
+        summary["go"] = go_version.group(1)
+    return summary
+
+
+def _summarize_gemfile(text: str) -> Optional[Dict[str, Any]]:
+    return {"dependencies": re.findall(r"^\s*gem\s+['\"]([^'\"]+)['\"]", text, re.MULTILINE)}
+
+
+def _summarize_composer(text: str) -> Optional[Dict[str, Any]]:
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        return None
+    return {key: _dependency_names(data[key]) for key in ("require", "require-dev") if data.get(key)}
+
+
+MANIFEST_SUMMARIZERS = {
+    "package.json": _summarize_package_json,
+    "pyproject.toml": _summarize_pyproject,
+    "Pipfile": _summarize_toml_dependencies,
+    "Cargo.toml": _summarize_toml_dependencies,
+    "requirements.txt": _summarize_requirements,
+    "go.mod": _summarize_go_mod,
+    "Gemfile": _summarize_gemfile,
+    "composer.json": _summarize_composer,
+}
+
+
+# Reduce a manifest to its dependency information; lockfiles only signal presence
+def summarize_manifest(name: str, text: str) -> Any:
+    base_name = name.rsplit("/", 1)[-1]
+    if base_name in LOCKFILES:
+        return "(lockfile present)"
+    summarizer = MANIFEST_SUMMARIZERS.get(base_name)
+    if summarizer is not None:
+        try:
+            summary = summarizer(text)
+            if summary is not None:
+                return summary
+        except (ValueError, TypeError, AttributeError):
+            # Unparseable or unexpectedly shaped: the model still gets the raw text
+            pass
+    return text
+
+
+def _split_readme_sections(readme: str) -> List[Tuple[str, str]]:
+    lines = [line for line in readme.splitlines() if not _NOISE_LINE_RE.match(line)]
+    text = "\n".join(lines)
+    matches = list(_HEADING_RE.finditer(text))
+    if not matches:
+        return [("", text.strip())]
+    sections = [("", text[: matches[0].start()].strip())]
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append((match.group(2).strip(), text[match.start():end].strip()))
+    return [(title, body) for title, body in sections if body]
+
+
+def _score_section(index: int, title: str) -> int:
+    if index == 0:
+        return 10
+    lowered = title.lower()
+    if any(word in lowered for word in README_SECTION_PENALTIES):
+        return -1
+    return max((weight for word, weight in README_SECTION_KEYWORDS if word in lowered), default=0)
+
+
+# Keep the highest-ranked README sections that fit the token budget, in original order
+def select_readme_sections(readme: str, budget_tokens: int) -> str:
+    sections = _split_readme_sections(readme)
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda i: (-_score_section(i, sections[i][0]), i),
+    )
+    chosen: Dict[int, str] = {}
+    remaining = budget_tokens
+    for i in ranked:
+        if _score_section(i, sections[i][0]) < 0 or remaining <= 0:
+            continue
+        body = sections[i][1]
+        cost = estimate_tokens(body)
+        if cost > remaining:
+            body = _truncate_to_tokens(body, remaining)
+            cost = remaining
+        chosen[i] = body
+        remaining -= cost
+    return "\n\n".join(chosen[i] for i in sorted(chosen))
+
+
+@dataclass
+class PromptBudgetReport:
+    budget_tokens: int
+    estimated_tokens: int
+    baseline_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.baseline_tokens - self.estimated_tokens, 0)
+
+
+# Build the budgeted prompt sections and a report comparing against the untrimmed context
+def build_prompt_sections(
+    context: Dict[str, Any], budget_tokens: int = ANALYSIS_PROMPT_TOKEN_BUDGET
+) -> Tuple[Dict[str, str], PromptBudgetReport]:
+    repo_info = _compact_json(prune_repo_info(context.get("repo_info", {})))
+    languages = _compact_json(context.get("languages", {}))
+    root_files = _compact_json(context.get("root_files", []))
+    fixed_tokens = estimate_tokens(repo_info + languages + root_files)
+    remaining = max(budget_tokens - fixed_tokens, 0)
+
+    manifest_budget = int(remaining * MANIFEST_BUDGET_SHARE)
+    summaries = {
+        name: summarize_manifest(name, text)
+        for name, text in context.get("manifests", {}).items()
+    }
+    # Structured summaries first; raw config files are capped and share what is left
+    manifest_parts: Dict[str, Any] = {}
+    omitted: List[str] = []
+    used = 0
+    for name, summary in sorted(summaries.items(), key=lambda item: isinstance(item[1], str)):
+        if isinstance(summary, str):
+            room = min(RAW_MANIFEST_MAX_TOKENS, manifest_budget - used)
+            if room <= 0:
+                omitted.append(name)
+                continue
+            summary = _truncate_to_tokens(summary, room)
+            if not summary:
+                continue
+            cost = estimate_tokens(summary)
+        else:
+            cost = estimate_tokens(_compact_json(summary))
+        if used + cost > manifest_budget:
+            omitted.append(name)
+            continue
+        manifest_parts[name] = summary
+        used += cost
+    manifests = _compact_json(manifest_parts)
+    if omitted:
+        shown = ", ".join(omitted[:MANIFEST_OMITTED_NAMES])
+        more = f" and {len(omitted) - MANIFEST_OMITTED_NAMES} more" if len(omitted) > MANIFEST_OMITTED_NAMES else ""
+        manifests += f"\n({len(omitted)} manifests omitted to fit the budget: {shown}{more})"
+
+    readme_budget = max(remaining - estimate_tokens(manifests), 0)
+    readme = select_readme_sections(context.get("readme", ""), readme_budget)
+
+    sections = {
+        "repo_info": repo_info,
+        "languages": languages,
+        "root_files": root_files,
+        "manifests": manifests,
+        "readme": readme,
+    }
+    baseline = (
+        json.dumps(context.get("repo_info", {}), indent=2)
+        + json.dumps(context.get("languages", {}), indent=2)
+        + json.dumps(context.get("root_files", []), indent=2)
+        + json.dumps({k: v[:2000] for k, v in context.get("manifests", {}).items()}, indent=2)
+        + context.get("readme", "")[:8000]
+    )
+    report = PromptBudgetReport(
+        budget_tokens=budget_tokens,
+        estimated_tokens=estimate_tokens("".join(sections.values())),
+        baseline_tokens=estimate_tokens(baseline),
+    )
+    return sections, report
@@ -0,0 +1,189 @@
+"""
+Cache of grounded Google Search research for the posts agent, keyed by topic.
+
+A request's topic is normalized to its content words in order (dropping filler
+such as "write", "post", "LinkedIn", "about") so "post about AI agents" and
+"LinkedIn post on AI agents" share one entry. Close paraphrases that differ by a
+word or two are matched with MinHash signatures over the topic's shingles, its
+words and adjacent word pairs: an entry is reused when their estimated Jaccard
+similarity reaches SEARCH_CACHE_SIMILARITY. The word pairs keep order in play, so
+"why Rust beats Go" does not match "why Go beats Rust". bench/search_similarity.py
+checks the threshold against paraphrase and distinct-topic pairs. Everything
+runs locally; no embedding service is involved.
+
+Entries expire after SEARCH_CACHE_TTL_SECONDS. Topics that ask for current events
+("latest", "today", "this week", ...) bypass the cache and always search, though
+their fresh results are still stored for later, less time-sensitive requests.
+"""
+
+import hashlib
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "21600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+# Minimum estimated Jaccard similarity between topic shingle sets for a near-duplicate hit
+SEARCH_CACHE_SIMILARITY = float(os.getenv("SEARCH_CACHE_SIMILARITY", "0.6"))
+SEARCH_CACHE_MINHASH_PERMUTATIONS = int(os.getenv("SEARCH_CACHE_MINHASH_PERMUTATIONS", "128"))
+
+# Words that describe the request rather than its subject
+_FILLER_WORDS = frozenset(
+    """
+    a an the and or of on in for to about with from by at as is are be into regarding
+    write create generate make draft compose give me us please can could you i we our my
+    post posts linkedin x twitter tweet tweets thread short long some new
+    """.split()
+)
+# Topics asking for current events are always searched afresh
+_TIME_SENSITIVE = re.compile(
+    r"\b(today|tonight|yesterday|tomorrow|now|latest|breaking|current|currently|recent|recently|"
+    r"this (week|month|morning|year)|news|just (announced|released|launched)|live|upcoming)\b",
+    re.IGNORECASE,
+)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EA2C4)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(SEARCH_CACHE_MINHASH_PERMUTATIONS)
+]
+
+
+# Lowercased content words of a topic in order, with a crude plural strip so "agents" matches "agent"
+def topic_words(topic: str) -> Tuple[str, ...]:
+    words = []
+    for word in re.findall(r"[a-z0-9][a-z0-9+#.-]*", topic.lower()):
+        word = word.strip(".-")
+        if not word or word in _FILLER_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if not words or words[-1] != word:
+            words.append(word)
+    return tuple(words)
+
+
+# The words of a topic plus each adjacent pair of them
+def topic_shingles(words: Sequence[str]) -> FrozenSet[str]:
+    return frozenset(words) | frozenset(f"{left} {right}" for left, right in zip(words, words[1:]))
+
+
+def is_time_sensitive(topic: str) -> bool:
+    return bool(_TIME_SENSITIVE.search(topic))
+
+
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(shingles: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [_word_hash(shingle) for shingle in shingles]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def estimated_similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(left, right)) / len(left)
+
+
+@dataclass
+class SearchResult:
+    text: str
+    web_search_queries: List[str]
+    # How long the grounded call took; credited as saved time on every reuse
+    seconds: float
+    stored_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class _Entry:
+    words: Tuple[str, ...]
+    signature: Tuple[int, ...]
+    result: SearchResult
+
+
+class SearchCache:
+    def __init__(self, ttl: float, max_entries: int, similarity: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        # Keyed by the topic words, in order
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def _key(words: Tuple[str, ...]) -> str:
+        return " ".join(words)
+
+    # Cached research for this topic or a close paraphrase of it, or None
+    def lookup(self, topic: str) -> Optional[SearchResult]:
+        words = topic_words(topic)
+        if not words:
+            self.misses += 1
+            return None
+        if is_time_sensitive(topic):
+            self.bypassed += 1
+            return None
+        self._expire()
+        entry = self._entries.get(self._key(words))
+        if entry is not None:
+            self.exact_hits += 1
+        else:
+            entry = self._nearest(words)
+            if entry is not None:
+                self.near_hits += 1
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(self._key(entry.words))
+        self.seconds_saved += entry.result.seconds
+        return entry.result
+
+    # Linear scan: the cache holds at most a few hundred signatures
+    def _nearest(self, words: Tuple[str, ...]) -> Optional[_Entry]:
+        signature = minhash(topic_shingles(words))
+        best, best_score = None, self.similarity
+        for entry in self._entries.values():
+            score = estimated_similarity(signature, entry.signature)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def store(self, topic: str, result: SearchResult) -> None:
+        words = topic_words(topic)
+        if not words or not result.text:
+            return
+        key = self._key(words)
+        self._entries[key] = _Entry(words, minhash(topic_shingles(words)), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _expire(self) -> None:
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if now - entry.result.stored_at >= self.ttl]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round((self.exact_hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            "seconds_saved": round(self.seconds_saved, 3),
+            "entries": len(self._entries),
+        }
+
+
+search_cache = SearchCache(SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_SIMILARITY)
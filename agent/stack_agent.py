@@ -1,40 +1,97 @@
 import os
 import re
+import asyncio
 import base64
 import json
-from typing import Any, Dict, List, Optional, Tuple
+import logging
+import tarfile
+import time
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote
 import uuid
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
-from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.messages import AIMessage, ToolMessage, message_chunk_to_message
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from checkpointer import make_checkpointer
 from langgraph.types import Command
 
 from copilotkit import CopilotKitState
-from copilotkit.langgraph import copilotkit_emit_state
 from copilotkit.langchain import copilotkit_customize_config
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from langchain_core.tools import tool
 
+import github_client
+from github_client import GITHUB_API_URL, GITHUB_RAW_URL
+from github_cache import response_cache
+from analysis_cache import analysis_cache
+from context_store import context_store
+from state_emitter import ForwardingEmitter, NullEmitter, StateEmitter, emit_state, quiet_config
+import metrics
+from metrics import instrument_node
+from prompt_budget import build_prompt_sections
+from stack_detector import (
+    JUDGMENT_FIELDS,
+    STACK_DETECTOR_MODE,
+    detect_stack,
+    merge_analysis,
+    merge_sections,
+    preliminary_analysis,
+    render_local_summary,
+)
+from archive_ingest import (
+    ArchiveContents,
+    ArchiveLimits,
+    ArchiveTooLarge,
+    WORKFLOWS_DIR,
+    find_local_source,
+    ingest_path,
+    ingest_tar_chunks,
+)
+from model_router import (
+    estimate_message_tokens,
+    get_tier_model,
+    next_tier,
+    route,
+    tier_stats,
+)
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever the analysis prompt or schema changes so cached analyses are not reused
+ANALYSIS_PROMPT_VERSION = "4"
+
+# "single": one model call whose tool arguments include the summary (rendered locally when
+# missing); "two_call": the previous tool call plus a separate summary call
+STACK_SUMMARY_MODE = os.getenv("STACK_SUMMARY_MODE", "single").lower()
+
+# Show a first-pass analysis right after gathering, then refine it as the tool call streams in
+PROGRESSIVE_STACK_ANALYSIS = os.getenv("PROGRESSIVE_STACK_ANALYSIS", "true").lower() == "true"
+
 
 # Define the agent's runtime state schema for CopilotKit/LangGraph
 class StackAgentState(CopilotKitState):
     tool_logs: List[Dict[str, Any]]
     analysis: Dict[str, Any]
     show_cards: bool
-    context : Dict[str, Any]
+    # Handle into context_store for the gathered repository context, which is
+    # too large to carry in emitted state
+    context_handle : str
     last_user_content : str
 
 
+# The only state fields the stack analyzer page renders; emits carry nothing else
+UI_STATE_KEYS = ("tool_logs", "analysis", "show_cards")
+
+
 # -------------------- Structured Output Schema --------------------
 # Model the structured analysis sections returned by the LLM
 class FrontendSpec(BaseModel):
@@ -95,9 +152,15 @@ class StructuredStackAnalysis(BaseModel):
     risks_notes: List[RiskNoteSpec] = Field(default_factory=list)
 
 
+# Tool arguments: the analysis plus the user-facing summary, so one call produces both
+class StackAnalysisToolArgs(StructuredStackAnalysis):
+    summary: Optional[str] = Field(
+        default=None, description="Concise, strictly textual summary of the repository for the user"
+    )
+
 
 # Expose a tool to return the structured stack analysis to the caller
-@tool("return_stack_analysis", args_schema=StructuredStackAnalysis)
+@tool("return_stack_analysis", args_schema=StackAnalysisToolArgs)
 def return_stack_analysis_tool(**kwargs) -> Dict[str, Any]:
     """Return the final stack analysis in a strict JSON structure. Use this tool to output results."""
     try:
@@ -107,6 +170,25 @@ def return_stack_analysis_tool(**kwargs) -> Dict[str, Any]:
         return kwargs
 
 
+# Read the analysis stored in state, which is kept as a JSON string for the frontend
+def _load_analysis(value: Any) -> Dict[str, Any]:
+    if isinstance(value, dict):
+        return value
+    try:
+        loaded = json.loads(value) if value else {}
+    except (TypeError, ValueError):
+        return {}
+    return loaded if isinstance(loaded, dict) else {}
+
+
+# Extract the (possibly partial) return_stack_analysis arguments from an accumulated message chunk
+def _partial_stack_analysis(message) -> Dict[str, Any]:
+    for call in getattr(message, "tool_calls", None) or []:
+        if call.get("name") == "return_stack_analysis" and call.get("args"):
+            return call["args"]
+    return {}
+
+
 # Parse a GitHub URL and return (owner, repo) when present
 def _parse_github_url(url: str) -> Optional[Tuple[str, str]]:
     """Extract owner and repo from a GitHub URL, even if surrounded by other text."""
@@ -119,44 +201,60 @@ def _parse_github_url(url: str) -> Optional[Tuple[str, str]]:
     return match.group("owner"), match.group("repo")
 
 
-# Build GitHub API headers and attach token when available
+# Build GitHub API headers; github_client attaches a token from its pool per request,
+# so cached responses are shared across the pool
 def _github_headers() -> Dict[str, str]:
-    token = os.getenv("GITHUB_TOKEN")
-    headers = {"Accept": "application/vnd.github+json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    return headers
+    return {"Accept": "application/vnd.github+json"}
+
 
+# Issue a GET request to the GitHub API (through the response cache) and return a successful response or None
+async def _gh_get(url: str) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    network: List[httpx.Response] = []
+
+    async def fetch(fetch_url: str, headers: Dict[str, str]) -> httpx.Response:
+        resp = await github_client.fetch(fetch_url, headers)
+        network.append(resp)
+        return resp
 
-# Issue a GET request to the GitHub API and return a successful response or None
-def _gh_get(url: str) -> Optional[requests.Response]:
     try:
-        resp = requests.get(url, headers=_github_headers(), timeout=30)
-        if resp.status_code == 200:
-            return resp
+        resp = await response_cache.get(url, _github_headers(), fetch)
+    except github_client.GitHubRateLimited:
+        metrics.record_github_request(time.perf_counter() - started, "throttled", 0)
         return None
-    except requests.RequestException:
+    except httpx.HTTPError:
+        metrics.record_github_request(time.perf_counter() - started, "error", 0)
         return None
+    if not network:
+        result = "hit"
+    elif network[0].status_code == 304:
+        result = "revalidated"
+    else:
+        result = "fetched"
+    metrics.record_github_request(
+        time.perf_counter() - started, result, sum(len(r.content) for r in network)
+    )
+    return resp if resp.status_code == 200 else None
 
 
 # Fetch general repository metadata
-def _fetch_repo_info(owner: str, repo: str) -> Dict[str, Any]:
+async def _fetch_repo_info(owner: str, repo: str) -> Dict[str, Any]:
     info = {}
-    r = _gh_get(f"https://api.github.com/repos/{owner}/{repo}")
+    r = await _gh_get(f"{GITHUB_API_URL}/repos/{owner}/{repo}")
     if r:
         info = r.json()
     return info
 
 
 # Fetch language usage in bytes for the repository
-def _fetch_languages(owner: str, repo: str) -> Dict[str, int]:
-    r = _gh_get(f"https://api.github.com/repos/{owner}/{repo}/languages")
+async def _fetch_languages(owner: str, repo: str) -> Dict[str, int]:
+    r = await _gh_get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/languages")
     return r.json() if r else {}
 
 
 # Fetch README content, falling back to scanning root contents when needed
-def _fetch_readme(owner: str, repo: str) -> str:
-    r = _gh_get(f"https://api.github.com/repos/{owner}/{repo}/readme")
+async def _fetch_readme(owner: str, repo: str) -> str:
+    r = await _gh_get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/readme")
     if r:
         data = r.json()
         content = data.get("content")
@@ -165,20 +263,26 @@ def _fetch_readme(owner: str, repo: str) -> str:
                 return base64.b64decode(content).decode("utf-8", errors="ignore")
             except Exception:
                 pass
-    contents = _gh_get(f"https://api.github.com/repos/{owner}/{repo}/contents/")
+    contents = await _gh_get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/")
     if contents:
         for item in contents.json():
             name = item.get("name", "").lower()
             if name in {"readme.md", "readme", "readme.txt", "readme.rst"}:
-                file_resp = _gh_get(item.get("download_url", ""))
+                file_resp = await _gh_get(item.get("download_url", ""))
                 if file_resp:
                     return file_resp.text
     return ""
 
 
+# Resolve the commit SHA at the tip of the default branch
+async def _fetch_head_sha(owner: str, repo: str) -> Optional[str]:
+    r = await _gh_get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits/HEAD")
+    return r.json().get("sha") if r else None
+
+
 # List files and directories in the repository root
-def _list_root(owner: str, repo: str) -> List[Dict[str, Any]]:
-    r = _gh_get(f"https://api.github.com/repos/{owner}/{repo}/contents/")
+async def _list_root(owner: str, repo: str) -> List[Dict[str, Any]]:
+    r = await _gh_get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/")
     return r.json() if r else []
 
 
@@ -216,34 +320,31 @@ ROOT_MANIFEST_CANDIDATES = [
 ]
 
 
-# Download contents of known manifest files when present in root
-def _fetch_manifest_contents(
+# Download contents of known manifest files when present in root, all in parallel
+async def _fetch_manifest_contents(
     owner: str,
     repo: str,
     default_branch: Optional[str],
     root_items: List[Dict[str, Any]],
 ) -> Dict[str, str]:
-    manifest_map: Dict[str, str] = {}
     by_name = {item.get("name"): item for item in root_items}
 
-    for name in ROOT_MANIFEST_CANDIDATES:
-        item = by_name.get(name)
-        if not item:
-            continue
+    async def _fetch_one(name: str) -> Optional[str]:
+        item = by_name[name]
         download_url = item.get("download_url")
-        text: Optional[str] = None
         if download_url:
-            r = _gh_get(download_url)
-            if r:
-                text = r.text
+            r = await _gh_get(download_url)
         elif default_branch:
-            raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{default_branch}/{name}"
-            r = _gh_get(raw_url)
-            if r:
-                text = r.text
-        if text is not None:
-            manifest_map[name] = text
-    return manifest_map
+            r = await _gh_get(
+                f"{GITHUB_RAW_URL}/{owner}/{repo}/{default_branch}/{name}"
+            )
+        else:
+            return None
+        return r.text if r else None
+
+    names = [name for name in ROOT_MANIFEST_CANDIDATES if by_name.get(name)]
+    texts = await asyncio.gather(*(_fetch_one(name) for name in names))
+    return {name: text for name, text in zip(names, texts) if text is not None}
 
 
 # Summarize root items as "name (type)" strings
@@ -254,21 +355,236 @@ def _summarize_root_files(root_items: List[Dict[str, Any]]) -> List[str]:
     return names
 
 
-# Build the analysis prompt by embedding gathered repository context
-def _build_analysis_prompt(context: Dict[str, Any]) -> str:
+# "tree" reads the whole recursive git tree in one call; "contents" lists the root only;
+# "archive" streams the repository tarball once
+STACK_FETCH_MODE = os.getenv("STACK_FETCH_MODE", "tree").lower()
+TREE_MANIFEST_MAX_DEPTH = int(os.getenv("TREE_MANIFEST_MAX_DEPTH", "3"))
+TREE_MANIFEST_MAX_FILES = int(os.getenv("TREE_MANIFEST_MAX_FILES", "40"))
+TREE_MANIFEST_MAX_BYTES = int(os.getenv("TREE_MANIFEST_MAX_BYTES", str(512 * 1024)))
+TREE_IGNORED_DIRS = {"node_modules", "vendor", "dist", "build", ".venv", "venv", "__pycache__", ".git"}
+
+# Match any manifest candidate by file name at any depth
+MANIFEST_PATH_PATTERN = re.compile(
+    r"(?:^|/)(" + "|".join(re.escape(name) for name in ROOT_MANIFEST_CANDIDATES) + r")$"
+)
+_MANIFEST_PRIORITY = {name: i for i, name in enumerate(ROOT_MANIFEST_CANDIDATES)}
+
+
+# Fetch the full recursive file tree of the default branch in a single request.
+# Returns (entries, truncated); GitHub truncates the listing of very large repositories.
+async def _fetch_tree(owner: str, repo: str) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+    r = await _gh_get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/HEAD?recursive=1")
+    if not r:
+        return None
+    body = r.json()
+    return body.get("tree", []), bool(body.get("truncated"))
+
+
+# Pick manifest blobs from the tree, shallowest first, within depth, count and byte limits
+def _select_tree_manifests(tree: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    candidates = []
+    for entry in tree:
+        if entry.get("type") != "blob":
+            continue
+        path = entry.get("path", "")
+        match = MANIFEST_PATH_PATTERN.search(path)
+        if not match:
+            continue
+        parts = path.split("/")
+        if len(parts) - 1 > TREE_MANIFEST_MAX_DEPTH or TREE_IGNORED_DIRS.intersection(parts[:-1]):
+            continue
+        candidates.append((len(parts), _MANIFEST_PRIORITY[match.group(1)], path, entry))
+
+    selected = []
+    total_bytes = 0
+    for _, _, _, entry in sorted(candidates, key=lambda c: c[:3]):
+        size = entry.get("size", 0)
+        if len(selected) >= TREE_MANIFEST_MAX_FILES or total_bytes + size > TREE_MANIFEST_MAX_BYTES:
+            continue
+        selected.append(entry)
+        total_bytes += size
+    return selected
+
+
+# Download the selected manifest blobs in parallel, keyed by their repository path
+async def _fetch_tree_manifests(
+    owner: str, repo: str, ref: str, entries: List[Dict[str, Any]]
+) -> Dict[str, str]:
+    paths = [entry["path"] for entry in entries]
+    responses = await asyncio.gather(
+        *(_gh_get(f"{GITHUB_RAW_URL}/{owner}/{repo}/{ref}/{quote(path)}") for path in paths)
+    )
+    return {path: r.text for path, r in zip(paths, responses) if r}
+
+
+# Summarize top-level tree entries in the same "name (type)" form as the contents API
+def _summarize_tree_root(tree: List[Dict[str, Any]]) -> List[str]:
+    root_files = [
+        f"{entry['path']} ({'dir' if entry.get('type') == 'tree' else 'file'})"
+        for entry in tree
+        if "/" not in entry.get("path", "/")
+    ]
+    if _has_workflows(tree):
+        root_files.append(f"{WORKFLOWS_DIR} (dir)")
+    return root_files
+
+
+def _has_workflows(tree: List[Dict[str, Any]]) -> bool:
+    return any(entry.get("path", "").startswith(WORKFLOWS_DIR + "/") for entry in tree)
+
+
+# Build the analysis prompt from the gathered context, fitted to the token budget
+def _build_analysis_prompt(
+    context: Dict[str, Any], local_analysis: Optional[Dict[str, Any]] = None
+) -> str:
+    sections, report = build_prompt_sections(context)
+    logger.info(
+        "analysis prompt ~%d tokens (budget %d), ~%d saved vs. untrimmed context",
+        report.estimated_tokens,
+        report.budget_tokens,
+        report.saved_tokens,
+    )
     return (
         "You are a senior software architect. Analyze the following GitHub repository at a high level.\n"
         "Goals: Provide a concise, structured overview of what the project does and the tech stack.\n\n"
         "Return JSON with keys: purpose, frontend, backend, database, infrastructure, ci_cd, key_root_files, how_to_run, risks_notes.\n\n"
-        f"Repository metadata:\n{json.dumps(context.get('repo_info', {}), indent=2)}\n\n"
-        f"Languages (bytes of code):\n{json.dumps(context.get('languages', {}), indent=2)}\n\n"
-        f"Root items:\n{json.dumps(context.get('root_files', []), indent=2)}\n\n"
-        f"Manifests (truncated to first 2000 chars each):\n{json.dumps({k: v[:2000] for k, v in context.get('manifests', {}).items()}, indent=2)}\n\n"
-        "README content (truncated to first 8000 chars):\n"
-        + context.get("readme", "")[:8000]
+        f"Repository metadata:\n{sections['repo_info']}\n\n"
+        f"Languages (bytes of code):\n{sections['languages']}\n\n"
+        f"Root items:\n{sections['root_files']}\n\n"
+        f"Manifests (dependency lists extracted where possible):\n{sections['manifests']}\n\n"
+        "README (most relevant sections):\n"
+        + sections["readme"]
         + "\n\n"
-        "Infer the stack with specific frameworks and libraries when possible (e.g., Next.js, Express, FastAPI, Prisma, Postgres)."
+        + (
+            "Stack fields already detected from the manifests (authoritative, keep them as they are):\n"
+            f"{json.dumps(local_analysis, separators=(',', ':'))}\n"
+            f"Focus on the fields that need judgment: {', '.join(JUDGMENT_FIELDS)}, and any stack field not detected above.\n\n"
+            if local_analysis
+            else ""
+        )
+        + "Infer the stack with specific frameworks and libraries when possible (e.g., Next.js, Express, FastAPI, Prisma, Postgres)."
+    )
+
+
+# Gather repository context over the REST API: metadata, languages, README and the
+# file tree concurrently, then the matched manifests
+async def _gather_via_api(owner: str, repo: str) -> Dict[str, Any]:
+    use_tree = STACK_FETCH_MODE == "tree"
+    repo_info, languages, readme, head_sha, tree = await asyncio.gather(
+        _fetch_repo_info(owner, repo),
+        _fetch_languages(owner, repo),
+        _fetch_readme(owner, repo),
+        _fetch_head_sha(owner, repo),
+        _fetch_tree(owner, repo) if use_tree else asyncio.sleep(0),
+    )
+    if tree is not None and tree[1]:
+        # A truncated tree may be missing any file, root ones included: take the root from
+        # the contents listing and add whatever nested manifests the partial tree does show
+        logger.warning("git tree of %s/%s is truncated; reading the root listing as well", owner, repo)
+        root_items = await _list_root(owner, repo)
+        root_files = _summarize_root_files(root_items)
+        if _has_workflows(tree[0]):
+            root_files.append(f"{WORKFLOWS_DIR} (dir)")
+        manifests, nested = await asyncio.gather(
+            _fetch_manifest_contents(owner, repo, repo_info.get("default_branch"), root_items),
+            _fetch_tree_manifests(
+                owner,
+                repo,
+                head_sha or "HEAD",
+                _select_tree_manifests([entry for entry in tree[0] if "/" in entry.get("path", "")]),
+            ),
+        )
+        manifests.update(nested)
+    elif tree is not None:
+        root_files = _summarize_tree_root(tree[0])
+        manifests = await _fetch_tree_manifests(
+            owner, repo, head_sha or "HEAD", _select_tree_manifests(tree[0])
+        )
+    else:
+        # Contents mode, or the tree call failed: scan the root listing only
+        root_items = await _list_root(owner, repo)
+        root_files = _summarize_root_files(root_items)
+        default_branch = repo_info.get("default_branch")
+        manifests = await _fetch_manifest_contents(owner, repo, default_branch, root_items)
+    return {
+        "head_sha": head_sha,
+        "repo_info": repo_info,
+        "languages": languages,
+        "readme": readme,
+        "root_files": root_files,
+        "manifests": manifests,
+    }
+
+
+# Gather repository context in one pass over a local clone/archive, or a streamed tarball.
+# Returns None when the archive is unavailable or over the size caps.
+async def _gather_via_archive(owner: str, repo: str) -> Optional[Dict[str, Any]]:
+    limits = ArchiveLimits(
+        manifest_pattern=MANIFEST_PATH_PATTERN,
+        max_depth=TREE_MANIFEST_MAX_DEPTH,
+        max_manifests=TREE_MANIFEST_MAX_FILES,
+        max_manifest_bytes=TREE_MANIFEST_MAX_BYTES,
     )
+    local_source = find_local_source(owner, repo)
+    try:
+        if local_source:
+            contents = await asyncio.to_thread(ingest_path, local_source, limits)
+            return {
+                "head_sha": contents.commit_hint,
+                "repo_info": {"full_name": f"{owner}/{repo}"},
+                **contents.to_context(),
+            }
+
+        repo_info, head_sha = await asyncio.gather(
+            _fetch_repo_info(owner, repo), _fetch_head_sha(owner, repo)
+        )
+        contents = await _ingest_remote_tarball(
+            f"{GITHUB_API_URL}/repos/{owner}/{repo}/tarball/{head_sha or 'HEAD'}", limits
+        )
+    except (OSError, httpx.HTTPError, tarfile.TarError, zipfile.BadZipFile, ArchiveTooLarge):
+        return None
+    if contents is None:
+        return None
+    return {"head_sha": head_sha, "repo_info": repo_info, **contents.to_context()}
+
+
+# Stream a repository tarball through the GitHub scheduler into the archive reader.
+# Returns None when it is unavailable or the rate limit is exhausted.
+async def _ingest_remote_tarball(url: str, limits: ArchiveLimits) -> Optional[ArchiveContents]:
+    started = time.perf_counter()
+    streamed = 0
+
+    async def counted(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        nonlocal streamed
+        async for chunk in chunks:
+            streamed += len(chunk)
+            yield chunk
+
+    try:
+        async with github_client.stream(url, _github_headers()) as resp:
+            if resp.status_code != 200:
+                metrics.record_github_request(time.perf_counter() - started, "error", 0)
+                return None
+            contents = await ingest_tar_chunks(counted(resp.aiter_bytes()), limits)
+    except github_client.GitHubRateLimited:
+        metrics.record_github_request(time.perf_counter() - started, "throttled", 0)
+        return None
+    except Exception:
+        metrics.record_github_request(time.perf_counter() - started, "error", streamed)
+        raise
+    metrics.record_github_request(time.perf_counter() - started, "fetched", streamed)
+    return contents
+
+
+# Gather the full context for one repository: in one pass over a local source or
+# tarball when configured, otherwise over the REST API
+async def gather_repository(owner: str, repo: str) -> Dict[str, Any]:
+    gathered = None
+    if STACK_FETCH_MODE == "archive" or find_local_source(owner, repo):
+        gathered = await _gather_via_archive(owner, repo)
+    if gathered is None:
+        gathered = await _gather_via_api(owner, repo)
+    return {"owner": owner, "repo": repo, **gathered}
 
 
 async def gather_context_node(state: StackAgentState, config: RunnableConfig):
@@ -278,6 +594,7 @@ async def gather_context_node(state: StackAgentState, config: RunnableConfig):
         emit_messages=True,
         emit_tool_calls=True,
     )
+    emitter = StateEmitter(config, keys=UI_STATE_KEYS)
 
     # Parse the last user message for a GitHub URL; fall back when absent
     last_user_content = state["messages"][-1].content if state["messages"] else ""
@@ -288,7 +605,7 @@ async def gather_context_node(state: StackAgentState, config: RunnableConfig):
             goto= "analyze",
             update = {
                 "analysis": state["analysis"],
-                "context": {},
+                "context_handle": "",
                 "tool_logs": state["tool_logs"],
                 "show_cards": False,
                 "last_user_content": last_user_content
@@ -305,12 +622,12 @@ async def gather_context_node(state: StackAgentState, config: RunnableConfig):
             "status": "processing",
         }
     )
-    await copilotkit_emit_state(config, state)
+    await emitter.emit(state)
 
 
     owner, repo = parsed
     state["tool_logs"][-1]["status"] = "completed"
-    await copilotkit_emit_state(config, state)
+    await emitter.emit(state)
 
     # 3. Create a log entry for repository metadata fetch
     state["tool_logs"].append(
@@ -320,157 +637,334 @@ async def gather_context_node(state: StackAgentState, config: RunnableConfig):
             "status": "processing",
         }
     )
-    await copilotkit_emit_state(config, state)
-
-    # 4. Fetch metadata, languages, README, root items, and manifests
-    repo_info = _fetch_repo_info(owner, repo)
-    default_branch = repo_info.get("default_branch")
-    languages = _fetch_languages(owner, repo)
-    readme = _fetch_readme(owner, repo)
-    root_items = _list_root(owner, repo)
-    manifests = _fetch_manifest_contents(owner, repo, default_branch, root_items)
-
-    # 5. Assemble the gathered context for downstream analysis
-    context: Dict[str, Any] = {
-        "owner": owner,
-        "repo": repo,
-        "repo_info": repo_info,
-        "languages": languages,
-        "readme": readme,
-        "root_files": _summarize_root_files(root_items),
-        "manifests": manifests,
-    }
+    fetch_log = state["tool_logs"][-1]
+    await emitter.emit(state)
+
+    # Queue this thread's GitHub requests fairly against other sessions, and show
+    # rate limiting as its own log entry instead of an empty result
+    github_client.set_session(str(config.get("configurable", {}).get("thread_id", "default")))
+    throttle_log: Dict[str, Any] = {}
+    rate_limited_until: List[float] = []
+
+    async def on_throttled(seconds: float, waiting: bool) -> None:
+        if not waiting:
+            rate_limited_until.append(time.time() + seconds)
+        if not throttle_log:
+            throttle_log.update({"id": str(uuid.uuid4()), "status": "throttled"})
+            state["tool_logs"].append(throttle_log)
+        throttle_log["message"] = (
+            f"GitHub rate limit reached, waiting {seconds:.0f}s"
+            if waiting
+            else f"GitHub rate limit exhausted, resets in {seconds / 60:.0f} min"
+        )
+        await emitter.emit(state)
 
-    state["tool_logs"][-1]["status"] = "completed"
-    await copilotkit_emit_state(config, state)
+    github_client.set_throttle_listener(on_throttled)
+
+    # 4. Fetch metadata, languages, README, root items and manifests
+    context = await gather_repository(owner, repo)
+    github_client.set_throttle_listener(None)
+
+    # 5. Mark a context gathered while rate limited so it is not analyzed
+    if rate_limited_until:
+        context["rate_limited_until"] = max(rate_limited_until)
+
+    fetch_log["status"] = "completed"
+    # Render the cards straight away from what was fetched; the model refines them later
+    show_cards = PROGRESSIVE_STACK_ANALYSIS and "rate_limited_until" not in context
+    if show_cards:
+        state["analysis"] = json.dumps(preliminary_analysis(context))
+        state["show_cards"] = True
+    await emitter.emit(state)
+    await emitter.flush()
 
     return Command(
         goto= "analyze",
         update = {
             "analysis": state["analysis"],
-            "context": context,
+            "context_handle": context_store.put(context),
             "tool_logs": state["tool_logs"],
-            "show_cards": False,
+            "show_cards": show_cards,
             "last_user_content": last_user_content
         }
     )
 
 
-async def analyze_with_gemini_node(state: StackAgentState, config: RunnableConfig):
-    # 6. Short-circuit when no context exists and request a valid URL
-    
-    context = state.get("context", {})
-    if not context:
-        state["messages"].append(AIMessage(content= "Please provide a valid GitHub URL"))
-        return Command(
-            goto= "end",
-            update = {
-                "messages": state["messages"],
-                "show_cards": state["show_cards"],
-                "analysis": state["analysis"]
-            }
-        )
-
-    # 7. Begin analysis and emit progress
-    state["tool_logs"] = state.get("tool_logs", [])
-    state["tool_logs"].append(
-        {"id": str(uuid.uuid4()), "message": "Analyzing stack", "status": "processing"}
-    )
-    await copilotkit_emit_state(config, state)
+# Stream or invoke the structured tool call, merging partial sections into the cards as they arrive
+async def _call_stack_tool(
+    state: StackAgentState,
+    config: RunnableConfig,
+    emitter: StateEmitter,
+    messages: List[Any],
+    local_analysis: Dict[str, Any],
+    tier: str,
+) -> AIMessage:
+    bound = get_tier_model(tier, temperature=0.4).bind_tools([return_stack_analysis_tool])
+    if not PROGRESSIVE_STACK_ANALYSIS:
+        return await bound.ainvoke(messages, config)
+    shown = _load_analysis(state.get("analysis"))
+    accumulated = None
+    async for chunk in bound.astream(messages, config):
+        accumulated = chunk if accumulated is None else accumulated + chunk
+        partial = _partial_stack_analysis(accumulated)
+        partial.pop("summary", None)
+        if partial:
+            shown = merge_sections(shown, merge_analysis(local_analysis, partial))
+            state["analysis"] = json.dumps(shown)
+            await emitter.emit(state)
+    return message_chunk_to_message(accumulated) if accumulated is not None else AIMessage(content="")
+
+
+# Run the structured tool call and, in two_call mode, a separate summary pass.
+# Returns None when no analysis was produced.
+async def _run_llm_analysis(
+    state: StackAgentState,
+    config: RunnableConfig,
+    emitter: StateEmitter,
+    context: Dict[str, Any],
+    local_analysis: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    two_call = STACK_SUMMARY_MODE == "two_call"
 
     # 8. Build the prompt and system instructions for structured tool usage
-    prompt = _build_analysis_prompt(context)
+    prompt = _build_analysis_prompt(context, local_analysis)
     system_instructions = (
         "You are a senior software architect. Analyze the repository context provided by the user. "
         "When responding, do not write free-form text. Always call the tool `return_stack_analysis` "
         "with all applicable fields filled."
+        + ("" if two_call else " Put a concise, strictly textual summary of the repository in `summary`.")
     )
     messages = [
         SystemMessage(content=system_instructions),
         HumanMessage(content=prompt),
     ]
 
-    # 9. Initialize Gemini client for tool call and fallback passes
-    model = ChatGoogleGenerativeAI(
-        model="gemini-2.5-pro",
-        temperature=0.4,
-        max_retries=2,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-    )
-
-    pretty: str
     structured_payload: Optional[Dict[str, Any]] = None
-
-    # 10. Attempt tool-based structured output first
-    try:
-        bound = model.bind_tools([return_stack_analysis_tool])
-        tool_msg = await bound.ainvoke(messages, config)
-        if isinstance(tool_msg, AIMessage):
-            tool_calls = getattr(tool_msg, "tool_calls", None)
-            if tool_calls:
-                for call in tool_calls:
-                    if call.get("name") == "return_stack_analysis":
-                        args = call.get("args", {}) or {}
-                        state['analysis'] = json.dumps(args)
-                        state['show_cards'] = True
-                        await copilotkit_emit_state(config, state)
-                        try:
-                            structured_payload = StructuredStackAnalysis(
-                                **args
-                            ).model_dump(exclude_none=True)
-                        except Exception:
-                            structured_payload = dict(args)
-                        break
-    except Exception:
-        pass
-
-    if structured_payload is None:
-        # 11. Fall back to schema-coerced structured output if no tool call is returned
+    model_summary: Optional[str] = None
+    tool_msg: Optional[AIMessage] = None
+    tool_call: Optional[Dict[str, Any]] = None
+
+    # 9. Attempt tool-based structured output first, moving up a tier when the
+    # tool call is missing or does not validate
+    tier = route("stack.analysis", estimate_message_tokens(messages))
+    shown_before = state.get("analysis")
+    while True:
+        # An attempt that may still be escalated runs out of the stream and off the cards;
+        # the kept payload is published below
+        final = next_tier(tier) is None
+        attempt_config = config if final else quiet_config(config)
+        attempt_emitter = emitter if final else NullEmitter(config)
+        try:
+            tool_msg = await _call_stack_tool(state, attempt_config, attempt_emitter, messages, local_analysis, tier)
+            tool_call = next(
+                (call for call in tool_msg.tool_calls or [] if call.get("name") == "return_stack_analysis"),
+                None,
+            )
+        except Exception:
+            logger.exception("stack analysis tool call failed on the %s tier", tier)
+            tool_call = None
+        if tool_call is not None:
+            args = dict(tool_call.get("args") or {})
+            model_summary = args.pop("summary", None)
+            args = merge_analysis(local_analysis, args)
+            try:
+                structured_payload = StructuredStackAnalysis(**args).model_dump(exclude_none=True)
+            except ValidationError:
+                if next_tier(tier) is None:
+                    # Nothing left to escalate to: keep what the top tier returned
+                    structured_payload = args
+        if structured_payload is not None or next_tier(tier) is None:
+            break
+        state["analysis"] = shown_before
+        tier_stats.record_escalation(tier)
+        logger.info("stack analysis: no valid tool call from the %s tier, escalating", tier)
+        tier = next_tier(tier)
+
+    if structured_payload is None and two_call:
+        # 10. Fall back to schema-coerced structured output if no tool call is returned
         try:
-            structured_model = model.with_structured_output(StructuredStackAnalysis)
+            structured_model = get_tier_model(tier, temperature=0.4).with_structured_output(StructuredStackAnalysis)
             structured_response = await structured_model.ainvoke(messages, config)
             if isinstance(structured_response, StructuredStackAnalysis):
                 structured_payload = structured_response.model_dump(exclude_none=True)
             elif isinstance(structured_response, dict):
                 structured_payload = structured_response
-            else:
-                try:
-                    structured_payload = structured_response.dict(exclude_none=True)  # type: ignore[attr-defined]
-                except Exception:
-                    structured_payload = None
         except Exception:
             structured_payload = None
 
-    # 12. Mark the analysis step complete and prepare a concise summary request
+    if structured_payload is None and local_analysis:
+        # The rule-based detection still gives a usable answer without the model
+        structured_payload = StructuredStackAnalysis(**local_analysis).model_dump(exclude_none=True)
+
+    # 11. Mark the analysis step complete and publish the validated payload
     state["tool_logs"][-1]["status"] = "completed"
-    await copilotkit_emit_state(config, state)
-    messages[-1].content = state["last_user_content"]
-    messages.append(AIMessage(tool_calls=tool_calls, id = tool_msg.id, type = "ai", content= ''))
-    messages.append(ToolMessage(content= "The GitHub Repository has been analyzed", tool_call_id = tool_calls[0]["id"], type = "tool"))
+    if structured_payload is not None:
+        shown = _load_analysis(state.get("analysis")) if PROGRESSIVE_STACK_ANALYSIS else {}
+        state["analysis"] = json.dumps(merge_sections(shown, structured_payload))
+        state["show_cards"] = True
+    await emitter.emit(state)
+
+    if structured_payload is None:
+        await emitter.flush()
+        return None
+
+    repo_name = f"{context['owner']}/{context['repo']}"
+    if not two_call:
+        # 12. Single call: use the summary written alongside the tool call, or render one locally
+        await emitter.flush()
+        return {
+            "structured": structured_payload,
+            "summary": model_summary or render_local_summary(structured_payload, repo_name),
+        }
+
+    # 12. Two calls: ask the model for a user-facing summary referencing the tool call outcome
     messages[0].content = "Generate a summary of the GitHub Repository. It should be in a concise and strictly textual"
-    
-    # 13. Generate a user-facing summary referencing the tool call outcome
-    client = ChatGoogleGenerativeAI(
-        model="gemini-2.5-pro",
-        temperature=0.4,
-        max_retries=2,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-    )
+    messages[-1].content = state["last_user_content"]
+    if tool_call is not None:
+        messages.append(AIMessage(tool_calls=[tool_call], id=tool_msg.id, content=""))
+        messages.append(ToolMessage(content="The GitHub Repository has been analyzed", tool_call_id=tool_call["id"]))
+    else:
+        messages.append(HumanMessage(content=f"Analysis: {json.dumps(structured_payload)}"))
     state["tool_logs"].append({"id": str(uuid.uuid4()), "message": "Generating Summary", "status": "processing"})
-    await copilotkit_emit_state(config, state)
-    model_response = await client.ainvoke(messages, config)
+    await emitter.emit(state)
+    try:
+        summary_model = get_tier_model(route("stack.summary", estimate_message_tokens(messages)), temperature=0.4)
+        model_response = await summary_model.ainvoke(messages, config)
+        summary = model_response.content
+    except Exception:
+        logger.exception("stack analysis summary call failed")
+        summary = render_local_summary(structured_payload, repo_name)
     state["tool_logs"][-1]["status"] = "completed"
-    await copilotkit_emit_state(config, state)
-    print(model_response, "model_response")
-   
-    state["messages"].append(AIMessage(content= model_response.content))
+    await emitter.emit(state)
+    await emitter.flush()
+    return {"structured": structured_payload, "summary": summary}
+
+
+# Analyze a gathered context: rule-based only in fast mode, otherwise with the model,
+# shared through the analysis cache when the commit is known.
+# Returns (result or None, whether it came from the cache or an analysis already in flight).
+async def analyze_context(
+    state: Dict[str, Any], config: RunnableConfig, emitter: StateEmitter, context: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    # Detect what the manifests already tell us; in fast mode that is the whole answer
+    local_analysis = detect_stack(context) if STACK_DETECTOR_MODE != "off" else {}
+    head_sha = context.get("head_sha")
+    if STACK_DETECTOR_MODE == "fast":
+        payload = StructuredStackAnalysis(**local_analysis).model_dump(exclude_none=True)
+        summary = render_local_summary(payload, f"{context['owner']}/{context['repo']}")
+        return {"structured": payload, "summary": summary}, False
+    if head_sha:
+        # Reuse a previous analysis of the same commit, or share one that is in flight
+        key = (
+            context["owner"],
+            context["repo"],
+            head_sha,
+            f"{ANALYSIS_PROMPT_VERSION}:{STACK_DETECTOR_MODE}:{STACK_SUMMARY_MODE}",
+        )
+        # The shared run emits into a private state of its own and is detached from this
+        # request; every waiter mirrors its progress onto its own state and emitter
+        shared_state = {
+            "tool_logs": [dict(state["tool_logs"][-1])] if state.get("tool_logs") else [],
+            "analysis": "",
+            "last_user_content": state.get("last_user_content", ""),
+        }
+        earlier_logs = state.get("tool_logs", [])[:-1]
+        shown = _load_analysis(state.get("analysis"))
+
+        async def show_progress(update: Dict[str, Any]) -> None:
+            state["tool_logs"] = earlier_logs + [dict(log) for log in update["tool_logs"]]
+            if update.get("analysis"):
+                state["analysis"] = json.dumps(merge_sections(shown, _load_analysis(update["analysis"])))
+                state["show_cards"] = True
+            await emitter.emit(state)
+
+        result, computed = await analysis_cache.get_or_compute(
+            key,
+            lambda publish: _run_llm_analysis(
+                shared_state, RunnableConfig(), ForwardingEmitter(publish), context, local_analysis
+            ),
+            show_progress,
+        )
+        return result, not computed
+    return await _run_llm_analysis(state, config, emitter, context, local_analysis), False
+
+
+async def analyze_with_gemini_node(state: StackAgentState, config: RunnableConfig):
+    # 6. Short-circuit when no context exists: no URL was given, or the gathered context
+    # expired (or was evicted) before this node ran
+    handle = state.get("context_handle")
+    context = context_store.get(handle)
+    # The context is only needed for this analysis
+    context_store.discard(handle)
+    if not context:
+        message = (
+            "The repository details gathered for this analysis expired before it could run. "
+            "Please send the GitHub URL again to re-run the analysis."
+            if handle
+            else "Please provide a valid GitHub URL"
+        )
+        state["messages"].append(AIMessage(content=message))
+        return Command(
+            goto= "end",
+            update = {
+                "messages": state["messages"],
+                "show_cards": state["show_cards"],
+                "analysis": state["analysis"]
+            }
+        )
+
+    # A context gathered while rate limited is incomplete; say so rather than analyze it
+    if context.get("rate_limited_until"):
+        reset_in = max(context["rate_limited_until"] - time.time(), 0)
+        state["messages"].append(AIMessage(content=(
+            f"GitHub's API rate limit was reached while reading {context['owner']}/{context['repo']}, "
+            f"so the repository could not be fully read. Please try again in about {reset_in / 60:.0f} minutes, "
+            "or configure GITHUB_TOKEN / GITHUB_TOKENS on the agent for a higher limit."
+        )))
+        return Command(
+            goto= "end",
+            update = {
+                "messages": state["messages"],
+                "show_cards": False,
+                "analysis": state["analysis"],
+                "context_handle": "",
+            }
+        )
+
+    # 7. Begin analysis and emit progress
+    emitter = StateEmitter(config, keys=UI_STATE_KEYS)
+    state["tool_logs"] = state.get("tool_logs", [])
+    state["tool_logs"].append(
+        {"id": str(uuid.uuid4()), "message": "Analyzing stack", "status": "processing"}
+    )
+    await emitter.emit(state)
+
+    result, _ = await analyze_context(state, config, emitter, context)
+
+    if result is None:
+        summary = "I couldn't analyze this repository. Please try again."
+    else:
+        summary = result["summary"]
+        structured = result["structured"]
+        if PROGRESSIVE_STACK_ANALYSIS:
+            structured = merge_sections(_load_analysis(state.get("analysis")), structured)
+        state["analysis"] = json.dumps(structured)
+        state["show_cards"] = True
+    # A cached or shared analysis streamed nothing through this request's emitter
+    for log in state["tool_logs"]:
+        log["status"] = "completed"
+    await emitter.emit(state)
+    await emitter.flush()
+
+    state["messages"].append(AIMessage(content= summary))
     # 14. Return a message containing the analysis
     return Command(
         goto= "end",
         update = {
             "messages": state["messages"],
-            "show_cards": True,
-            "analysis": state["analysis"]
+            "show_cards": state["show_cards"],
+            "analysis": state["analysis"],
+            "context_handle": "",
         }
     )
 
@@ -479,7 +973,7 @@ async def end_node(state: StackAgentState, config: RunnableConfig):
     # 15. Finalize the workflow and emit one last state update
     # Clear logs and emit once more to update UI
     state["tool_logs"] = []
-    await copilotkit_emit_state(config or RunnableConfig(recursion_limit=25), state)
+    await emit_state(config or RunnableConfig(recursion_limit=25), state, UI_STATE_KEYS)
     return Command(
         goto= END,
         update = {
@@ -491,13 +985,14 @@ async def end_node(state: StackAgentState, config: RunnableConfig):
 
 
 workflow = StateGraph(StackAgentState)
-workflow.add_node("gather_context", gather_context_node)
-workflow.add_node("analyze", analyze_with_gemini_node)
-workflow.add_node("end", end_node)
+workflow.add_node("gather_context", instrument_node("stack", "gather_context", gather_context_node))
+workflow.add_node("analyze", instrument_node("stack", "analyze", analyze_with_gemini_node))
+workflow.add_node("end", instrument_node("stack", "end", end_node))
 workflow.add_edge(START, "gather_context")
 workflow.add_edge("gather_context", "analyze")
 workflow.add_edge("analyze", END)
 workflow.set_entry_point("gather_context")
 workflow.set_finish_point("end")
 
-stack_analysis_graph = workflow.compile(checkpointer=MemorySaver())
+stack_analysis_graph = workflow.compile(checkpointer=make_checkpointer())
+
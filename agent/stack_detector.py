@@ -0,0 +1,349 @@
+"""
+Rule-based stack detection from manifests, lockfiles and root files.
+
+Signals (dependency names, file names, language byte counts) are looked up in an
+index built once from RULES, so detection costs one dict lookup per signal.
+The result uses the StructuredStackAnalysis field layout, leaving judgment
+fields such as purpose and risks to the model.
+"""
+
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from prompt_budget import summarize_manifest
+
+# "off": model only; "assist": detect locally, ask the model for the rest; "fast": no model call
+STACK_DETECTOR_MODE = os.getenv("STACK_DETECTOR_MODE", "assist").lower()
+
+# Fields the model still fills in assist mode
+JUDGMENT_FIELDS = ["purpose", "key_root_files", "how_to_run", "risks_notes", "database.notes", "backend.architecture"]
+
+# (signal kind, trigger, section, field, value, priority). Higher priority wins for scalar fields;
+# list fields ("key_libraries", "dependencies") collect every match.
+RULES: List[Tuple[str, str, str, str, str, int]] = [
+    # Frontend frameworks
+    ("dep", "next", "frontend", "framework", "Next.js", 90),
+    ("dep", "nuxt", "frontend", "framework", "Nuxt", 90),
+    ("dep", "@sveltejs/kit", "frontend", "framework", "SvelteKit", 90),
+    ("dep", "@remix-run/react", "frontend", "framework", "Remix", 90),
+    ("dep", "astro", "frontend", "framework", "Astro", 90),
+    ("dep", "gatsby", "frontend", "framework", "Gatsby", 90),
+    ("dep", "@angular/core", "frontend", "framework", "Angular", 80),
+    ("dep", "vue", "frontend", "framework", "Vue", 60),
+    ("dep", "svelte", "frontend", "framework", "Svelte", 60),
+    ("dep", "solid-js", "frontend", "framework", "SolidJS", 60),
+    ("dep", "react", "frontend", "framework", "React", 50),
+    ("file", "angular.json", "frontend", "framework", "Angular", 85),
+    ("file", "next.config.js", "frontend", "framework", "Next.js", 85),
+    ("file", "next.config.mjs", "frontend", "framework", "Next.js", 85),
+    ("file", "nuxt.config.js", "frontend", "framework", "Nuxt", 85),
+    ("file", "nuxt.config.ts", "frontend", "framework", "Nuxt", 85),
+    # Frontend language
+    ("dep", "typescript", "frontend", "language", "TypeScript", 80),
+    ("file", "tsconfig.json", "frontend", "language", "TypeScript", 80),
+    ("file", "package.json", "frontend", "language", "JavaScript", 10),
+    # Package managers
+    ("file", "pnpm-lock.yaml", "frontend", "package_manager", "pnpm", 90),
+    ("file", "yarn.lock", "frontend", "package_manager", "yarn", 90),
+    ("file", "bun.lockb", "frontend", "package_manager", "bun", 90),
+    ("file", "bun.lock", "frontend", "package_manager", "bun", 90),
+    ("file", "package-lock.json", "frontend", "package_manager", "npm", 90),
+    ("file", "package.json", "frontend", "package_manager", "npm", 10),
+    # Styling
+    ("dep", "tailwindcss", "frontend", "styling", "Tailwind CSS", 80),
+    ("dep", "styled-components", "frontend", "styling", "styled-components", 70),
+    ("dep", "@emotion/react", "frontend", "styling", "Emotion", 70),
+    ("dep", "@mui/material", "frontend", "styling", "Material UI", 60),
+    ("dep", "@chakra-ui/react", "frontend", "styling", "Chakra UI", 60),
+    ("dep", "bootstrap", "frontend", "styling", "Bootstrap", 50),
+    ("dep", "sass", "frontend", "styling", "Sass", 40),
+    # Frontend libraries
+    ("dep", "@copilotkit/*", "frontend", "key_libraries", "CopilotKit", 0),
+    ("dep", "@radix-ui/*", "frontend", "key_libraries", "Radix UI", 0),
+    ("dep", "@tanstack/*", "frontend", "key_libraries", "TanStack", 0),
+    ("dep", "redux", "frontend", "key_libraries", "Redux", 0),
+    ("dep", "@reduxjs/toolkit", "frontend", "key_libraries", "Redux Toolkit", 0),
+    ("dep", "zustand", "frontend", "key_libraries", "Zustand", 0),
+    ("dep", "react-hook-form", "frontend", "key_libraries", "React Hook Form", 0),
+    ("dep", "zod", "frontend", "key_libraries", "Zod", 0),
+    ("dep", "ai", "frontend", "key_libraries", "Vercel AI SDK", 0),
+    ("dep", "three", "frontend", "key_libraries", "three.js", 0),
+    ("dep", "vite", "frontend", "key_libraries", "Vite", 0),
+    # Backend frameworks
+    ("dep", "fastapi", "backend", "framework", "FastAPI", 90),
+    ("dep", "django", "backend", "framework", "Django", 90),
+    ("dep", "flask", "backend", "framework", "Flask", 80),
+    ("dep", "starlette", "backend", "framework", "Starlette", 40),
+    ("dep", "express", "backend", "framework", "Express", 80),
+    ("dep", "@nestjs/core", "backend", "framework", "NestJS", 90),
+    ("dep", "fastify", "backend", "framework", "Fastify", 80),
+    ("dep", "koa", "backend", "framework", "Koa", 70),
+    ("dep", "hono", "backend", "framework", "Hono", 70),
+    ("dep", "github.com/gin-gonic/gin", "backend", "framework", "Gin", 90),
+    ("dep", "github.com/labstack/echo/v4", "backend", "framework", "Echo", 90),
+    ("dep", "github.com/gofiber/fiber/v2", "backend", "framework", "Fiber", 90),
+    ("dep", "actix-web", "backend", "framework", "Actix Web", 90),
+    ("dep", "axum", "backend", "framework", "Axum", 90),
+    ("dep", "rails", "backend", "framework", "Ruby on Rails", 90),
+    ("dep", "sinatra", "backend", "framework", "Sinatra", 70),
+    ("dep", "laravel/framework", "backend", "framework", "Laravel", 90),
+    ("dep", "symfony/framework-bundle", "backend", "framework", "Symfony", 90),
+    ("file", "pom.xml", "backend", "framework", "Java (Maven)", 10),
+    # Backend language
+    ("file", "pyproject.toml", "backend", "language", "Python", 50),
+    ("file", "requirements.txt", "backend", "language", "Python", 50),
+    ("file", "Pipfile", "backend", "language", "Python", 50),
+    ("file", "setup.py", "backend", "language", "Python", 40),
+    ("file", "go.mod", "backend", "language", "Go", 50),
+    ("file", "Cargo.toml", "backend", "language", "Rust", 50),
+    ("file", "Gemfile", "backend", "language", "Ruby", 50),
+    ("file", "composer.json", "backend", "language", "PHP", 50),
+    ("file", "pom.xml", "backend", "language", "Java", 50),
+    ("file", "build.gradle", "backend", "language", "Java/Kotlin", 50),
+    ("file", "build.gradle.kts", "backend", "language", "Kotlin", 50),
+    ("dep", "express", "backend", "language", "JavaScript/TypeScript", 20),
+    ("dep", "@nestjs/core", "backend", "language", "TypeScript", 30),
+    # Backend dependency managers
+    ("file", "poetry.lock", "backend", "dependency_manager", "Poetry", 90),
+    ("pyproject", "poetry", "backend", "dependency_manager", "Poetry", 80),
+    ("file", "uv.lock", "backend", "dependency_manager", "uv", 90),
+    ("file", "Pipfile", "backend", "dependency_manager", "Pipenv", 70),
+    ("file", "requirements.txt", "backend", "dependency_manager", "pip", 50),
+    ("file", "pyproject.toml", "backend", "dependency_manager", "pip (pyproject)", 20),
+    ("file", "go.mod", "backend", "dependency_manager", "Go modules", 80),
+    ("file", "Cargo.toml", "backend", "dependency_manager", "Cargo", 80),
+    ("file", "Gemfile", "backend", "dependency_manager", "Bundler", 80),
+    ("file", "composer.json", "backend", "dependency_manager", "Composer", 80),
+    ("file", "pom.xml", "backend", "dependency_manager", "Maven", 80),
+    ("file", "build.gradle", "backend", "dependency_manager", "Gradle", 80),
+    ("file", "build.gradle.kts", "backend", "dependency_manager", "Gradle", 80),
+    # Backend libraries
+    ("dep", "langgraph", "backend", "key_libraries", "LangGraph", 0),
+    ("dep", "langchain", "backend", "key_libraries", "LangChain", 0),
+    ("dep", "langchain-core", "backend", "key_libraries", "LangChain", 0),
+    ("dep", "copilotkit", "backend", "key_libraries", "CopilotKit", 0),
+    ("dep", "google-genai", "backend", "key_libraries", "Google GenAI SDK", 0),
+    ("dep", "openai", "backend", "key_libraries", "OpenAI SDK", 0),
+    ("dep", "anthropic", "backend", "key_libraries", "Anthropic SDK", 0),
+    ("dep", "pydantic", "backend", "key_libraries", "Pydantic", 0),
+    ("dep", "sqlalchemy", "backend", "key_libraries", "SQLAlchemy", 0),
+    ("dep", "celery", "backend", "key_libraries", "Celery", 0),
+    ("dep", "uvicorn", "backend", "key_libraries", "Uvicorn", 0),
+    ("dep", "gunicorn", "backend", "key_libraries", "Gunicorn", 0),
+    ("dep", "prisma", "backend", "key_libraries", "Prisma", 0),
+    ("dep", "@prisma/client", "backend", "key_libraries", "Prisma", 0),
+    ("dep", "drizzle-orm", "backend", "key_libraries", "Drizzle ORM", 0),
+    ("dep", "typeorm", "backend", "key_libraries", "TypeORM", 0),
+    ("dep", "mongoose", "backend", "key_libraries", "Mongoose", 0),
+    ("dep", "@copilotkit/runtime", "backend", "key_libraries", "CopilotKit Runtime", 0),
+    # Databases
+    ("dep", "psycopg2", "database", "type", "PostgreSQL", 80),
+    ("dep", "psycopg2-binary", "database", "type", "PostgreSQL", 80),
+    ("dep", "psycopg", "database", "type", "PostgreSQL", 80),
+    ("dep", "asyncpg", "database", "type", "PostgreSQL", 80),
+    ("dep", "pg", "database", "type", "PostgreSQL", 80),
+    ("dep", "@supabase/supabase-js", "database", "type", "PostgreSQL (Supabase)", 85),
+    ("dep", "mysqlclient", "database", "type", "MySQL", 80),
+    ("dep", "pymysql", "database", "type", "MySQL", 80),
+    ("dep", "mysql2", "database", "type", "MySQL", 80),
+    ("dep", "pymongo", "database", "type", "MongoDB", 80),
+    ("dep", "motor", "database", "type", "MongoDB", 80),
+    ("dep", "mongodb", "database", "type", "MongoDB", 80),
+    ("dep", "mongoose", "database", "type", "MongoDB", 80),
+    ("dep", "firebase", "database", "type", "Firebase", 60),
+    ("dep", "firebase-admin", "database", "type", "Firebase", 60),
+    ("dep", "redis", "database", "type", "Redis", 40),
+    ("dep", "ioredis", "database", "type", "Redis", 40),
+    ("dep", "better-sqlite3", "database", "type", "SQLite", 50),
+    ("dep", "aiosqlite", "database", "type", "SQLite", 30),
+    ("dep", "langgraph-checkpoint-sqlite", "database", "type", "SQLite", 20),
+    # Infrastructure
+    ("file", "vercel.json", "infrastructure", "hosting_frontend", "Vercel", 90),
+    ("file", "netlify.toml", "infrastructure", "hosting_frontend", "Netlify", 90),
+    ("file", "Procfile", "infrastructure", "hosting_backend", "Heroku-style Procfile platform", 60),
+    ("file", "serverless.yml", "infrastructure", "hosting_backend", "AWS Lambda (Serverless Framework)", 80),
+    ("file", "fly.toml", "infrastructure", "hosting_backend", "Fly.io", 90),
+    ("file", "render.yaml", "infrastructure", "hosting_backend", "Render", 90),
+    ("file", "app.yaml", "infrastructure", "hosting_backend", "Google App Engine", 70),
+    ("file", "railway.json", "infrastructure", "hosting_backend", "Railway", 90),
+    ("file", "Dockerfile", "infrastructure", "hosting_backend", "Docker container", 30),
+    ("file", "Dockerfile", "infrastructure", "dependencies", "Docker", 0),
+    ("file", "docker-compose.yml", "infrastructure", "dependencies", "Docker Compose", 0),
+    ("file", "docker-compose.yaml", "infrastructure", "dependencies", "Docker Compose", 0),
+    ("file", "serverless.yml", "infrastructure", "dependencies", "Serverless Framework", 0),
+    # CI/CD
+    ("file", ".github/workflows", "ci_cd", "setup", "GitHub Actions", 90),
+    ("file", ".gitlab-ci.yml", "ci_cd", "setup", "GitLab CI", 90),
+    ("file", ".circleci", "ci_cd", "setup", "CircleCI", 90),
+    ("file", "Jenkinsfile", "ci_cd", "setup", "Jenkins", 90),
+    ("file", ".travis.yml", "ci_cd", "setup", "Travis CI", 80),
+]
+
+LIST_FIELDS = {"key_libraries", "dependencies"}
+
+# Manifest summary keys that hold dependency names
+_DEPENDENCY_KEYS = {
+    "dependencies",
+    "devDependencies",
+    "peerDependencies",
+    "poetry.dependencies",
+    "require",
+    "require-dev",
+    "dev-dependencies",
+    "packages",
+    "dev-packages",
+}
+
+
+def _build_index(rules: Iterable[Tuple[str, str, str, str, str, int]]) -> Dict[Tuple[str, str], List[Tuple[str, str, str, int]]]:
+    index: Dict[Tuple[str, str], List[Tuple[str, str, str, int]]] = defaultdict(list)
+    for kind, trigger, section, field, value, priority in rules:
+        key = _normalize_dependency(trigger) if kind == "dep" else trigger.lower()
+        index[(kind, key)].append((section, field, value, priority))
+    return index
+
+
+# Lowercase, drop extras and treat runs of "-", "_" and "." alike (PEP 503), so
+# python_dotenv and Flask_SQLAlchemy match python-dotenv and flask-sqlalchemy
+def _normalize_dependency(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name.split("[", 1)[0].strip().lower())
+
+
+RULE_INDEX = _build_index(RULES)
+
+
+# Collect (kind, trigger) signals from the gathered repository context
+def collect_signals(context: Dict[str, Any]) -> Set[Tuple[str, str]]:
+    signals: Set[Tuple[str, str]] = set()
+    for entry in context.get("root_files", []):
+        signals.add(("file", entry.rsplit(" (", 1)[0].lower()))
+    for path, text in context.get("manifests", {}).items():
+        signals.add(("file", path.rsplit("/", 1)[-1].lower()))
+        summary = summarize_manifest(path, text)
+        if not isinstance(summary, dict):
+            continue
+        if "poetry.dependencies" in summary or "poetry.core.masonry.api" == summary.get("build-backend"):
+            signals.add(("pyproject", "poetry"))
+        for key, values in summary.items():
+            if key in _DEPENDENCY_KEYS or key.startswith("optional:"):
+                for dep in values:
+                    name = _normalize_dependency(dep)
+                    signals.add(("dep", name))
+                    if name.startswith("@") and "/" in name:
+                        signals.add(("dep", name.split("/", 1)[0] + "/*"))
+    return signals
+
+
+# Fill StructuredStackAnalysis sections from the rule table
+def detect_stack(context: Dict[str, Any]) -> Dict[str, Any]:
+    best: Dict[Tuple[str, str], Tuple[int, str]] = {}
+    lists: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+    for signal in sorted(collect_signals(context)):
+        for section, field, value, priority in RULE_INDEX.get(signal, ()):
+            if field in LIST_FIELDS:
+                if value not in lists[(section, field)]:
+                    lists[(section, field)].append(value)
+            elif (section, field) not in best or priority > best[(section, field)][0]:
+                best[(section, field)] = (priority, value)
+
+    analysis: Dict[str, Any] = {}
+    for (section, field), (_, value) in best.items():
+        analysis.setdefault(section, {})[field] = value
+    for (section, field), values in lists.items():
+        analysis.setdefault(section, {})[field] = values
+
+    # A package.json without any framework or backend dependency does not imply a frontend
+    frontend = analysis.get("frontend", {})
+    if frontend and "framework" not in frontend and "styling" not in frontend:
+        analysis.pop("frontend")
+    languages = context.get("languages", {})
+    if "frontend" in analysis and languages.get("TypeScript", 0) > languages.get("JavaScript", 0):
+        analysis["frontend"]["language"] = "TypeScript"
+    return analysis
+
+
+# Overlay `primary` onto `fallback` section by section; fields set in `primary` win
+def merge_analysis(primary: Dict[str, Any], fallback: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(fallback)
+    for key, value in primary.items():
+        if value in (None, "", [], {}):
+            continue
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = {**merged[key], **{k: v for k, v in value.items() if v not in (None, "", [])}}
+        else:
+            merged[key] = value
+    return merged
+
+
+# Merge a later (possibly partial) analysis into an earlier one without losing fields:
+# empty values never overwrite, sections merge per field, and a list is only replaced
+# by one that is at least as long
+def merge_sections(base: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in update.items():
+        if value in (None, "", [], {}):
+            continue
+        current = merged.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            merged[key] = merge_sections(current, value)
+        elif isinstance(value, list) and isinstance(current, list) and len(value) < len(current):
+            continue
+        else:
+            merged[key] = value
+    return merged
+
+
+# Languages that, when dominant, indicate the backend language
+BACKEND_LANGUAGES = {"Python", "Go", "Java", "Kotlin", "Ruby", "PHP", "C#", "Rust", "Scala", "Elixir"}
+
+
+# First-pass analysis from repository metadata, language bytes and the rule table,
+# shown before the model has produced anything
+def preliminary_analysis(context: Dict[str, Any]) -> Dict[str, Any]:
+    analysis: Dict[str, Any] = {}
+    description = (context.get("repo_info") or {}).get("description")
+    if description:
+        analysis["purpose"] = description
+    languages = context.get("languages", {})
+    backend_languages = [name for name in sorted(languages, key=languages.get, reverse=True) if name in BACKEND_LANGUAGES]
+    if backend_languages:
+        analysis["backend"] = {"language": backend_languages[0]}
+    if STACK_DETECTOR_MODE != "off":
+        analysis = merge_analysis(detect_stack(context), analysis)
+    return analysis
+
+
+# Render a short plain-text summary from an analysis payload without calling a model
+def render_local_summary(analysis: Dict[str, Any], repo_name: str = "") -> str:
+    lines = []
+    if repo_name:
+        lines.append(f"Stack overview for {repo_name}.")
+    if analysis.get("purpose"):
+        lines.append(analysis["purpose"])
+
+    def describe(section: str, fields: List[str]) -> str:
+        values = analysis.get(section) or {}
+        parts = [str(values[f]) for f in fields if values.get(f)]
+        return ", ".join(parts)
+
+    frontend = describe("frontend", ["framework", "language", "styling", "package_manager"])
+    if frontend:
+        lines.append(f"Frontend: {frontend}.")
+    backend = describe("backend", ["framework", "language", "dependency_manager"])
+    if backend:
+        lines.append(f"Backend: {backend}.")
+    libraries = (analysis.get("frontend") or {}).get("key_libraries", []) + (analysis.get("backend") or {}).get("key_libraries", [])
+    if libraries:
+        lines.append(f"Key libraries: {', '.join(dict.fromkeys(libraries))}.")
+    database = describe("database", ["type"])
+    if database:
+        lines.append(f"Database: {database}.")
+    infrastructure = describe("infrastructure", ["hosting_frontend", "hosting_backend"])
+    if infrastructure:
+        lines.append(f"Hosting: {infrastructure}.")
+    ci_cd = describe("ci_cd", ["setup"])
+    if ci_cd:
+        lines.append(f"CI/CD: {ci_cd}.")
+    return " ".join(lines) if lines else "No stack details could be detected."
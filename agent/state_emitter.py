@@ -0,0 +1,114 @@
+"""
+Rate-limited wrapper around copilotkit_emit_state shared by both agents.
+
+Back-to-back emits within EMIT_MIN_INTERVAL_SECONDS are coalesced: only the
+latest state is sent, either once the interval has passed or on flush().
+
+An emitter created with `keys` sends only those state fields, so server-side
+fields never reach the browser. Every emit is counted in metrics; the serialized
+size and serialization time are measured on one emit in EMIT_SIZE_SAMPLE_EVERY,
+or on all of them with METRICS_TRACE=true.
+
+quiet_config keeps a model call's messages (and by default its tool calls) out
+of the CopilotKit stream.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from langchain_core.load import dumps
+from langchain_core.runnables import RunnableConfig
+from copilotkit.langgraph import copilotkit_customize_config, copilotkit_emit_state
+
+import metrics
+
+EMIT_MIN_INTERVAL_SECONDS = float(os.getenv("EMIT_MIN_INTERVAL_SECONDS", "0.1"))
+# Serializing a state just to measure it costs as much as the emit itself
+EMIT_SIZE_SAMPLE_EVERY = max(1, int(os.getenv("EMIT_SIZE_SAMPLE_EVERY", "20")))
+
+_emit_count = itertools.count()
+
+
+class StateEmitter:
+    def __init__(
+        self,
+        config: RunnableConfig,
+        min_interval: float = EMIT_MIN_INTERVAL_SECONDS,
+        keys: Optional[Sequence[str]] = None,
+    ):
+        self.config = config
+        self.min_interval = min_interval
+        self.keys = keys
+        self._last_sent = 0.0
+        self._pending: Optional[Any] = None
+        self._timer: Optional[asyncio.Task] = None
+
+    # Queue the state for emission; sends immediately unless an emit just happened
+    async def emit(self, state: Any) -> None:
+        self._pending = state
+        wait = self._last_sent + self.min_interval - time.monotonic()
+        if wait <= 0:
+            await self._send()
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._send_later(wait))
+
+    # Send any pending state now; call before a node returns
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending is not None:
+            await self._send()
+
+    async def _send_later(self, wait: float) -> None:
+        await asyncio.sleep(wait)
+        self._timer = None
+        if self._pending is not None:
+            await self._send()
+
+    async def _send(self) -> None:
+        state, self._pending = self._pending, None
+        self._last_sent = time.monotonic()
+        await emit_state(self.config, state, self.keys)
+
+
+# Discards every emit; for runs outside a CopilotKit request (batch jobs, benchmarks)
+class NullEmitter(StateEmitter):
+    async def _send(self) -> None:
+        self._pending = None
+
+
+# Hands every emitted state straight to `publish` instead of CopilotKit; for work
+# shared by several requests, each of which emits through its own emitter
+class ForwardingEmitter(StateEmitter):
+    def __init__(self, publish: Callable[[Any], Awaitable[None]]):
+        super().__init__(RunnableConfig(), min_interval=0)
+        self.publish = publish
+
+    async def _send(self) -> None:
+        state, self._pending = self._pending, None
+        await self.publish(state)
+
+
+# Emit `state` (restricted to `keys` when given) and record it, with its serialized size when sampled
+async def emit_state(config: RunnableConfig, state: Any, keys: Optional[Sequence[str]] = None) -> None:
+    if keys is not None:
+        state = {key: state[key] for key in keys if key in state}
+    if metrics.METRICS_TRACE or next(_emit_count) % EMIT_SIZE_SAMPLE_EVERY == 0:
+        # Measure what CopilotKit will send: it drops messages and serializes the rest
+        started = time.perf_counter()
+        nbytes = len(dumps({k: v for k, v in state.items() if k != "messages"}))
+        metrics.record_state_emit(nbytes, time.perf_counter() - started)
+    else:
+        metrics.record_state_emit()
+    await copilotkit_emit_state(config, state)
+
+
+# A copy of `config` under which CopilotKit streams no messages, and tool calls only when asked.
+# copilotkit_customize_config updates the metadata dict in place, so it gets a copy.
+def quiet_config(config: RunnableConfig, emit_tool_calls: bool = False) -> RunnableConfig:
+    base = {**config, "metadata": dict(config.get("metadata") or {})}
+    return copilotkit_customize_config(base, emit_messages=False, emit_tool_calls=emit_tool_calls)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the agent modules the way main.py does, from agent/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The model clients are built lazily; a placeholder key lets the agent modules import offline
+os.environ.setdefault("GOOGLE_API_KEY", "offline-tests")
@@ -0,0 +1,103 @@
+import gc
+import operator
+import tracemalloc
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from checkpointer import BoundedMemorySaver, BoundedSqliteSaver
+
+MAX_THREADS = 20
+HISTORY = 2
+TURNS = 3
+
+
+class SoakState(TypedDict):
+    items: Annotated[List[str], operator.add]
+    context: str
+
+
+def _graph(checkpointer):
+    def step(state: SoakState):
+        # A large per-turn payload, like a gathered README, plus a growing history
+        return {"items": ["reply " * 50], "context": "x" * 20_000}
+
+    graph = StateGraph(SoakState)
+    graph.add_node("step", step)
+    graph.add_edge(START, "step")
+    graph.add_edge("step", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _soak(graph, threads: range) -> None:
+    for thread in threads:
+        config = {"configurable": {"thread_id": f"thread-{thread}"}}
+        for _ in range(TURNS):
+            graph.invoke({"items": ["hello"]}, config)
+
+
+def test_memory_saver_keeps_entry_caps():
+    saver = BoundedMemorySaver(ttl=3600, max_threads=MAX_THREADS, history=HISTORY)
+    graph = _graph(saver)
+
+    _soak(graph, range(200))
+
+    assert len(saver.storage) <= MAX_THREADS
+    for namespaces in saver.storage.values():
+        for checkpoints in namespaces.values():
+            assert len(checkpoints) <= HISTORY
+    threads_with_blobs = {key[0] for key in saver.blobs}
+    assert threads_with_blobs <= set(saver.storage)
+    # Per namespace, only the channel versions the kept checkpoints reference stay
+    assert len(saver.blobs) <= MAX_THREADS * HISTORY * len(SoakState.__annotations__) * 2
+    assert {key[0] for key in saver.writes} <= set(saver.storage)
+
+
+def test_memory_saver_memory_stays_flat():
+    saver = BoundedMemorySaver(ttl=3600, max_threads=MAX_THREADS, history=HISTORY)
+    graph = _graph(saver)
+    # Warm up past the thread cap, then compare two equally long stretches
+    _soak(graph, range(MAX_THREADS * 2))
+    tracemalloc.start()
+    try:
+        gc.collect()
+        baseline = tracemalloc.get_traced_memory()[0]
+        _soak(graph, range(1000, 1000 + MAX_THREADS * 5))
+        gc.collect()
+        after_first = tracemalloc.get_traced_memory()[0]
+        _soak(graph, range(2000, 2000 + MAX_THREADS * 5))
+        gc.collect()
+        after_second = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # 100 more threads of ~60 KB each would add ~6 MB if nothing were evicted
+    assert after_second - after_first < 1_000_000
+    assert after_second - baseline < 2_000_000
+
+
+@pytest.fixture
+def sqlite_saver(tmp_path):
+    saver = BoundedSqliteSaver(str(tmp_path / "checkpoints.sqlite"), ttl=3600, max_threads=MAX_THREADS, history=HISTORY)
+    yield saver
+    saver.conn.close()
+
+
+def test_sqlite_saver_keeps_entry_caps(sqlite_saver):
+    graph = _graph(sqlite_saver)
+
+    _soak(graph, range(100))
+
+    conn = sqlite_saver.conn
+    threads = {row[0] for row in conn.execute("SELECT DISTINCT thread_id FROM checkpoints")}
+    assert len(threads) <= MAX_THREADS
+    assert conn.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0] <= MAX_THREADS
+    per_thread = conn.execute(
+        "SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM checkpoints GROUP BY thread_id, checkpoint_ns)"
+    ).fetchone()[0]
+    assert per_thread <= HISTORY
+    assert {row[0] for row in conn.execute("SELECT DISTINCT thread_id FROM writes")} <= threads
+    # The most recent threads survive and still resume with their history
+    state = graph.get_state({"configurable": {"thread_id": "thread-99"}})
+    assert len(state.values["items"]) == 2 * TURNS
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import github_client
+from github_cache import CacheEntry, DiskBackend, MemoryBackend, ResponseCache
+
+DELAY = 0.05
+
+
+# Stub GitHub answering every request after DELAY seconds, recording peak concurrency
+class StubGitHub:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.requests += 1
+        try:
+            await asyncio.sleep(DELAY)
+        finally:
+            self.active -= 1
+        return httpx.Response(200, text=request.url.path, headers={"X-RateLimit-Remaining": "4999"})
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    github = StubGitHub()
+    monkeypatch.setattr(github_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(github.handle)))
+    monkeypatch.setattr(github_client, "token_pool", github_client.TokenPool([]))
+    return github
+
+
+def _use_limit(monkeypatch, limit: int) -> None:
+    monkeypatch.setattr(github_client, "_limiter", github_client.FairLimiter(limit))
+
+
+async def _sequential(urls):
+    return [await github_client.fetch(url, {}) for url in urls]
+
+
+async def _parallel(urls):
+    return await asyncio.gather(*(github_client.fetch(url, {}) for url in urls))
+
+
+def _timed(coroutine):
+    started = time.perf_counter()
+    result = asyncio.run(coroutine)
+    return result, time.perf_counter() - started
+
+
+def test_parallel_fetch_beats_sequential(stub, monkeypatch):
+    _use_limit(monkeypatch, 8)
+    urls = [f"https://api.github.test/repos/acme/app/{i}" for i in range(8)]
+
+    sequential, sequential_seconds = _timed(_sequential(urls))
+    parallel, parallel_seconds = _timed(_parallel(urls))
+
+    assert [r.text for r in parallel] == [r.text for r in sequential]
+    assert sequential_seconds >= 8 * DELAY
+    assert parallel_seconds < sequential_seconds / 3
+
+
+def test_concurrency_cap_is_honored(stub, monkeypatch):
+    _use_limit(monkeypatch, 3)
+    urls = [f"https://api.github.test/repos/acme/app/{i}" for i in range(9)]
+
+    responses, seconds = _timed(_parallel(urls))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert stub.peak == 3
+    # Nine requests three at a time take three rounds
+    assert seconds >= 3 * DELAY
+    assert github_client.stats()["in_flight"] == 0
+
+
+def test_tree_manifests_are_fetched_in_parallel(stub, monkeypatch):
+    import stack_agent
+
+    _use_limit(monkeypatch, 4)
+    monkeypatch.setattr(stack_agent, "response_cache", ResponseCache(MemoryBackend(64), ttl=300))
+    entries = [{"path": f"services/s{i}/package.json"} for i in range(8)]
+
+    manifests, seconds = _timed(stack_agent._fetch_tree_manifests("acme", "app", "HEAD", entries))
+
+    assert sorted(manifests) == sorted(entry["path"] for entry in entries)
+    assert stub.peak == 4
+    # Two rounds of four, well under the eight rounds of fetching one by one
+    assert seconds < 8 * DELAY / 2
+
+
+def test_disk_backend_prunes_in_batches(tmp_path, monkeypatch):
+    backend = DiskBackend(str(tmp_path), max_entries=20)
+    listings = []
+    real_listdir = os.listdir
+    monkeypatch.setattr(os, "listdir", lambda path: listings.append(path) or real_listdir(path))
+
+    for i in range(100):
+        backend.set(f"https://api.github.com/repos/acme/app/{i}", CacheEntry(content=b"{}", headers={}))
+    # Overwrites do not count as new entries
+    backend.set("https://api.github.com/repos/acme/app/99", CacheEntry(content=b"{}", headers={}))
+
+    # One directory listing per batch of prune_margin + 1 new entries, not one per write
+    assert len(listings) <= 100 // (backend.prune_margin + 1)
+    assert 20 <= len(backend) <= 20 + backend.prune_margin
+    assert backend.get("https://api.github.com/repos/acme/app/99") is not None
+    assert backend.get("https://api.github.com/repos/acme/app/0") is None
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import history
+
+
+@pytest.fixture
+def summarized(monkeypatch):
+    batches = []
+
+    async def fake_summarize(previous, messages, config):
+        batches.append([m.id for m in messages])
+        return (previous + " " if previous else "") + " ".join(m.id for m in messages)
+
+    monkeypatch.setattr(history, "_summarize", fake_summarize)
+    monkeypatch.setattr(history, "HISTORY_KEEP_TURNS", 2)
+    monkeypatch.setattr(history, "HISTORY_SUMMARY_BATCH_TURNS", 2)
+    monkeypatch.setattr(history, "HISTORY_TOKEN_BUDGET", 100_000)
+    return batches
+
+
+def _thread(turns: int):
+    messages = []
+    for i in range(turns):
+        messages += [HumanMessage(content=f"question {i}", id=f"h{i}"), AIMessage(content=f"answer {i}", id=f"a{i}")]
+    return messages
+
+
+def _compact(messages, state):
+    return asyncio.run(history.compact_history(messages, state, None))
+
+
+def test_summary_boundary_follows_message_ids(summarized):
+    messages = _thread(6)
+    _, updates = _compact(messages, {})
+    assert summarized == [["h0", "a0", "h1", "a1", "h2", "a2", "h3", "a3"]]
+    assert updates["history_summarized_upto"] == "a3"
+
+    # Two more turns leave the window: exactly those are summarized next
+    summarized.clear()
+    _, updates = _compact(_thread(8), updates)
+    assert summarized == [["h4", "a4", "h5", "a5"]]
+    assert updates["history_summarized_upto"] == "a5"
+
+
+def test_boundary_inside_the_verbatim_window_summarizes_nothing(summarized, monkeypatch):
+    state = {"history_summary": "h0 a0 h1 a1 h2 a2 h3 a3", "history_summarized_upto": "a3"}
+    # A wider window pulls the summarized turns back in; nothing older is pending
+    monkeypatch.setattr(history, "HISTORY_KEEP_TURNS", 4)
+    compacted, updates = _compact(_thread(5), state)
+    assert summarized == [] and updates == {}
+    assert compacted[0].content.startswith("Summary of the earlier conversation")
+    assert [m.id for m in compacted[1:]] == ["h1", "a1", "h2", "a2", "h3", "a3", "h4", "a4"]
+
+
+def test_long_summary_keeps_its_start(monkeypatch):
+    class Reply:
+        content = "start " + "x" * 5000 + " end"
+
+    class Model:
+        async def ainvoke(self, prompt, config):
+            return Reply()
+
+    monkeypatch.setattr(history, "get_tier_model", lambda tier, **kwargs: Model())
+    summary = asyncio.run(history._summarize("", [HumanMessage(content="hi", id="h0")], None))
+    assert len(summary) == history.HISTORY_SUMMARY_MAX_CHARS
+    assert summary.startswith("start ")
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+import posts_generator_agent
+import state_emitter
+from bench.fake_gemini import FakeGenaiClient, FakeLatency
+
+LATENCY = FakeLatency(first_token_latency=0.2, chunk_latency=0.01, chunks=5)
+SESSIONS = 8
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    async def emit(config, state):
+        pass
+
+    monkeypatch.setattr(state_emitter, "copilotkit_emit_state", emit)
+    monkeypatch.setattr(posts_generator_agent, "SEARCH_CACHE_ENABLED", False)
+
+
+def _state(topic: str):
+    return {"messages": [HumanMessage(content=topic)], "tool_logs": [], "response": "", "post_drafts": {}}
+
+
+async def _chat(topic: str) -> float:
+    started = time.perf_counter()
+    command = await posts_generator_agent.chat_node(_state(topic), RunnableConfig())
+    assert command.update["response"]
+    return time.perf_counter() - started
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_concurrent_sessions_search_at_the_same_time(monkeypatch, streaming):
+    monkeypatch.setattr(posts_generator_agent, "STREAM_POST_GENERATION", streaming)
+    client = FakeGenaiClient(LATENCY)
+    monkeypatch.setattr(posts_generator_agent, "get_genai_client", lambda: client)
+    single_call = LATENCY.first_token_latency + LATENCY.chunk_latency * (LATENCY.chunks - 1)
+
+    async def run():
+        # A ticker on the same loop shows whether the model calls block it
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(_chat(f"post about topic {i}") for i in range(SESSIONS)))
+        wall = time.perf_counter() - started
+        ticker.cancel()
+        return latencies, wall, ticks
+
+    latencies, wall, ticks = asyncio.run(run())
+
+    # Sessions overlap instead of queueing behind each other: the batch takes about one call
+    assert wall < 2 * single_call
+    assert max(latencies) < 2 * single_call
+    assert wall < SESSIONS * single_call / 3
+    assert ticks >= wall / 0.01 / 2
+
+
+class HangingGenaiClient:
+    def __init__(self):
+        self.cancelled = False
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self._generate, generate_content_stream=self._stream)
+        )
+
+    async def _generate(self, model, contents, config=None):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    async def _stream(self, model, contents, config=None):
+        async def chunks():
+            yield await self._generate(model, contents, config)
+
+        return chunks()
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_disconnect_cancels_the_search_call(monkeypatch, streaming):
+    monkeypatch.setattr(posts_generator_agent, "STREAM_POST_GENERATION", streaming)
+    client = HangingGenaiClient()
+    monkeypatch.setattr(posts_generator_agent, "get_genai_client", lambda: client)
+
+    async def run():
+        task = asyncio.ensure_future(posts_generator_agent.chat_node(_state("post about agents"), RunnableConfig()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert client.cancelled
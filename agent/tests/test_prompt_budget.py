@@ -0,0 +1,15 @@
+from prompt_budget import build_prompt_sections
+
+
+def test_manifests_past_the_budget_are_named_not_placeholdered():
+    manifests = {f"svc{i}/Dockerfile": "FROM python:3.11\n" * 200 for i in range(12)}
+    manifests["package.json"] = '{"dependencies": {"next": "14.0.0"}}'
+    context = {"repo_info": {}, "languages": {}, "root_files": [], "readme": "", "manifests": manifests}
+
+    sections, report = build_prompt_sections(context, budget_tokens=1000)
+
+    body, _, note = sections["manifests"].rpartition("\n")
+    assert body.count("…") == 1  # only the one raw manifest that was truncated to fit
+    assert note.startswith("(11 manifests omitted to fit the budget: svc1/Dockerfile")
+    assert note.endswith("and 1 more)")
+    assert report.estimated_tokens <= 1000
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.load import dumps
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+import stack_agent
+import state_emitter
+from context_store import context_store
+
+README = "# acme/app\n" + "Lorem ipsum dolor sit amet. " * 40000
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    states = []
+
+    async def capture(config, state):
+        states.append(state)
+
+    monkeypatch.setattr(state_emitter, "copilotkit_emit_state", capture)
+    return states
+
+
+def _state(content: str):
+    return {
+        "messages": [HumanMessage(content=content)],
+        "tool_logs": [],
+        "analysis": "",
+        "show_cards": False,
+        "context_handle": "",
+        "last_user_content": "",
+    }
+
+
+def test_gathered_context_stays_out_of_emitted_state(emitted, monkeypatch):
+    async def gather_repository(owner, repo):
+        return {
+            "owner": owner,
+            "repo": repo,
+            "repo_info": {"description": "demo", "default_branch": "main"},
+            "languages": {"Python": 1000},
+            "readme": README,
+            "root_files": ["pyproject.toml (file)"],
+            "manifests": {"pyproject.toml": '[project]\ndependencies = ["fastapi"]\n' * 2000},
+            "head_sha": "abc123",
+        }
+
+    monkeypatch.setattr(stack_agent, "gather_repository", gather_repository)
+    command = asyncio.run(
+        stack_agent.gather_context_node(_state("Analyze https://github.com/acme/app"), RunnableConfig())
+    )
+
+    assert emitted
+    for state in emitted:
+        assert set(state) <= set(stack_agent.UI_STATE_KEYS)
+        # What CopilotKit serializes per emit: a few log entries and the preliminary cards
+        assert len(dumps(state)) < 4096
+    # The context went to the store; the graph state only carries its handle
+    handle = command.update["context_handle"]
+    assert context_store.get(handle)["readme"] == README
+    assert len(json.dumps(command.update)) < 4096
+    context_store.discard(handle)
+
+
+def test_expired_context_asks_to_rerun(emitted):
+    state = _state("Analyze https://github.com/acme/app")
+    state["context_handle"] = "0" * 32
+
+    command = asyncio.run(stack_agent.analyze_with_gemini_node(state, RunnableConfig()))
+
+    reply = command.update["messages"][-1].content
+    assert "expired" in reply and "re-run" in reply
+    assert "valid GitHub URL" not in reply
+
+
+def test_missing_url_asks_for_one(emitted):
+    command = asyncio.run(stack_agent.analyze_with_gemini_node(_state("hello"), RunnableConfig()))
+
+    assert command.update["messages"][-1].content == "Please provide a valid GitHub URL"
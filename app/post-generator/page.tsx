@@ -72,6 +72,12 @@ interface PostInterface {
   }
 }
 
+// Partial generate_post arguments the agent streams into its state while it writes
+interface PostDrafts {
+  tweet?: Partial<PostInterface["tweet"]>
+  linkedIn?: Partial<PostInterface["linkedIn"]>
+}
+
 
 export default function PostGenerator() {
   const router = useRouter()
@@ -81,12 +87,22 @@ export default function PostGenerator() {
   const [posts, setPosts] = useState<PostInterface>({ tweet: { title: "", content: "" }, linkedIn: { title: "", content: "" } })
   const [isAgentActive, setIsAgentActive] = useState(false)
   const [isDropdownOpen, setIsDropdownOpen] = useState(false)
-  const { setState, running } = useCoAgent({
+  const { state, setState, running } = useCoAgent({
     name: "post_generation_agent",
     initialState: {
-      tool_logs: []
+      tool_logs: [],
+      post_drafts: {}
     }
   })
+  // While the agent is writing, preview its drafts in the canvas until the generate_post action lands
+  const drafts = state?.post_drafts as PostDrafts | undefined
+  const showDrafts = running && !!(drafts?.tweet?.content || drafts?.linkedIn?.content)
+  const shownPosts: PostInterface = showDrafts
+    ? {
+      tweet: { title: drafts?.tweet?.title || "", content: drafts?.tweet?.content || "" },
+      linkedIn: { title: drafts?.linkedIn?.title || "", content: drafts?.linkedIn?.content || "" },
+    }
+    : posts
 
   const { appendMessage, setMessages } = useCopilotChat()
 
@@ -357,16 +373,16 @@ export default function PostGenerator() {
 
         {/* Main Canvas */}
         <div className="flex-1 p-6 overflow-y-auto">
-          {showColumns ? (
+          {showColumns || showDrafts ? (
             <div className="flex gap-6 min-h-full">
               {/* LinkedIn Column - 75% */}
-              {posts.linkedIn.content != '' && <div className="w-[75%] h-full">
-                <LinkedInPostPreview title={posts.linkedIn.title || ""} content={posts.linkedIn.content || ""} />
+              {shownPosts.linkedIn.content != '' && <div className="w-[75%] h-full">
+                <LinkedInPostPreview title={shownPosts.linkedIn.title || ""} content={shownPosts.linkedIn.content || ""} />
               </div>}
 
               {/* X Post Column - 25% */}
-              {posts.tweet.content != '' && <div className="w-[25%] h-full">
-                <XPostPreview title={posts.tweet.title || ""} content={posts.tweet.content || ""} />
+              {shownPosts.tweet.content != '' && <div className="w-[25%] h-full">
+                <XPostPreview title={shownPosts.tweet.title || ""} content={shownPosts.tweet.content || ""} />
               </div>}
             </div>
           ) : (
@@ -1,12 +1,12 @@
 "use client"
 
-import { Check } from "lucide-react"
+import { Check, Clock } from "lucide-react"
 import React, { useEffect } from "react"
 
 interface ToolLog {
   id: string | number
   message: string
-  status: "processing" | "completed"
+  status: "processing" | "completed" | "throttled"
 }
 
 interface ToolLogsProps {
@@ -26,6 +26,8 @@ export function ToolLogs({ logs }: ToolLogsProps) {
             ${
               log.status === "processing"
                 ? "bg-yellow-50 border-yellow-200 text-yellow-800"
+                : log.status === "throttled"
+                ? "bg-orange-50 border-orange-200 text-orange-800"
                 : "bg-green-50 border-green-200 text-green-800"
             }
           `}
@@ -35,6 +37,8 @@ export function ToolLogs({ logs }: ToolLogsProps) {
               <span className="animate-ping absolute inline-flex h-full w-full rounded-full bg-yellow-400 opacity-75"></span>
               <span className="relative inline-flex rounded-full h-4 w-4 bg-yellow-400"></span>
             </span>
+          ) : log.status === "throttled" ? (
+            <Clock size={18} className="text-orange-600" />
           ) : (
             <Check size={18} className="text-green-600" />
           )}